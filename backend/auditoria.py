@@ -0,0 +1,170 @@
+"""
+Puente Hotel - Auditoría Nocturna
+Cierre del día de negocio: pasa a FINALIZADA las reservas en CHECKIN
+cuya fecha de salida ya pasó.
+
+Se ejecuta UNA vez por fecha de negocio:
+- Automáticamente, por una tarea en segundo plano que despierta después de medianoche
+- Manualmente, con POST /admin/auditoria-nocturna o desde la terminal:
+      python auditoria.py
+
+Los totales del folio de cada reserva (total_consumos, total_pagos, saldo)
+se mantienen en cada consumo; si alguna vez se desalinean (carga directa en la
+base, restauración de backup) se reconstruyen con:
+      python auditoria.py --reconciliar-folios
+
+Lo mismo con el inventario diario (noches vendidas y bloqueadas por fecha y tipo):
+      python auditoria.py --reconstruir-inventario
+
+Los endpoints de lectura solo consultan la marca "última auditoría"
+(en memoria y, si hace falta, en la tabla auditoria_nocturna), por lo que
+una lectura nunca se convierte en una escritura salvo la primera del día.
+"""
+
+import asyncio
+import logging
+import sys
+from datetime import date, datetime, time, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from models import engine, AuditoriaNocturna
+import crud
+
+logger = logging.getLogger(__name__)
+
+# Días que se conservan en el outbox `cambios` (un cliente desconectado por
+# más tiempo recibe 410 en GET /cambios y recarga todo)
+RETENCION_CAMBIOS_DIAS = 30
+
+# Última fecha de negocio auditada que conoce este proceso
+_ultima_auditoria: date = None
+
+# ============================================================================
+# FUNCIONES: AUDITORÍA
+# ============================================================================
+
+def ejecutar_auditoria_nocturna(db: Session, fecha_negocio: date = None) -> dict:
+    """
+    Ejecuta el cierre de la fecha de negocio, purga el outbox viejo y registra la marca de auditoría.
+    
+    Es idempotente: volver a ejecutarla el mismo día no cambia nada,
+    solo actualiza la hora de ejecución.
+    
+    Args:
+        db: Sesión de base de datos
+        fecha_negocio: Fecha de negocio a cerrar (por defecto, hoy)
+    
+    Returns:
+        Diccionario con la fecha auditada y las reservas finalizadas
+    """
+    global _ultima_auditoria
+    fecha_negocio = fecha_negocio or date.today()
+    
+    finalizadas = crud.actualizar_reservas_vencidas(db, fecha_negocio)
+    
+    # El outbox de GET /cambios no crece sin límite: se conservan los últimos días
+    crud.purgar_cambios(db, datetime.now() - timedelta(days=RETENCION_CAMBIOS_DIAS))
+    
+    marca = db.get(AuditoriaNocturna, fecha_negocio)
+    if marca:
+        marca.ejecutada_en = datetime.now()
+        marca.reservas_finalizadas += finalizadas
+    else:
+        db.add(AuditoriaNocturna(
+            fecha_negocio=fecha_negocio,
+            ejecutada_en=datetime.now(),
+            reservas_finalizadas=finalizadas
+        ))
+    
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otro worker registró la misma fecha al mismo tiempo: el UPDATE es idempotente
+        db.rollback()
+    
+    _ultima_auditoria = fecha_negocio
+    return {
+        "fecha_negocio": fecha_negocio,
+        "reservas_finalizadas": finalizadas
+    }
+
+def asegurar_auditoria(db: Session) -> None:
+    """
+    Garantiza que la fecha de negocio actual ya fue auditada.
+    
+    Pensada para los endpoints de lectura: en el caso normal solo compara
+    la marca en memoria. Si el proceso todavía no la conoce, consulta la tabla
+    por clave primaria, y solo si nadie auditó hoy ejecuta la auditoría.
+    """
+    global _ultima_auditoria
+    hoy = date.today()
+    
+    if _ultima_auditoria == hoy:
+        return
+    
+    if db.get(AuditoriaNocturna, hoy):
+        _ultima_auditoria = hoy
+        return
+    
+    ejecutar_auditoria_nocturna(db, hoy)
+
+# ============================================================================
+# TAREA PROGRAMADA (en segundo plano dentro del servidor)
+# ============================================================================
+
+def _segundos_hasta_proxima_auditoria(ahora: datetime) -> float:
+    """Segundos hasta unos instantes después de la próxima medianoche"""
+    proxima = datetime.combine(ahora.date() + timedelta(days=1), time(0, 0, 5))
+    return (proxima - ahora).total_seconds()
+
+def _auditar_con_sesion(session_factory) -> dict:
+    db = session_factory()
+    try:
+        return ejecutar_auditoria_nocturna(db)
+    finally:
+        db.close()
+
+async def programar_auditoria_nocturna(session_factory) -> None:
+    """
+    Bucle infinito que ejecuta la auditoría después de cada medianoche.
+    La auditoría corre en un hilo para no bloquear el event loop.
+    """
+    while True:
+        await asyncio.sleep(_segundos_hasta_proxima_auditoria(datetime.now()))
+        try:
+            resultado = await asyncio.to_thread(_auditar_con_sesion, session_factory)
+            logger.info("Auditoría del %s: %d reservas finalizadas",
+                        resultado["fecha_negocio"], resultado["reservas_finalizadas"])
+        except Exception:
+            logger.exception("Error en la auditoría nocturna")
+
+if __name__ == "__main__":
+    from models import init_db
+    from registro import configurar_logging
+    
+    configurar_logging()
+    init_db()
+    
+    if "--reconciliar-folios" in sys.argv:
+        db = sessionmaker(bind=engine)()
+        try:
+            corregidas = crud.reconciliar_folios(db)
+        finally:
+            db.close()
+        print(f"✓ Folios reconciliados: {len(corregidas)} reservas corregidas")
+        sys.exit(0)
+    
+    if "--reconstruir-inventario" in sys.argv:
+        db = sessionmaker(bind=engine)()
+        try:
+            resultado = crud.reconstruir_inventario(db)
+        finally:
+            db.close()
+        print(f"✓ Inventario reconstruido: {resultado['filas']} filas, "
+              f"{resultado['diferencias']} no coincidían")
+        sys.exit(0)
+    
+    resultado = _auditar_con_sesion(sessionmaker(bind=engine))
+    print(f"✓ Auditoría nocturna del {resultado['fecha_negocio']} completada: "
+          f"{resultado['reservas_finalizadas']} reservas finalizadas")
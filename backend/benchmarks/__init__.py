@@ -0,0 +1,7 @@
+"""
+Puente Hotel - Benchmarks
+Generador de hoteles sintéticos y suite de tiempos de los endpoints principales.
+
+Uso (desde backend/):
+    python -m benchmarks --habitaciones 300 --reservas 100000 --salida resultados.json
+"""
@@ -0,0 +1,72 @@
+"""
+Puente Hotel - Benchmarks (punto de entrada)
+
+Ejemplos (desde backend/):
+    python -m benchmarks                                   # 40 habitaciones, 10.000 reservas
+    python -m benchmarks --habitaciones 300 --reservas 100000
+    python -m benchmarks --habitaciones 5000 --reservas 2000000 --salida grande.json
+    python -m benchmarks --sin-generar --salida otra_corrida.json   # Reusa la base ya generada
+
+Usa su propia base (benchmark.db por defecto), nunca puente_hotel.db.
+"""
+
+import argparse
+import json
+import os
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de Puente Hotel")
+    parser.add_argument("--habitaciones", type=int, default=40)
+    parser.add_argument("--reservas", type=int, default=10000)
+    parser.add_argument("--clientes", type=int, default=None)
+    parser.add_argument("--consumos-por-reserva", type=float, default=1.5)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--base", default="sqlite:///./benchmark.db", help="DATABASE_URL a usar")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--sin-generar", action="store_true", help="No regenerar los datos")
+    args = parser.parse_args()
+    
+    # La URL se fija ANTES de importar models/main (el engine se crea al importarlos)
+    os.environ["DATABASE_URL"] = args.base
+    # El TestClient usa httpx, que registra cada request en INFO
+    os.environ.setdefault("LOG_LEVELS", "httpx=WARNING")
+    
+    from models import engine, init_db
+    from benchmarks.generador import generar_hotel
+    from benchmarks.suite import ejecutar_suite, entorno
+    
+    init_db()
+    
+    datos = None
+    if not args.sin_generar:
+        print(f"Generando hotel: {args.habitaciones} habitaciones, {args.reservas} reservas...")
+        inicio = time.perf_counter()
+        datos = generar_hotel(
+            engine,
+            habitaciones=args.habitaciones,
+            reservas=args.reservas,
+            clientes=args.clientes,
+            consumos_por_reserva=args.consumos_por_reserva,
+            semilla=args.semilla
+        )
+        print(f"✓ Datos generados en {time.perf_counter() - inicio:.1f} s: {datos}")
+    
+    import main as api
+    
+    print(f"Midiendo endpoints ({args.repeticiones} repeticiones)...")
+    resultados = ejecutar_suite(api.app, api.SessionLocal, args.repeticiones, args.semilla)
+    
+    informe = {
+        "entorno": entorno(),
+        "configuracion": vars(args),
+        "datos": datos,
+        "resultados": resultados
+    }
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    print(f"✓ Resultados guardados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Puente Hotel - Generador de Hotel Sintético
+Carga masiva (executemany) de habitaciones, clientes, productos, reservas y consumos
+para medir cómo escalan los endpoints.
+
+Las reservas de cada habitación se generan como una línea de tiempo sin solapamientos
+que termina unos meses después de HOY, por lo que hay historial, huéspedes en casa,
+llegadas de hoy y reservas futuras, igual que en un hotel real.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+# Filas por cada executemany (acota la memoria usada al generar millones de reservas)
+TAMANO_LOTE = 20000
+
+TIPOS_HABITACION = [
+    ("SIMPLE", 50.0, 0.35),
+    ("DOBLE", 80.0, 0.40),
+    ("TRIPLE", 110.0, 0.15),
+    ("SUITE", 200.0, 0.10),
+]
+
+PRODUCTOS = [
+    ("Agua Mineral", 25.0), ("Coca-Cola", 35.0), ("Cerveza", 50.0), ("Café", 35.0),
+    ("Papas Fritas", 40.0), ("Chocolate", 30.0), ("Sandwich", 60.0), ("Pizza Personal", 120.0),
+    ("Jugo de Naranja", 40.0), ("Vino de la Casa", 150.0), ("Desayuno", 90.0),
+    ("Lavandería - Camisa", 80.0), ("Lavandería - Pantalón", 100.0), ("Servicio a Habitación", 50.0),
+    ("Estacionamiento", 70.0), ("Late Checkout", 200.0), ("Spa", 300.0), ("Pago a cuenta", -500.0),
+]
+
+NOMBRES = ["Juan", "María", "Carlos", "Lucía", "Pedro", "Ana", "Jorge", "Sofía", "Diego", "Valentina",
+           "Martín", "Camila", "Pablo", "Julieta", "Andrés", "Florencia", "Tomás", "Paula"]
+APELLIDOS = ["García", "López", "Martínez", "Rodríguez", "Fernández", "Gómez", "Díaz", "Pérez",
+             "Sánchez", "Romero", "Sosa", "Álvarez", "Torres", "Ruiz", "Ramírez", "Flores"]
+
+# Probabilidad de que una reserva esté cancelada
+PROBABILIDAD_CANCELADA = 0.05
+
+# Grupos de versiones_datos que invalidan cachés e índices (ver crud.GRUPOS_POR_ENTIDAD)
+GRUPOS_VERSION = ("tablero", "disponibilidad", "productos")
+
+# ============================================================================
+# GENERACIÓN
+# ============================================================================
+
+def _insertar(conn, sql: str, filas: list) -> None:
+    """Inserta las filas en lotes con executemany"""
+    for i in range(0, len(filas), TAMANO_LOTE):
+        conn.exec_driver_sql(sql, filas[i:i + TAMANO_LOTE])
+
+def _estado_reserva(rng: random.Random, entrada: date, salida: date, hoy: date) -> str:
+    if rng.random() < PROBABILIDAD_CANCELADA:
+        return "CANCELADA"
+    if salida <= hoy:
+        return "FINALIZADA"
+    if entrada <= hoy:
+        return "CHECKIN" if entrada < hoy or rng.random() < 0.5 else "PENDIENTE"
+    return "PENDIENTE"
+
+def generar_hotel(
+    engine,
+    habitaciones: int = 40,
+    reservas: int = 10000,
+    clientes: int = None,
+    consumos_por_reserva: float = 1.5,
+    dias_futuros: int = 120,
+    semilla: int = 42
+) -> dict:
+    """
+    Vacía las tablas y genera un hotel sintético reproducible (misma semilla = mismos datos).
+    
+    Args:
+        engine: Engine de la base de destino (debe tener el esquema creado)
+        habitaciones: Cantidad de habitaciones
+        reservas: Cantidad total de reservas (repartidas entre las habitaciones)
+        clientes: Cantidad de clientes (por defecto, un tercio de las reservas)
+        consumos_por_reserva: Promedio de consumos por reserva no cancelada
+        dias_futuros: Hasta cuántos días después de HOY llegan las reservas futuras
+        semilla: Semilla del generador aleatorio
+    
+    Returns:
+        Diccionario con la cantidad de filas generadas por tabla
+    """
+    rng = random.Random(semilla)
+    hoy = date.today()
+    clientes = clientes or max(reservas // 3, 100)
+    
+    filas_habitaciones = []
+    tipos = [t for t, _, _ in TIPOS_HABITACION]
+    pesos = [p for _, _, p in TIPOS_HABITACION]
+    precios = {t: precio for t, precio, _ in TIPOS_HABITACION}
+    for i in range(habitaciones):
+        tipo = rng.choices(tipos, pesos)[0]
+        numero = f"{(i // 50) + 1}{(i % 50) + 1:02d}"
+        filas_habitaciones.append((i + 1, numero, tipo, precios[tipo], "DISPONIBLE"))
+    
+    filas_clientes = [
+        (i + 1, f"{20000000 + i}", f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+         f"cliente{i + 1}@example.com", f"11{rng.randint(10000000, 99999999)}")
+        for i in range(clientes)
+    ]
+    filas_productos = [(i + 1, nombre, precio, 1) for i, (nombre, precio) in enumerate(PRODUCTOS)]
+    
+    with engine.begin() as conn:
+        for tabla in ("inventario_diario", "consumos", "reservas", "productos", "clientes", "habitaciones"):
+            conn.exec_driver_sql(f"DELETE FROM {tabla}")
+        _reiniciar_cambios(conn)
+        _insertar(conn, "INSERT INTO habitaciones (id, numero, tipo, precio_base, estado) VALUES (?, ?, ?, ?, ?)",
+                  filas_habitaciones)
+        _insertar(conn, "INSERT INTO clientes (id, dni, nombre_completo, email, telefono) VALUES (?, ?, ?, ?, ?)",
+                  filas_clientes)
+        _insertar(conn, "INSERT INTO productos (id, nombre, precio, activo) VALUES (?, ?, ?, ?)",
+                  filas_productos)
+        
+        # Reservas y consumos: se generan y se insertan habitación por habitación
+        reserva_id = 0
+        consumo_id = 0
+        total_consumos = 0
+        lote_reservas = []
+        lote_consumos = []
+        inventario = {}  # (fecha, tipo) -> [vendidas, bloqueadas]
+        
+        for indice, (habitacion_id, _, tipo, precio_base, _) in enumerate(filas_habitaciones):
+            cantidad = reservas // habitaciones + (1 if indice < reservas % habitaciones else 0)
+            
+            # Línea de tiempo hacia atrás desde el horizonte futuro, sin solapamientos
+            salida = hoy + timedelta(days=rng.randint(0, dias_futuros))
+            for _ in range(cantidad):
+                noches = rng.randint(1, 7)
+                entrada = salida - timedelta(days=noches)
+                reserva_id += 1
+                estado = _estado_reserva(rng, entrada, salida, hoy)
+                precio_total = precio_base * noches
+                cargos = pagos = 0.0
+                
+                if estado != "CANCELADA" and entrada <= hoy:
+                    for _ in range(int(rng.expovariate(1 / consumos_por_reserva)) if consumos_por_reserva else 0):
+                        consumo_id += 1
+                        producto_id, (_, precio) = rng.choice(list(enumerate(PRODUCTOS, start=1)))
+                        fecha = entrada + timedelta(days=rng.randint(0, max(noches - 1, 0)))
+                        cantidad_consumo = rng.randint(1, 3)
+                        if precio < 0:
+                            pagos -= cantidad_consumo * precio
+                        else:
+                            cargos += cantidad_consumo * precio
+                        lote_consumos.append((
+                            consumo_id, reserva_id, producto_id, cantidad_consumo, precio, fecha.isoformat()
+                        ))
+                
+                # Totales del folio calculados acá, igual que los mantiene crud
+                lote_reservas.append((
+                    reserva_id, habitacion_id, rng.randint(1, clientes),
+                    entrada.isoformat(), salida.isoformat(), precio_total, estado,
+                    cargos, pagos, precio_total + cargos - pagos
+                ))
+                
+                # Inventario diario calculado acá, igual que lo mantiene crud
+                if estado != "CANCELADA":
+                    columna = 1 if estado == "PENDIENTE" else 0
+                    for noche in range(noches):
+                        clave = ((entrada + timedelta(days=noche)).isoformat(), tipo)
+                        inventario.setdefault(clave, [0, 0])[columna] += 1
+                
+                salida = entrada - timedelta(days=rng.choice([0, 0, 0, 1, 2, 3]))
+            
+            if len(lote_reservas) >= TAMANO_LOTE:
+                _insertar_reservas_y_consumos(conn, lote_reservas, lote_consumos)
+                total_consumos += len(lote_consumos)
+                lote_reservas, lote_consumos = [], []
+        
+        _insertar_reservas_y_consumos(conn, lote_reservas, lote_consumos)
+        total_consumos += len(lote_consumos)
+        _insertar(conn, "INSERT INTO inventario_diario (fecha, tipo, vendidas, bloqueadas) VALUES (?, ?, ?, ?)",
+                  [(fecha, tipo, vendidas, bloqueadas) for (fecha, tipo), (vendidas, bloqueadas) in inventario.items()])
+        conn.exec_driver_sql("ANALYZE")
+    
+    return {
+        "habitaciones": habitaciones,
+        "clientes": clientes,
+        "productos": len(filas_productos),
+        "reservas": reserva_id,
+        "consumos": total_consumos
+    }
+
+def _reiniciar_cambios(conn) -> None:
+    """
+    El outbox y las versiones describen los datos que se acaban de borrar:
+    - Se vacía `cambios` y queda una sola entrada con un hueco en seq, así todo
+      cursor anterior recibe 410 en GET /cambios y el índice de disponibilidad
+      se reconstruye completo (igual que después de una purga)
+    - Se incrementan todas las versiones (nunca se reinician: una caché podría
+      volver a ver un número viejo y servir datos que ya no existen)
+    """
+    ultimo_seq = conn.exec_driver_sql("SELECT COALESCE(MAX(seq), 0) FROM cambios").scalar()
+    conn.exec_driver_sql("DELETE FROM cambios")
+    conn.exec_driver_sql(
+        "INSERT INTO cambios (seq, entidad, entidad_id, accion, registrado_en) VALUES (?, ?, ?, ?, ?)",
+        (ultimo_seq + 2, "habitacion", 0, "datos_regenerados", datetime.now().isoformat(sep=" "))
+    )
+    for clave in GRUPOS_VERSION:
+        conn.exec_driver_sql(
+            "INSERT INTO versiones_datos (clave, version) VALUES (?, 1) "
+            "ON CONFLICT (clave) DO UPDATE SET version = version + 1",
+            (clave,)
+        )
+
+def _insertar_reservas_y_consumos(conn, lote_reservas: list, lote_consumos: list) -> None:
+    _insertar(conn, "INSERT INTO reservas (id, habitacion_id, cliente_id, fecha_entrada, fecha_salida, "
+                    "precio_total, estado, total_consumos, total_pagos, saldo) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lote_reservas)
+    _insertar(conn, "INSERT INTO consumos (id, reserva_id, producto_id, cantidad, precio_unitario, "
+                    "fecha_consumo) VALUES (?, ?, ?, ?, ?, ?)", lote_consumos)
@@ -0,0 +1,86 @@
+"""
+Puente Hotel - Suite de Tiempos
+Mide los endpoints principales dentro del mismo proceso (sin servidor en localhost:8000),
+llamando a la aplicación ASGI con el TestClient de FastAPI.
+"""
+
+import platform
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+def _casos(rng: random.Random, reserva_ids: list, nombres: list) -> list:
+    """
+    Casos a medir: (nombre, método, ruta, parámetros, body).
+    Los IDs y búsquedas se eligen con la semilla para que cada corrida sea comparable.
+    """
+    hoy = date.today()
+    entrada = hoy + timedelta(days=rng.randint(1, 30))
+    return [
+        ("GET /habitaciones", "GET", "/habitaciones", None, None),
+        ("POST /disponibilidad", "POST", "/disponibilidad", None,
+         {"fecha_entrada": entrada.isoformat(), "fecha_salida": (entrada + timedelta(days=3)).isoformat()}),
+        ("GET /reservas (página de 500)", "GET", "/reservas", {"limit": 500}, None),
+        ("GET /reservas/historial (página de 100)", "GET", "/reservas/historial", {"limit": 100}, None),
+        ("GET /reservas/historial (búsqueda)", "GET", "/reservas/historial",
+         lambda: {"q": rng.choice(nombres), "limit": 100}, None),
+        ("GET /reservas/{id}/cuenta", "GET", lambda: f"/reservas/{rng.choice(reserva_ids)}/cuenta", None, None),
+        ("GET /checkin/buscar", "GET", "/checkin/buscar", lambda: {"q": rng.choice(nombres)}, None),
+    ]
+
+def ejecutar_suite(app, session_factory, repeticiones: int = 5, semilla: int = 42) -> dict:
+    """
+    Ejecuta cada caso una vez para calentar y luego `repeticiones` veces midiendo.
+    
+    Returns:
+        Diccionario {caso: {min_ms, mediana_ms, p95_ms, max_ms, promedio_ms, status}}
+    """
+    from fastapi.testclient import TestClient
+    from models import Reserva, Cliente
+    
+    rng = random.Random(semilla)
+    db = session_factory()
+    try:
+        reserva_ids = [fila[0] for fila in db.query(Reserva.id).limit(10000).all()] or [1]
+        nombres = [fila[0].split()[-1] for fila in db.query(Cliente.nombre_completo).limit(200).all()] or ["García"]
+    finally:
+        db.close()
+    
+    resultados = {}
+    with TestClient(app) as cliente:
+        for nombre, metodo, ruta, params, body in _casos(rng, reserva_ids, nombres):
+            tiempos = []
+            status = None
+            for intento in range(repeticiones + 1):
+                url = ruta() if callable(ruta) else ruta
+                parametros = params() if callable(params) else params
+                inicio = time.perf_counter()
+                respuesta = cliente.request(metodo, url, params=parametros, json=body)
+                transcurrido = (time.perf_counter() - inicio) * 1000
+                status = respuesta.status_code
+                if intento > 0:  # El primer intento es de calentamiento
+                    tiempos.append(transcurrido)
+            
+            tiempos.sort()
+            resultados[nombre] = {
+                "min_ms": round(tiempos[0], 2),
+                "mediana_ms": round(statistics.median(tiempos), 2),
+                "p95_ms": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 2),
+                "max_ms": round(tiempos[-1], 2),
+                "promedio_ms": round(statistics.fmean(tiempos), 2),
+                "status": status
+            }
+            print(f"  {nombre:<35} mediana {resultados[nombre]['mediana_ms']:>10.2f} ms  (status {status})")
+    
+    return resultados
+
+def entorno() -> dict:
+    """Datos del entorno para poder comparar corridas"""
+    import sqlite3
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform()
+    }
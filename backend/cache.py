@@ -0,0 +1,97 @@
+"""
+Puente Hotel - Caché Versionado
+Guarda respuestas ya calculadas (JSON serializado) junto con la versión de datos
+con la que se calcularon. Cada escritura en crud incrementa la versión del grupo
+(ver crud._registrar_cambio), así que una entrada con versión vieja simplemente
+deja de coincidir: no hace falta invalidar nada a mano.
+
+Las respuestas llevan un ETag derivado de (clave, versión). Si el cliente manda
+If-None-Match con ese ETag se responde 304 sin cuerpo y sin recalcular.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+class CacheVersionado:
+    """Caché LRU de respuestas serializadas, válidas para una versión de datos"""
+
+    def __init__(self, nombre: str, max_entradas: int = 64):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def etag(self, clave, version: int) -> str:
+        return f'"{self.nombre}-{clave}-v{version}"'
+
+    def obtener(self, clave, version: int):
+        """Devuelve el contenido guardado o None si no existe para esa versión"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != version:
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[1]
+
+    def guardar(self, clave, version: int, contenido: bytes) -> None:
+        with self._lock:
+            self._entradas[clave] = (version, contenido)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+def _etag_coincide(request: Request, etag: str) -> bool:
+    enviado = request.headers.get("if-none-match")
+    if not enviado:
+        return False
+    candidatos = [valor.strip().removeprefix("W/") for valor in enviado.split(",")]
+    return etag in candidatos or "*" in candidatos
+
+def respuesta_cacheada(
+    request: Request,
+    cache: CacheVersionado,
+    clave,
+    version: int,
+    calcular,
+    modelo=None
+) -> Response:
+    """
+    Responde desde el caché cuando se puede.
+
+    Args:
+        request: Request actual (para leer If-None-Match)
+        cache: Caché donde buscar/guardar
+        clave: Clave del resultado (ej: fecha de negocio)
+        version: Versión actual de los datos
+        calcular: Función sin argumentos que calcula el resultado (solo se llama si falta)
+        modelo: Tipo de respuesta (ej: List[HabitacionDetalle]) para validar y serializar
+                igual que response_model; si se omite se usa jsonable_encoder
+
+    Returns:
+        304 si el cliente ya tiene esta versión; 200 con el JSON (cacheado o recién calculado)
+    """
+    etag = cache.etag(clave, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_coincide(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    contenido = cache.obtener(clave, version)
+    if contenido is None:
+        if modelo is not None:
+            adaptador = TypeAdapter(modelo)
+            contenido = adaptador.dump_json(adaptador.validate_python(calcular()))
+        else:
+            contenido = json.dumps(jsonable_encoder(calcular()), ensure_ascii=False).encode("utf-8")
+        cache.guardar(clave, version, contenido)
+
+    return Response(content=contenido, media_type="application/json", headers=headers)
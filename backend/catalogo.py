@@ -0,0 +1,91 @@
+"""
+Puente Hotel - Catálogo de Productos en Memoria
+Copia del catálogo del POS (minibar/kiosco) compartida por todo el proceso,
+indexada por ID y por nombre normalizado. Cada consumo que se carga busca su
+producto acá en lugar de consultar la tabla productos.
+
+Validez entre workers: cada escritura de productos incrementa la versión
+"productos" en versiones_datos (ver crud._registrar_cambio) dentro de la misma
+transacción. Cada lectura compara esa versión (una consulta por clave primaria)
+con la de la copia en memoria y, si otro worker o este mismo cambió algo,
+recarga el catálogo completo una vez. Nunca hace falta invalidar a mano.
+
+Las entradas son inmutables (no son objetos ORM): se pueden compartir entre
+hilos y sesiones sin riesgo.
+"""
+
+import threading
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Producto, VersionDatos
+
+@dataclass(frozen=True)
+class ProductoCatalogo:
+    """Producto tal como estaba en la base al cargar el catálogo"""
+    id: int
+    nombre: str
+    precio: float
+    activo: bool
+
+def normalizar_nombre(nombre: str) -> str:
+    """Clave de búsqueda por nombre: sin mayúsculas ni espacios repetidos ("  Agua  mineral" → "agua mineral")"""
+    return " ".join(nombre.split()).casefold()
+
+@dataclass(frozen=True)
+class Catalogo:
+    """Foto del catálogo para una versión de datos"""
+    version: int
+    productos: tuple  # Ordenados por nombre
+    por_id: dict
+    por_nombre: dict
+
+    def listar(self, solo_activos: bool = False) -> list[ProductoCatalogo]:
+        if solo_activos:
+            return [producto for producto in self.productos if producto.activo]
+        return list(self.productos)
+
+class CatalogoProductos:
+    """Catálogo en memoria, recargado cuando cambia la versión "productos" de la base"""
+
+    def __init__(self):
+        self._catalogo: Catalogo = None
+        self._lock = threading.Lock()
+
+    def obtener(self, db: Session) -> Catalogo:
+        """Catálogo vigente (lo recarga si la versión de la base cambió)"""
+        # La versión se lee ANTES que los productos: si otro worker escribe en
+        # el medio, la foto queda más nueva que su versión y se recarga otra vez
+        # en la próxima lectura; nunca queda una foto vieja con versión nueva.
+        version = db.execute(
+            select(VersionDatos.version).where(VersionDatos.clave == "productos")
+        ).scalar() or 0
+        catalogo = self._catalogo
+        if catalogo is not None and catalogo.version == version:
+            return catalogo
+
+        with self._lock:
+            if self._catalogo is not None and self._catalogo.version == version:
+                return self._catalogo
+            productos = tuple(
+                ProductoCatalogo(fila.id, fila.nombre, fila.precio, bool(fila.activo))
+                for fila in db.execute(
+                    select(Producto.id, Producto.nombre, Producto.precio, Producto.activo)
+                    .order_by(Producto.nombre)
+                )
+            )
+            self._catalogo = Catalogo(
+                version=version,
+                productos=productos,
+                por_id={producto.id: producto for producto in productos},
+                por_nombre={normalizar_nombre(producto.nombre): producto for producto in productos}
+            )
+            return self._catalogo
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._catalogo = None
+
+catalogo_productos = CatalogoProductos()
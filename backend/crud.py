@@ -3,12 +3,104 @@ Puente Hotel - CRUD Operations
 Funciones para crear, leer, actualizar y borrar datos de la base de datos
 """
 
-from sqlalchemy.orm import Session
-from datetime import date
+from sqlalchemy import Integer, and_, case, column, delete, exists, func, insert, literal, or_, select, text, tuple_, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from enum import Enum as PyEnum
+import logging
 from models import Habitacion, Cliente, Reserva, Producto, Consumo
-from models import EstadoHabitacion, EstadoReserva
+from models import EstadoHabitacion, EstadoReserva, TipoHabitacion, VersionDatos, Cambio, InventarioDiario
 from schemas import HabitacionCreate, ClienteCreate, ReservaCreate, ProductoCreate, ConsumoCreate
 import schemas
+import eventos
+from catalogo import catalogo_productos, normalizar_nombre
+from disponibilidad import indice_disponibilidad
+
+logger = logging.getLogger(__name__)
+
+# Grupos de datos versionados que invalida cada tipo de entidad al escribirse.
+# Los cachés (ver cache.py) guardan la versión con la que calcularon cada resultado.
+# "disponibilidad" es la del índice en memoria (ver disponibilidad.py).
+GRUPOS_POR_ENTIDAD = {
+    "habitacion": ("tablero", "disponibilidad"),
+    "cliente": ("tablero",),
+    "reserva": ("tablero", "disponibilidad"),
+    "consumo": ("tablero",),
+    "producto": ("tablero", "productos"),
+}
+
+# ============================================================================
+# FUNCIONES: VERSIONES DE DATOS
+# ============================================================================
+
+def _registrar_cambio(db: Session, entidad: str, accion: str, fila) -> None:
+    """
+    Registra una escritura sobre `entidad`. Se llama antes de db.commit():
+    - Incrementa la versión de los grupos afectados y agrega la fila al outbox
+      `cambios` (GET /cambios) en la MISMA transacción que el cambio, así
+      ningún lector ve datos nuevos con una versión vieja.
+    - Deja el evento "<entidad>.<accion>" para GET /eventos; se publica solo
+      si la transacción se confirma (ver eventos.py).
+    
+    Args:
+        db: Sesión de base de datos
+        entidad: "habitacion", "cliente", "reserva", "consumo" o "producto"
+        accion: Qué pasó ("creada", "checkin", "cancelada", ...)
+        fila: Objeto ORM afectado, fila de un RETURNING o diccionario con el resumen
+    """
+    _registrar_cambios(db, entidad, accion, [fila])
+
+def _registrar_cambios(db: Session, entidad: str, accion: str, filas: list) -> None:
+    """Como _registrar_cambio para varias filas: un solo INSERT al outbox y un incremento de versión"""
+    lista_datos = [_fila_a_dict(db, fila) for fila in filas]
+    _anotar_cambios(db, entidad, accion, [datos["id"] for datos in lista_datos])
+    for datos in lista_datos:
+        eventos.encolar(db, f"{entidad}.{accion}", {
+            "entidad": entidad,
+            "accion": accion,
+            "datos": datos
+        })
+
+def _anotar_cambios(db: Session, entidad: str, accion: str, ids: list, grupos: tuple = None) -> None:
+    """
+    Parte transaccional de _registrar_cambio (también la usan las escrituras masivas):
+    una fila en el outbox `cambios` por cada ID afectado y el incremento de versión.
+    `grupos` reemplaza a los de la entidad cuando el cambio no afecta a todos
+    (ej: los totales del folio no cambian la disponibilidad).
+    """
+    ahora = datetime.now()
+    db.execute(insert(Cambio), [
+        {"entidad": entidad, "entidad_id": entidad_id, "accion": accion, "registrado_en": ahora}
+        for entidad_id in ids
+    ])
+    
+    for clave in grupos or GRUPOS_POR_ENTIDAD[entidad]:
+        actualizadas = db.execute(
+            update(VersionDatos)
+            .where(VersionDatos.clave == clave)
+            .values(version=VersionDatos.version + 1)
+        ).rowcount
+        if not actualizadas:
+            db.add(VersionDatos(clave=clave, version=1))
+
+def _fila_a_dict(db: Session, fila) -> dict:
+    """Columnas de un objeto ORM (o de un mapping) con valores serializables a JSON"""
+    if hasattr(fila, "__table__"):
+        if fila.id is None:
+            db.flush()  # Asigna el ID a los objetos recién agregados
+        fila = {columna.key: getattr(fila, columna.key) for columna in fila.__table__.columns}
+    return {
+        clave: valor.value if isinstance(valor, PyEnum) else
+               valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+        for clave, valor in dict(fila).items()
+    }
+
+def get_version_datos(db: Session, clave: str) -> int:
+    """Versión actual de un grupo de datos (0 si nunca se escribió)"""
+    return db.execute(
+        select(VersionDatos.version).where(VersionDatos.clave == clave)
+    ).scalar() or 0
 
 # ============================================================================
 # FUNCIONES: HABITACIONES
@@ -32,6 +124,7 @@ def create_habitacion(db: Session, habitacion: HabitacionCreate) -> Habitacion:
         estado=habitacion.estado or "DISPONIBLE"
     )
     db.add(db_habitacion)
+    _registrar_cambio(db, "habitacion", "creada", db_habitacion)
     db.commit()
     db.refresh(db_habitacion)
     return db_habitacion
@@ -59,35 +152,49 @@ def get_habitaciones(db: Session) -> list[dict]:
     """
     from datetime import date as date_class
     
-    todas_habitaciones = db.query(Habitacion).all()
-    resultado = []
     hoy = date_class.today()
     
-    print(f"[DEBUG] get_habitaciones - Fecha de hoy: {hoy}")
+    # Se consulta una sola vez: en el bucle por habitación no se arma ningún mensaje si DEBUG está apagado
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug("get_habitaciones - Fecha de hoy: %s", hoy)
+    
+    # Número FIJO de consultas (no una por habitación):
+    # 1. Todas las habitaciones
+    # 2. Todas las reservas PENDIENTE/CHECKIN que aún no terminaron (salida > HOY),
+    #    con el cliente cargado en el mismo SELECT (joinedload).
+    #    Incluye tanto la reserva activa HOY (entrada <= HOY < salida)
+    #    como las futuras (entrada > HOY).
+    todas_habitaciones = db.query(Habitacion).order_by(Habitacion.id).all()
+    reservas_vigentes = db.query(Reserva).options(
+        joinedload(Reserva.cliente)
+    ).filter(
+        Reserva.estado.in_([EstadoReserva.PENDIENTE, EstadoReserva.CHECKIN]),
+        Reserva.fecha_salida > hoy
+    ).order_by(Reserva.fecha_entrada.asc(), Reserva.id.asc()).all()
+    
+    # Agrupar las reservas por habitación en Python
+    reservas_por_habitacion = defaultdict(list)
+    for reserva in reservas_vigentes:
+        reservas_por_habitacion[reserva.habitacion_id].append(reserva)
+    
+    resultado = []
     
     for habitacion in todas_habitaciones:
-        # 1. Buscar si existe una reserva EN CHECKIN para HOY (huésped ya llegó)
-        reserva_checkin = db.query(Reserva).filter(
-            Reserva.habitacion_id == habitacion.id,
-            Reserva.estado == EstadoReserva.CHECKIN,
-            Reserva.fecha_entrada <= hoy,
-            Reserva.fecha_salida > hoy
-        ).first()
-        
-        # 2. Buscar si hay una reserva PENDIENTE para HOY (huésped por llegar)
-        reserva_pendiente_hoy = db.query(Reserva).filter(
-            Reserva.habitacion_id == habitacion.id,
-            Reserva.estado == EstadoReserva.PENDIENTE,
-            Reserva.fecha_entrada <= hoy,
-            Reserva.fecha_salida > hoy
-        ).first()
+        reserva_checkin = None
+        reserva_pendiente_hoy = None
+        reservas_futuras = []
         
-        # 3. Buscar próximas reservas FUTURAS (después de hoy) que no estén canceladas
-        reservas_futuras = db.query(Reserva).filter(
-            Reserva.habitacion_id == habitacion.id,
-            Reserva.estado.in_([EstadoReserva.PENDIENTE, EstadoReserva.CHECKIN]),
-            Reserva.fecha_entrada > hoy
-        ).order_by(Reserva.fecha_entrada.asc()).all()
+        for reserva in reservas_por_habitacion.get(habitacion.id, []):
+            if reserva.fecha_entrada > hoy:
+                # 3. Próximas reservas FUTURAS (después de hoy), ya ordenadas por fecha
+                reservas_futuras.append(reserva)
+            elif reserva.estado == EstadoReserva.CHECKIN:
+                # 1. Reserva EN CHECKIN para HOY (huésped ya llegó)
+                if reserva_checkin is None:
+                    reserva_checkin = reserva
+            elif reserva_pendiente_hoy is None:
+                # 2. Reserva PENDIENTE para HOY (huésped por llegar)
+                reserva_pendiente_hoy = reserva
         
         # Construir diccionario base
         # Convertir enums a strings para la respuesta JSON
@@ -117,7 +224,8 @@ def get_habitaciones(db: Session) -> list[dict]:
         # PASO 1: Respetar estados manuales de mantenimiento/limpieza
         if estado_actual in ['MANTENIMIENTO', 'LIMPIEZA']:
             # Respetar la decisión manual del staff
-            print(f"[DEBUG] Habitación {habitacion.numero}: {estado_actual} (manual del staff)")
+            if debug:
+                logger.debug("Habitación %s: %s (manual del staff)", habitacion.numero, estado_actual)
         # PASO 2: Si hay reserva en CHECKIN hoy, la habitación está OCUPADA
         elif reserva_checkin:
             hab_dict["estado"] = 'OCUPADA'  # ← Huésped ya llegó
@@ -126,7 +234,9 @@ def get_habitaciones(db: Session) -> list[dict]:
             hab_dict["reserva_actual_fin"] = str(reserva_checkin.fecha_salida)
             if reserva_checkin.cliente:
                 hab_dict["nombre_cliente"] = reserva_checkin.cliente.nombre_completo
-            print(f"[DEBUG] Habitación {habitacion.numero}: OCUPADA (CHECKIN del {reserva_checkin.fecha_entrada} al {reserva_checkin.fecha_salida})")
+            if debug:
+                logger.debug("Habitación %s: OCUPADA (CHECKIN del %s al %s)",
+                             habitacion.numero, reserva_checkin.fecha_entrada, reserva_checkin.fecha_salida)
         # PASO 3: Si hay reserva PENDIENTE hoy, mostrar como RESERVADA (esperando llegada)
         elif reserva_pendiente_hoy:
             hab_dict["estado"] = 'RESERVADA'  # ← Esperando que llegue el huésped
@@ -135,11 +245,13 @@ def get_habitaciones(db: Session) -> list[dict]:
             hab_dict["reserva_actual_fin"] = str(reserva_pendiente_hoy.fecha_salida)
             if reserva_pendiente_hoy.cliente:
                 hab_dict["nombre_cliente"] = reserva_pendiente_hoy.cliente.nombre_completo
-            print(f"[DEBUG] Habitación {habitacion.numero}: RESERVADA (pendiente check-in)")
+            if debug:
+                logger.debug("Habitación %s: RESERVADA (pendiente check-in)", habitacion.numero)
         # PASO 4: Si NO hay reserva activa, está DISPONIBLE
         else:
             hab_dict["estado"] = 'DISPONIBLE'  # ← Sin huéspedes
-            print(f"[DEBUG] Habitación {habitacion.numero}: DISPONIBLE (sin reserva activa)")
+            if debug:
+                logger.debug("Habitación %s: DISPONIBLE (sin reserva activa)", habitacion.numero)
         
         # Agregar próximas reservas
         for reserva_futura in reservas_futuras:
@@ -149,7 +261,9 @@ def get_habitaciones(db: Session) -> list[dict]:
                 "nombre_cliente": reserva_futura.cliente.nombre_completo if reserva_futura.cliente else "Cliente desconocido"
             }
             hab_dict["proximas_reservas"].append(reserva_info)
-            print(f"[DEBUG]   └─ Próxima: {reserva_info['nombre_cliente']} ({reserva_futura.fecha_entrada} - {reserva_futura.fecha_salida})")
+            if debug:
+                logger.debug("  └─ Próxima: %s (%s - %s)", reserva_info["nombre_cliente"],
+                             reserva_futura.fecha_entrada, reserva_futura.fecha_salida)
         
         resultado.append(hab_dict)
     
@@ -160,6 +274,7 @@ def update_habitacion_estado(db: Session, habitacion_id: int, nuevo_estado: str)
     habitacion = get_habitacion(db, habitacion_id)
     if habitacion:
         habitacion.estado = nuevo_estado
+        _registrar_cambio(db, "habitacion", "estado_cambiado", habitacion)
         db.commit()
         db.refresh(habitacion)
     return habitacion
@@ -177,17 +292,37 @@ def update_habitacion(db: Session, habitacion_id: int, habitacion_data: Habitaci
         Habitación actualizada
     
     Raises:
-        ValueError: Si la habitación no existe
+        ValueError: Si la habitación no existe o el tipo no es válido
     """
     habitacion = get_habitacion(db, habitacion_id)
     if not habitacion:
         raise ValueError(f"Habitación con ID {habitacion_id} no encontrada")
     
+    try:
+        tipo_nuevo = TipoHabitacion(habitacion_data.tipo)
+    except ValueError:
+        raise ValueError(f"Tipo de habitación inválido: {habitacion_data.tipo}")
+    
+    tipo_anterior = habitacion.tipo
     habitacion.numero = habitacion_data.numero
     habitacion.tipo = habitacion_data.tipo
     habitacion.precio_base = habitacion_data.precio_base
     habitacion.estado = habitacion_data.estado
     
+    if tipo_nuevo != tipo_anterior:
+        # Las noches de sus reservas pasan de un tipo al otro en el inventario diario
+        deltas = defaultdict(lambda: [0, 0])
+        for fila in db.execute(
+            select(Reserva.fecha_entrada, Reserva.fecha_salida, Reserva.estado).where(
+                Reserva.habitacion_id == habitacion_id,
+                Reserva.estado != EstadoReserva.CANCELADA
+            )
+        ):
+            _sumar_noches(deltas, tipo_anterior, fila.fecha_entrada, fila.fecha_salida, fila.estado, -1)
+            _sumar_noches(deltas, tipo_nuevo, fila.fecha_entrada, fila.fecha_salida, fila.estado, 1)
+        _aplicar_inventario(db, deltas)
+    
+    _registrar_cambio(db, "habitacion", "actualizada", habitacion)
     db.commit()
     db.refresh(habitacion)
     return habitacion
@@ -214,6 +349,7 @@ def create_cliente(db: Session, cliente: ClienteCreate) -> Cliente:
         telefono=cliente.telefono
     )
     db.add(db_cliente)
+    _registrar_cambio(db, "cliente", "creado", db_cliente)
     db.commit()
     db.refresh(db_cliente)
     return db_cliente
@@ -230,6 +366,78 @@ def get_clientes(db: Session) -> list[Cliente]:
     """Obtiene todos los clientes"""
     return db.query(Cliente).all()
 
+# Largo mínimo de un término para el índice trigram (los más cortos no generan trigramas)
+MIN_LARGO_TERMINO = 3
+
+# Por engine: si la base tiene el índice clientes_fts (migración 4, solo SQLite)
+_indice_clientes_por_engine = {}
+
+def _hay_indice_clientes(db: Session) -> bool:
+    engine = db.get_bind()
+    if engine not in _indice_clientes_por_engine:
+        _indice_clientes_por_engine[engine] = engine.dialect.name == "sqlite" and db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'")
+        ).first() is not None
+    return _indice_clientes_por_engine[engine]
+
+def _consulta_fts(texto: str) -> str:
+    """
+    Convierte lo que escribió el usuario en una consulta FTS5: cada término de
+    3+ caracteres entre comillas (se busca como fragmento literal) y todos obligatorios.
+    Devuelve None si no queda ningún término utilizable.
+    """
+    terminos = [t for t in texto.split() if len(t) >= MIN_LARGO_TERMINO]
+    if not terminos:
+        return None
+    return " ".join('"' + termino.replace('"', '""') + '"' for termino in terminos)
+
+def _filtro_clientes(db: Session, texto: str):
+    """
+    Condición SQL "el cliente coincide con `texto`" (nombre, DNI, email o teléfono).
+    Usa el índice trigram si existe; si no (u otros motores), LIKE '%texto%'.
+    """
+    consulta = _consulta_fts(texto)
+    if consulta and _hay_indice_clientes(db):
+        return Cliente.id.in_(
+            text("SELECT rowid FROM clientes_fts WHERE clientes_fts MATCH :consulta")
+            .bindparams(consulta=consulta)
+            .columns(column("rowid", Integer))
+        )
+    patron = f"%{texto.strip()}%"
+    return or_(
+        Cliente.nombre_completo.ilike(patron),
+        Cliente.dni.ilike(patron),
+        Cliente.email.ilike(patron),
+        Cliente.telefono.ilike(patron)
+    )
+
+def buscar_clientes(db: Session, texto: str, limite: int = 20) -> list[Cliente]:
+    """
+    Búsqueda de clientes para autocompletar, ordenada por relevancia (bm25 del índice FTS5).
+    
+    Args:
+        db: Sesión de base de datos
+        texto: Fragmento de nombre, DNI, email o teléfono
+        limite: Cantidad máxima de resultados
+    
+    Returns:
+        Lista de clientes, los más relevantes primero
+    """
+    consulta = _consulta_fts(texto)
+    if consulta and _hay_indice_clientes(db):
+        return db.scalars(select(Cliente).from_statement(
+            text(
+                "SELECT clientes.* FROM clientes_fts "
+                "JOIN clientes ON clientes.id = clientes_fts.rowid "
+                "WHERE clientes_fts MATCH :consulta "
+                "ORDER BY clientes_fts.rank LIMIT :limite"
+            ).bindparams(consulta=consulta, limite=limite)
+        )).all()
+    
+    return db.query(Cliente).filter(
+        _filtro_clientes(db, texto)
+    ).order_by(Cliente.nombre_completo).limit(limite).all()
+
 def update_cliente(db: Session, cliente_id: int, cliente_data: ClienteCreate) -> Cliente:
     """
     Actualiza los datos de un cliente existente.
@@ -254,6 +462,7 @@ def update_cliente(db: Session, cliente_id: int, cliente_data: ClienteCreate) ->
     cliente.email = cliente_data.email
     cliente.telefono = cliente_data.telefono
     
+    _registrar_cambio(db, "cliente", "actualizado", cliente)
     db.commit()
     db.refresh(cliente)
     return cliente
@@ -293,17 +502,14 @@ def check_availability(
         - Nueva solicitud: 1 a 5 de Diciembre → DISPONIBLE (termina cuando comienza la anterior)
     """
     
-    # Buscar si existe una reserva que se solape
-    reserva_solapada = db.query(Reserva).filter(
-        Reserva.habitacion_id == habitacion_id,
-        Reserva.estado != EstadoReserva.CANCELADA,  # Ignorar reservas canceladas
-        # FÓRMULA DE SOLAPAMIENTO:
-        Reserva.fecha_entrada < fecha_salida,
-        Reserva.fecha_salida > fecha_entrada
-    ).first()
+    # Buscar si existe una reserva que se solape, en el índice en memoria
+    # (solo tiene reservas no canceladas; ver disponibilidad.py). FÓRMULA DE SOLAPAMIENTO:
+    # Reserva.fecha_entrada < fecha_salida AND Reserva.fecha_salida > fecha_entrada
+    foto = indice_disponibilidad.obtener(db)
+    reservas_solapadas = foto.linea(habitacion_id).solapadas(fecha_entrada, fecha_salida)
     
     # Si NO hay solapamiento, la habitación está disponible
-    return reserva_solapada is None
+    return not reservas_solapadas
 
 def check_availability_excluding_reserva(
     db: Session,
@@ -316,124 +522,249 @@ def check_availability_excluding_reserva(
     Verifica disponibilidad excluyendo una reserva específica.
     Útil para editar una reserva existente sin que ella misma cause conflicto.
     """
-    reserva_solapada = db.query(Reserva).filter(
-        Reserva.habitacion_id == habitacion_id,
-        Reserva.id != reserva_id_excluir,  # Excluir la reserva que estamos editando
-        Reserva.estado != EstadoReserva.CANCELADA,
-        Reserva.estado != EstadoReserva.FINALIZADA,
-        Reserva.fecha_entrada < fecha_salida,
-        Reserva.fecha_salida > fecha_entrada
-    ).first()
-    
-    return reserva_solapada is None
+    foto = indice_disponibilidad.obtener(db)
+    return not any(
+        reserva.id != reserva_id_excluir  # Excluir la reserva que estamos editando
+        and reserva.estado != EstadoReserva.FINALIZADA
+        for reserva in foto.linea(habitacion_id).solapadas(fecha_entrada, fecha_salida)
+    )
 
 def get_habitaciones_disponibles(
     db: Session,
     fecha_entrada: date,
-    fecha_salida: date
+    fecha_salida: date,
+    tipo: str = None,
+    precio_max: float = None,
+    habitacion_id: int = None
 ) -> list[Habitacion]:
     """
     Obtiene todas las habitaciones disponibles en un rango de fechas.
     
+    Se resuelve con el índice de disponibilidad en memoria (ver disponibilidad.py):
+    una búsqueda binaria en la línea de tiempo de cada habitación, sin consultar
+    reservas en SQLite. Equivale a:
+    
+        SELECT * FROM habitaciones h
+        WHERE NOT EXISTS (
+            SELECT 1 FROM reservas r
+            WHERE r.habitacion_id = h.id AND r.estado != 'CANCELADA'
+              AND r.fecha_entrada < :salida AND r.fecha_salida > :entrada
+        )
+    
     Args:
         db: Sesión de base de datos
         fecha_entrada: Fecha de entrada
         fecha_salida: Fecha de salida
+        tipo: (Opcional) Filtrar por tipo de habitación (SIMPLE, DOBLE, TRIPLE, SUITE)
+        precio_max: (Opcional) Filtrar por precio_base <= precio_max
+        habitacion_id: (Opcional) Limitar la búsqueda a una habitación específica
     
     Returns:
-        Lista de habitaciones disponibles
-    """
-    habitaciones = get_habitaciones(db)
-    disponibles = []
-    
-    for hab in habitaciones:
-        if check_availability(db, hab.id, fecha_entrada, fecha_salida):
-            disponibles.append(hab)
+        Lista de habitaciones disponibles (copias inmutables del índice), ordenadas por ID
     
-    return disponibles
+    Raises:
+        ValueError: Si el tipo de habitación no es válido
+    """
+    tipo_buscado = None
+    if tipo:
+        try:
+            tipo_buscado = TipoHabitacion(tipo.upper())
+        except ValueError:
+            raise ValueError(f"Tipo de habitación inválido: {tipo}")
+    
+    foto = indice_disponibilidad.obtener(db)
+    if habitacion_id:
+        candidatas = [foto.habitaciones[habitacion_id]] if habitacion_id in foto.habitaciones else []
+    else:
+        candidatas = foto.habitaciones_ordenadas()
+    
+    return [
+        habitacion for habitacion in candidatas
+        if (tipo_buscado is None or habitacion.tipo == tipo_buscado)
+        and (precio_max is None or habitacion.precio_base <= precio_max)
+        and not foto.linea(habitacion.id).solapadas(fecha_entrada, fecha_salida)
+    ]
 
 # ============================================================================
 # FUNCIONES: RESERVAS
 # ============================================================================
 
-def actualizar_reservas_vencidas(db: Session) -> int:
+def actualizar_reservas_vencidas(db: Session, hoy: date = None) -> int:
     """
     Actualiza automáticamente las reservas en CHECKIN cuya fecha de salida ya pasó.
-    Las marca como FINALIZADA.
+    Las marca como FINALIZADA con un único UPDATE masivo.
     
     NOTA: Las reservas PENDIENTES NO se cancelan automáticamente ya que no hay
     sistema de check-in implementado. El usuario debe cancelarlas manualmente si es necesario.
     
+    NOTA: No se llama en cada lectura; la ejecuta la auditoría nocturna
+    (ver auditoria.py) una vez por fecha de negocio.
+    
+    Args:
+        db: Sesión de base de datos
+        hoy: Fecha de negocio de referencia (por defecto, hoy)
+    
     Returns:
         Número de reservas actualizadas
     """
-    from datetime import date as date_class
-    hoy = date_class.today()
-    contador = 0
+    hoy = hoy or date.today()
     
     # Solo actualizar reservas en CHECKIN cuya fecha de salida ya pasó → FINALIZADA
-    reservas_vencidas = db.query(Reserva).filter(
-        Reserva.estado == EstadoReserva.CHECKIN,
-        Reserva.fecha_salida < hoy
-    ).all()
-    
-    for reserva in reservas_vencidas:
-        reserva.estado = EstadoReserva.FINALIZADA
-        print(f"[AUTO] Reserva #{reserva.id} marcada como FINALIZADA (fecha salida: {reserva.fecha_salida})")
-        contador += 1
+    # (RETURNING devuelve los IDs para el outbox sin una consulta extra).
+    # El inventario diario no cambia: CHECKIN y FINALIZADA cuentan ambas como vendidas.
+    finalizadas = db.execute(
+        update(Reserva)
+        .where(Reserva.estado == EstadoReserva.CHECKIN, Reserva.fecha_salida < hoy)
+        .values(estado=EstadoReserva.FINALIZADA)
+        .returning(Reserva.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    contador = len(finalizadas)
     
     if contador > 0:
-        db.commit()
-        print(f"[AUTO] Total de {contador} reservas actualizadas automáticamente")
+        _anotar_cambios(db, "reserva", "finalizada_auditoria", finalizadas)
+        eventos.encolar(db, "reserva.finalizadas_auditoria", {
+            "entidad": "reserva",
+            "accion": "finalizadas_auditoria",
+            "datos": {"reservas_finalizadas": contador, "ids": finalizadas}
+        })
+        logger.info("Total de %d reservas marcadas como FINALIZADA", contador)
     
     return contador
 
 def create_reserva(
     db: Session,
-    reserva: ReservaCreate,
-    precio_total: float
+    reserva: ReservaCreate
 ) -> Reserva:
     """
-    Crea una nueva reserva en la base de datos.
+    Crea una nueva reserva verificando disponibilidad EN LA MISMA TRANSACCIÓN.
+    
+    Evita la doble reserva cuando dos recepcionistas reservan la misma habitación
+    a la vez: la verificación de solapamiento y el alta son un único INSERT condicional
+    dentro de una transacción BEGIN IMMEDIATE (toma el lock de escritura de SQLite
+    antes de leer, así nadie puede insertar entre la verificación y el alta):
     
-    IMPORTANTE: Esta función NO verifica disponibilidad.
-    La disponibilidad debe ser verificada ANTES de llamar a esta función
-    (Eso se hace en main.py con check_availability).
+        INSERT INTO reservas (...)
+        SELECT h.id, :cliente, :entrada, :salida, COALESCE(:precio_noche, h.precio_base) * :noches, 'PENDIENTE'
+        FROM habitaciones h
+        WHERE h.id = :habitacion
+          AND EXISTS (SELECT 1 FROM clientes WHERE id = :cliente)
+          AND NOT EXISTS (reserva no cancelada que se solape)
+        RETURNING id
+    
+    El precio total se calcula en la misma sentencia: precio_noche de la solicitud
+    o, si no se envió, el precio_base de la habitación, por la cantidad de noches.
     
     Args:
         db: Sesión de base de datos
-        reserva: Datos de la reserva a crear
-        precio_total: Precio total ya calculado
+        reserva: Datos de la reserva a crear (fechas ya validadas)
     
     Returns:
-        Objeto Reserva creado
-    """
-    db_reserva = Reserva(
-        habitacion_id=reserva.habitacion_id,
-        cliente_id=reserva.cliente_id,
-        fecha_entrada=reserva.fecha_entrada,
-        fecha_salida=reserva.fecha_salida,
-        precio_total=precio_total,
-        estado=EstadoReserva.PENDIENTE
+        Objeto Reserva creado (con cliente y habitación cargados),
+        o None si no se insertó (ver diagnosticar_reserva_rechazada)
+    """
+    noches = (reserva.fecha_salida - reserva.fecha_entrada).days
+    precio_noche = literal(reserva.precio_noche) if reserva.precio_noche else Habitacion.precio_base
+    
+    reserva_solapada = exists().where(
+        Reserva.habitacion_id == reserva.habitacion_id,
+        Reserva.estado != EstadoReserva.CANCELADA,
+        Reserva.fecha_entrada < reserva.fecha_salida,
+        Reserva.fecha_salida > reserva.fecha_entrada
     )
-    db.add(db_reserva)
+    cliente_existe = exists().where(Cliente.id == reserva.cliente_id)
+    
+    alta_condicional = insert(Reserva).from_select(
+        ["habitacion_id", "cliente_id", "fecha_entrada", "fecha_salida", "precio_total", "estado", "saldo"],
+        select(
+            Habitacion.id,
+            literal(reserva.cliente_id),
+            literal(reserva.fecha_entrada),
+            literal(reserva.fecha_salida),
+            precio_noche * noches,
+            literal(EstadoReserva.PENDIENTE, Reserva.estado.type),
+            precio_noche * noches  # Sin consumos todavía: el saldo es el alojamiento
+        ).where(
+            Habitacion.id == reserva.habitacion_id,
+            cliente_existe,
+            ~reserva_solapada
+        )
+    ).returning(*Reserva.__table__.c)
+    
+    _iniciar_transaccion_escritura(db)
+    fila = db.execute(alta_condicional).mappings().first()
+    if fila is None:
+        db.rollback()
+        return None
+    nuevo_id = fila["id"]
+    _registrar_cambio(db, "reserva", "creada", fila)
+    _ajustar_inventario(db, [], [
+        (fila["habitacion_id"], fila["fecha_entrada"], fila["fecha_salida"], fila["estado"])
+    ])
     db.commit()
-    db.refresh(db_reserva)
-    return db_reserva
+    
+    return db.query(Reserva).options(
+        joinedload(Reserva.cliente),
+        joinedload(Reserva.habitacion)
+    ).filter(Reserva.id == nuevo_id).first()
+
+def diagnosticar_reserva_rechazada(db: Session, reserva: ReservaCreate) -> tuple[int, str, str]:
+    """
+    Explica por qué create_reserva no insertó la reserva.
+    Solo se consulta en el camino de error, el alta exitosa no paga estas consultas.
+    
+    Returns:
+        Tupla (código HTTP, código de error, mensaje)
+    """
+    if not get_cliente(db, reserva.cliente_id):
+        return 404, "CLIENTE_NO_ENCONTRADO", "Cliente no encontrado"
+    if not get_habitacion(db, reserva.habitacion_id):
+        return 404, "HABITACION_NO_ENCONTRADA", "Habitación no encontrada"
+    return 409, "HABITACION_NO_DISPONIBLE", "La habitación no está disponible en esas fechas"
+
+def _iniciar_transaccion_escritura(db: Session) -> None:
+    """
+    En SQLite, abre la transacción con BEGIN IMMEDIATE para tomar el lock de
+    escritura de entrada. Si la sesión ya tiene una escritura en curso no hace nada.
+    """
+    conexion = db.connection()
+    if conexion.dialect.name != "sqlite":
+        return
+    if not conexion.connection.dbapi_connection.in_transaction:
+        conexion.exec_driver_sql("BEGIN IMMEDIATE")
 
 def get_reserva(db: Session, reserva_id: int) -> Reserva:
     """Obtiene una reserva por su ID"""
     return db.query(Reserva).filter(Reserva.id == reserva_id).first()
 
+# Columnas permitidas para ordenar GET /reservas ("-" adelante = descendente)
+ORDENES_RESERVAS = {
+    "id": Reserva.id,
+    "fecha_entrada": Reserva.fecha_entrada,
+    "fecha_salida": Reserva.fecha_salida,
+    "precio_total": Reserva.precio_total,
+}
+
 def get_reservas(
     db: Session,
     fecha_inicio: date = None,
     fecha_fin: date = None,
     cliente_id: int = None,
-    habitacion_id: int = None
+    habitacion_id: int = None,
+    after_id: int = None,
+    limit: int = None,
+    orden: str = "id"
 ) -> list[Reserva]:
     """
-    Obtiene reservas con filtros opcionales.
+    Obtiene reservas con filtros opcionales, paginación por cursor y orden en SQL.
+    
+    Cliente, habitación, consumos y el producto de cada consumo se cargan
+    de forma anticipada (joinedload / selectinload) para evitar N+1 al armar la respuesta.
+    
+    PAGINACIÓN POR CURSOR (keyset):
+    El cursor es el ID de la última reserva recibida (after_id). La página siguiente
+    empieza justo después de esa fila según el orden pedido, comparando la tupla
+    (columna_orden, id), por lo que no usa OFFSET y no se saltea ni repite filas.
     
     Args:
         db: Sesión de base de datos
@@ -441,11 +772,27 @@ def get_reservas(
         fecha_fin: Filtrar por fecha de salida <= fecha_fin
         cliente_id: Filtrar por cliente específico
         habitacion_id: Filtrar por habitación específica
+        after_id: (Opcional) ID de la última reserva de la página anterior
+        limit: (Opcional) Cantidad máxima de reservas a devolver
+        orden: Columna de orden (id, fecha_entrada, fecha_salida, precio_total),
+               con "-" adelante para orden descendente
     
     Returns:
         Lista de reservas que cumplen los criterios
+    
+    Raises:
+        ValueError: Si el orden no es válido o el cursor no existe
     """
-    query = db.query(Reserva)
+    descendente = orden.startswith("-")
+    columna = ORDENES_RESERVAS.get(orden.lstrip("-"))
+    if columna is None:
+        raise ValueError(f"Orden inválido: {orden}. Opciones: {', '.join(ORDENES_RESERVAS)}")
+    
+    query = db.query(Reserva).options(
+        joinedload(Reserva.cliente),
+        joinedload(Reserva.habitacion),
+        selectinload(Reserva.consumos).joinedload(Consumo.producto)
+    )
     
     if fecha_inicio:
         query = query.filter(Reserva.fecha_entrada >= fecha_inicio)
@@ -459,6 +806,27 @@ def get_reservas(
     if habitacion_id:
         query = query.filter(Reserva.habitacion_id == habitacion_id)
     
+    if after_id is not None:
+        if columna is Reserva.id:
+            valor_cursor = after_id
+        else:
+            valor_cursor = db.query(columna).filter(Reserva.id == after_id).scalar()
+            if valor_cursor is None:
+                raise ValueError(f"Cursor inválido: la reserva {after_id} no existe")
+        
+        if descendente:
+            query = query.filter(tuple_(columna, Reserva.id) < tuple_(valor_cursor, after_id))
+        else:
+            query = query.filter(tuple_(columna, Reserva.id) > tuple_(valor_cursor, after_id))
+    
+    if descendente:
+        query = query.order_by(columna.desc(), Reserva.id.desc())
+    else:
+        query = query.order_by(columna.asc(), Reserva.id.asc())
+    
+    if limit:
+        query = query.limit(limit)
+    
     return query.all()
 
 def get_reservas_por_cliente(db: Session, cliente_id: int) -> list[Reserva]:
@@ -469,27 +837,111 @@ def get_reservas_por_habitacion(db: Session, habitacion_id: int) -> list[Reserva
     """Obtiene todas las reservas de una habitación"""
     return get_reservas(db, habitacion_id=habitacion_id)
 
-def get_reservas_historial(db: Session):
-    """Obtiene reservas finalizadas o canceladas para el historial, ordenadas por las más recientes primero"""
-    reservas = db.query(Reserva).filter(
-        Reserva.estado.in_(['FINALIZADA', 'CANCELADA', 'CHECKOUT'])
-    ).order_by(Reserva.id.desc()).all()
+# Estados que forman el historial (estadías cerradas)
+ESTADOS_HISTORIAL = [EstadoReserva.FINALIZADA, EstadoReserva.CANCELADA, EstadoReserva.CHECKOUT]
+
+def get_reservas_historial(
+    db: Session,
+    busqueda: str = None,
+    desde: date = None,
+    hasta: date = None,
+    estado: str = None,
+    after_id: int = None,
+    limit: int = None
+) -> list[dict]:
+    """
+    Obtiene reservas finalizadas o canceladas para el historial, las más recientes primero.
     
-    resultado = []
-    for reserva in reservas:
-        resultado.append({
-            "id": reserva.id,
-            "habitacion_id": reserva.habitacion_id,
-            "cliente_id": reserva.cliente_id,
-            "fecha_entrada": reserva.fecha_entrada,
-            "fecha_salida": reserva.fecha_salida,
-            "precio_total": reserva.precio_total,
-            "estado": reserva.estado.value if hasattr(reserva.estado, 'value') else reserva.estado,
-            "cliente_nombre": reserva.cliente.nombre_completo if reserva.cliente else "Desconocido",
-            "cliente_dni": reserva.cliente.dni if reserva.cliente else "",
-            "habitacion_numero": reserva.habitacion.numero if reserva.habitacion else "N/A"
-        })
-    return resultado
+    Filtros, orden y paginación se resuelven en SQL, y cliente y habitación vienen
+    en el MISMO SELECT (JOIN), sin cargas perezosas por fila.
+    
+    Args:
+        db: Sesión de base de datos
+        busqueda: Texto a buscar en nombre del cliente, DNI o número de habitación
+        desde: Solo estadías que terminan en o después de esta fecha
+        hasta: Solo estadías que empiezan en o antes de esta fecha
+        estado: FINALIZADA, CANCELADA o CHECKOUT (por defecto, todos)
+        after_id: (Opcional) ID de la última reserva de la página anterior
+        limit: (Opcional) Cantidad máxima de reservas a devolver
+    
+    Returns:
+        Lista de diccionarios con estructura de ReservaHistorialResponse
+    
+    Raises:
+        ValueError: Si el estado no pertenece al historial
+    """
+    estados = ESTADOS_HISTORIAL
+    if estado:
+        estados = [e for e in ESTADOS_HISTORIAL if e.value == estado.upper()]
+        if not estados:
+            raise ValueError(
+                f"Estado inválido para el historial: {estado}. "
+                f"Opciones: {', '.join(e.value for e in ESTADOS_HISTORIAL)}"
+            )
+    
+    query = db.query(
+        Reserva.id,
+        Reserva.habitacion_id,
+        Reserva.cliente_id,
+        Reserva.fecha_entrada,
+        Reserva.fecha_salida,
+        Reserva.precio_total,
+        Reserva.estado,
+        Reserva.total_consumos,
+        Reserva.total_pagos,
+        Reserva.saldo,
+        Cliente.nombre_completo,
+        Cliente.dni,
+        Habitacion.numero
+    ).outerjoin(
+        Cliente, Reserva.cliente_id == Cliente.id
+    ).outerjoin(
+        Habitacion, Reserva.habitacion_id == Habitacion.id
+    ).filter(
+        Reserva.estado.in_(estados)
+    )
+    
+    if busqueda and busqueda.strip():
+        patron = f"%{busqueda.strip()}%"
+        query = query.filter(or_(
+            Cliente.nombre_completo.ilike(patron),
+            Cliente.dni.ilike(patron),
+            Habitacion.numero.ilike(patron)
+        ))
+    
+    if desde:
+        query = query.filter(Reserva.fecha_salida >= desde)
+    
+    if hasta:
+        query = query.filter(Reserva.fecha_entrada <= hasta)
+    
+    # Cursor: el orden es por ID descendente, la página siguiente son IDs menores
+    if after_id is not None:
+        query = query.filter(Reserva.id < after_id)
+    
+    query = query.order_by(Reserva.id.desc())
+    
+    if limit:
+        query = query.limit(limit)
+    
+    return [
+        {
+            "id": fila.id,
+            "habitacion_id": fila.habitacion_id,
+            "cliente_id": fila.cliente_id,
+            "fecha_entrada": fila.fecha_entrada,
+            "fecha_salida": fila.fecha_salida,
+            "precio_total": fila.precio_total,
+            "estado": fila.estado.value,
+            "total_consumos": fila.total_consumos,
+            "total_pagos": fila.total_pagos,
+            "saldo": fila.saldo,
+            "cliente_nombre": fila.nombre_completo or "Desconocido",
+            "cliente_dni": fila.dni or "",
+            "habitacion_numero": fila.numero or "N/A"
+        }
+        for fila in query
+    ]
 
 def checkout_reserva(db: Session, reserva_id: int):
     """
@@ -501,6 +953,7 @@ def checkout_reserva(db: Session, reserva_id: int):
         return None
     
     hoy = date.today()
+    huella_anterior = _huella_inventario(reserva)
     
     # Si checkout es antes de la fecha de salida prevista, ajustar
     if reserva.fecha_salida > hoy:
@@ -516,6 +969,7 @@ def checkout_reserva(db: Session, reserva_id: int):
         if noches < 1:
             noches = 1
         reserva.precio_total = noches * precio_noche_original
+        _recalcular_saldo(reserva)
     
     # Cambiar estado a FINALIZADA
     reserva.estado = EstadoReserva.FINALIZADA
@@ -524,6 +978,10 @@ def checkout_reserva(db: Session, reserva_id: int):
     if reserva.habitacion:
         reserva.habitacion.estado = EstadoHabitacion.DISPONIBLE
     
+    _registrar_cambio(db, "reserva", "checkout", reserva)
+    _ajustar_inventario(db, [huella_anterior], [_huella_inventario(reserva)])
+    if reserva.habitacion:
+        _registrar_cambio(db, "habitacion", "estado_cambiado", reserva.habitacion)
     db.commit()
     db.refresh(reserva)
     return reserva
@@ -560,6 +1018,7 @@ def delete_habitacion(db: Session, habitacion_id: int) -> bool:
         raise ValueError(f"No se puede eliminar: la habitación tiene {reservas} reserva(s) asociada(s)")
     
     db.delete(habitacion)
+    _registrar_cambio(db, "habitacion", "eliminada", habitacion)
     db.commit()
     return True
 
@@ -581,7 +1040,13 @@ def delete_reserva(db: Session, reserva_id: int) -> bool:
     if not reserva:
         raise ValueError(f"Reserva con ID {reserva_id} no encontrada")
     
+    # Sus consumos se borran en cascada: también van al outbox como bajas
+    consumos = list(reserva.consumos)
+    if consumos:
+        _registrar_cambios(db, "consumo", "eliminado", consumos)
     db.delete(reserva)
+    _registrar_cambio(db, "reserva", "eliminada", reserva)
+    _ajustar_inventario(db, [_huella_inventario(reserva)], [])
     db.commit()
     return True
 
@@ -600,6 +1065,7 @@ def update_reserva(db: Session, reserva_id: int, datos) -> Reserva:
     reserva = get_reserva(db, reserva_id)
     if not reserva:
         return None
+    huella_anterior = _huella_inventario(reserva)
     
     # Actualizar campos si se proporcionan
     if datos.fecha_entrada is not None:
@@ -613,6 +1079,7 @@ def update_reserva(db: Session, reserva_id: int, datos) -> Reserva:
     
     if datos.precio_total is not None:
         reserva.precio_total = datos.precio_total
+        _recalcular_saldo(reserva)
     
     if datos.estado is not None:
         # Convertir string a enum
@@ -625,6 +1092,8 @@ def update_reserva(db: Session, reserva_id: int, datos) -> Reserva:
         if datos.estado.upper() in estado_map:
             reserva.estado = estado_map[datos.estado.upper()]
     
+    _registrar_cambio(db, "reserva", "actualizada", reserva)
+    _ajustar_inventario(db, [huella_anterior], [_huella_inventario(reserva)])
     db.commit()
     db.refresh(reserva)
     return reserva
@@ -649,9 +1118,12 @@ def cancelar_reserva(db: Session, reserva_id: int) -> dict:
     if reserva.estado in [EstadoReserva.CHECKIN, EstadoReserva.FINALIZADA, EstadoReserva.CANCELADA]:
         return None
     
-    # Cambiar estado a CANCELADA
+    # Cambiar estado a CANCELADA (libera sus noches en el inventario)
+    huella_anterior = _huella_inventario(reserva)
     reserva.estado = EstadoReserva.CANCELADA
     
+    _registrar_cambio(db, "reserva", "cancelada", reserva)
+    _ajustar_inventario(db, [huella_anterior], [_huella_inventario(reserva)])
     db.commit()
     db.refresh(reserva)
     
@@ -666,6 +1138,7 @@ def cancelar_reserva(db: Session, reserva_id: int) -> dict:
 def delete_cliente(db: Session, cliente_id: int) -> bool:
     """
     Elimina un cliente si no tiene reservas activas.
+    Sus reservas CANCELADAS se eliminan con él (la clave foránea no permite dejarlas huérfanas).
     
     Args:
         db: Sesión de base de datos
@@ -690,7 +1163,16 @@ def delete_cliente(db: Session, cliente_id: int) -> bool:
     if reservas_activas > 0:
         raise ValueError(f"No se puede eliminar: el cliente tiene {reservas_activas} reserva(s) activa(s)")
     
+    for reserva in db.query(Reserva).filter(Reserva.cliente_id == cliente_id).all():
+        consumos = list(reserva.consumos)
+        if consumos:
+            _registrar_cambios(db, "consumo", "eliminado", consumos)
+        db.delete(reserva)
+        _registrar_cambio(db, "reserva", "eliminada", reserva)
+    db.flush()  # Las reservas se borran antes que el cliente que referencian
+    
     db.delete(cliente)
+    _registrar_cambio(db, "cliente", "eliminado", cliente)
     db.commit()
     return True
 
@@ -710,7 +1192,10 @@ def update_reserva_estado(db: Session, reserva_id: int, nuevo_estado: str) -> Re
     """
     reserva = get_reserva(db, reserva_id)
     if reserva:
+        huella_anterior = _huella_inventario(reserva)
         reserva.estado = nuevo_estado
+        _registrar_cambio(db, "reserva", "estado_cambiado", reserva)
+        _ajustar_inventario(db, [huella_anterior], [_huella_inventario(reserva)])
         db.commit()
         db.refresh(reserva)
     return reserva
@@ -773,7 +1258,8 @@ def get_habitaciones_por_fecha(db: Session, fecha_objetivo: date):
     todas_habitaciones = db.query(Habitacion).all()
     resultado = []
     
-    print(f"[DEBUG] get_habitaciones_por_fecha - Fecha objetivo: {fecha_objetivo}")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    logger.debug("get_habitaciones_por_fecha - Fecha objetivo: %s", fecha_objetivo)
     
     for habitacion in todas_habitaciones:
         # 1. Buscar si existe una reserva activa EN fecha_objetivo
@@ -823,7 +1309,8 @@ def get_habitaciones_por_fecha(db: Session, fecha_objetivo: date):
         # PASO 1: Respetar estados manuales de mantenimiento
         if estado_actual in ['MANTENIMIENTO', 'LIMPIEZA']:
             # Respetar la decisión manual del staff
-            print(f"[DEBUG] Habitación {habitacion.numero} en {fecha_objetivo}: {estado_actual} (manual del staff)")
+            if debug:
+                logger.debug("Habitación %s en %s: %s (manual del staff)", habitacion.numero, fecha_objetivo, estado_actual)
         # PASO 2: Si hay reserva EN fecha_objetivo, forzar estado a OCUPADA
         elif reserva_en_fecha:
             hab_dict["estado"] = 'OCUPADA'  # ← FORZADO por cálculo
@@ -844,11 +1331,14 @@ def get_habitaciones_por_fecha(db: Session, fecha_objetivo: date):
             ] if reserva_en_fecha.consumos else []
             if reserva_en_fecha.cliente:
                 hab_dict["nombre_cliente"] = reserva_en_fecha.cliente.nombre_completo
-            print(f"[DEBUG] Habitación {habitacion.numero} en {fecha_objetivo}: OCUPADA ({reserva_en_fecha.cliente.nombre_completo if reserva_en_fecha.cliente else 'Desconocido'})")
+            if debug:
+                logger.debug("Habitación %s en %s: OCUPADA (%s)", habitacion.numero, fecha_objetivo,
+                             hab_dict["nombre_cliente"] or "Desconocido")
         # PASO 3: Si NO hay reserva EN fecha_objetivo, forzar estado a DISPONIBLE
         else:
             hab_dict["estado"] = 'DISPONIBLE'  # ← FORZADO, ignora BD
-            print(f"[DEBUG] Habitación {habitacion.numero} en {fecha_objetivo}: DISPONIBLE")
+            if debug:
+                logger.debug("Habitación %s en %s: DISPONIBLE", habitacion.numero, fecha_objetivo)
         
         # Agregar próximas reservas después de la fecha objetivo
         for reserva_futura in reservas_futuras:
@@ -858,11 +1348,482 @@ def get_habitaciones_por_fecha(db: Session, fecha_objetivo: date):
                 "nombre_cliente": reserva_futura.cliente.nombre_completo if reserva_futura.cliente else "Cliente desconocido"
             }
             hab_dict["proximas_reservas"].append(reserva_info)
-            print(f"[DEBUG]   └─ Próxima: {reserva_info['nombre_cliente']} ({reserva_futura.fecha_entrada} - {reserva_futura.fecha_salida})")
+            if debug:
+                logger.debug("  └─ Próxima: %s (%s - %s)", reserva_info["nombre_cliente"],
+                             reserva_futura.fecha_entrada, reserva_futura.fecha_salida)
         
         resultado.append(hab_dict)
     
     return resultado
+
+
+def get_calendario_rango(db: Session, desde: date, hasta: date) -> dict:
+    """
+    Obtiene la matriz habitación × día de estados para un rango de fechas (ambos inclusive).
+    
+    Reemplaza N llamadas a get_habitaciones_por_fecha (una por día) por:
+    1. Las habitaciones y las reservas PENDIENTE/CHECKIN que se solapan con el rango,
+       tomadas del índice de disponibilidad en memoria (ver disponibilidad.py)
+    2. Una sola pasada sobre esas reservas marcando sus noches por desplazamiento
+       de día (offset = fecha - desde) en la fila de su habitación
+    
+    Estados por celda (mismo criterio que la Máquina del Tiempo):
+    - MANTENIMIENTO/LIMPIEZA: estado manual del staff, se respeta todo el rango
+      (los IDs de reserva se siguen informando para detectar conflictos)
+    - OCUPADA: huésped en CHECKIN esa noche
+    - RESERVADA: reserva PENDIENTE esa noche
+    - DISPONIBLE: sin reserva
+    
+    Args:
+        db: Sesión de base de datos
+        desde: Primer día del rango
+        hasta: Último día del rango (inclusive)
+    
+    Returns:
+        Diccionario compatible con CalendarioRangoResponse
+    """
+    dias = (hasta - desde).days + 1
+    
+    foto = indice_disponibilidad.obtener(db)
+    habitaciones = foto.habitaciones_ordenadas()
+    # Noches [desde, hasta] = rango [desde, hasta + 1 día)
+    reservas = [
+        (reserva.id, habitacion.id, reserva.fecha_entrada, reserva.fecha_salida, reserva.estado)
+        for habitacion in habitaciones
+        for reserva in foto.linea(habitacion.id).solapadas(desde, hasta + timedelta(days=1))
+        if reserva.estado in (EstadoReserva.PENDIENTE, EstadoReserva.CHECKIN)
+    ]
+    
+    filas = {
+        h.id: {
+            "id": h.id,
+            "numero": h.numero,
+            "tipo": h.tipo.value if hasattr(h.tipo, 'value') else str(h.tipo),
+            "estados": ['DISPONIBLE'] * dias,
+            "reservas": [None] * dias
+        }
+        for h in habitaciones
+    }
+    
+    for reserva_id, habitacion_id, fecha_entrada, fecha_salida, estado in reservas:
+        fila = filas.get(habitacion_id)
+        if fila is None:
+            continue
+        estado_celda = 'OCUPADA' if estado == EstadoReserva.CHECKIN else 'RESERVADA'
+        inicio = max((fecha_entrada - desde).days, 0)
+        fin = min((fecha_salida - desde).days, dias)
+        for offset in range(inicio, fin):
+            # Si hay reservas superpuestas gana la primera (por fecha de entrada)
+            if fila["reservas"][offset] is None:
+                fila["reservas"][offset] = reserva_id
+                fila["estados"][offset] = estado_celda
+    
+    # Respetar estados manuales de mantenimiento/limpieza en todo el rango
+    # (se conservan los IDs de reserva para que el staff vea el conflicto)
+    for h in habitaciones:
+        estado_manual = h.estado.value if hasattr(h.estado, 'value') else str(h.estado)
+        if estado_manual in ['MANTENIMIENTO', 'LIMPIEZA']:
+            filas[h.id]["estados"] = [estado_manual] * dias
+    
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "fechas": [desde + timedelta(days=i) for i in range(dias)],
+        "habitaciones": list(filas.values())
+    }
+
+# ============================================================================
+# FUNCIONES: INVENTARIO DIARIO (NOCHES POR FECHA Y TIPO)
+# ============================================================================
+
+# Columna del inventario donde cuenta cada noche según el estado de la reserva
+# (las canceladas no ocupan noches; el resto bloquea la habitación igual que en check_availability)
+_COLUMNA_INVENTARIO = {
+    EstadoReserva.PENDIENTE: 1,   # bloqueadas
+    EstadoReserva.CHECKIN: 0,     # vendidas
+    EstadoReserva.CHECKOUT: 0,
+    EstadoReserva.FINALIZADA: 0,
+}
+
+def _huella_inventario(reserva) -> tuple:
+    """Lo que el inventario necesita de una reserva: (habitacion_id, entrada, salida, estado)"""
+    return (reserva.habitacion_id, reserva.fecha_entrada, reserva.fecha_salida, reserva.estado)
+
+def _sumar_noches(deltas: dict, tipo: TipoHabitacion, fecha_entrada: date, fecha_salida: date, estado, signo: int) -> None:
+    columna = _COLUMNA_INVENTARIO.get(EstadoReserva(estado))
+    if columna is None:
+        return
+    fecha = fecha_entrada
+    while fecha < fecha_salida:
+        deltas[(fecha, tipo)][columna] += signo
+        fecha += timedelta(days=1)
+
+def _ajustar_inventario(db: Session, antes: list, despues: list) -> None:
+    """
+    Lleva al inventario diario el cambio de una o más reservas: resta las noches
+    de sus huellas anteriores (antes) y suma las nuevas (despues). Va en la misma
+    transacción que la escritura; las noches que no cambian no tocan la tabla.
+    
+    Args:
+        antes: Huellas (ver _huella_inventario) previas al cambio (vacía en un alta)
+        despues: Huellas posteriores al cambio (vacía en una baja)
+    """
+    ids_habitaciones = {huella[0] for huella in (*antes, *despues)}
+    if not ids_habitaciones:
+        return
+    tipos = dict(db.execute(
+        select(Habitacion.id, Habitacion.tipo).where(Habitacion.id.in_(ids_habitaciones))
+    ).all())
+    
+    deltas = defaultdict(lambda: [0, 0])
+    for signo, huellas in ((-1, antes), (1, despues)):
+        for habitacion_id, fecha_entrada, fecha_salida, estado in huellas:
+            if habitacion_id in tipos:
+                _sumar_noches(deltas, tipos[habitacion_id], fecha_entrada, fecha_salida, estado, signo)
+    _aplicar_inventario(db, deltas)
+
+def _aplicar_inventario(db: Session, deltas: dict) -> None:
+    """
+    Suma los deltas {(fecha, tipo): [vendidas, bloqueadas]} con un UPSERT relativo
+    (valor = valor + delta) en un solo executemany: dos escrituras simultáneas no se pisan.
+    """
+    filas = [
+        {"fecha": fecha, "tipo": tipo, "vendidas": vendidas, "bloqueadas": bloqueadas}
+        for (fecha, tipo), (vendidas, bloqueadas) in deltas.items()
+        if vendidas or bloqueadas
+    ]
+    if not filas:
+        return
+    
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_upsert
+    alta = insert_upsert(InventarioDiario)
+    db.execute(
+        alta.on_conflict_do_update(
+            index_elements=[InventarioDiario.fecha, InventarioDiario.tipo],
+            set_={
+                "vendidas": InventarioDiario.vendidas + alta.excluded.vendidas,
+                "bloqueadas": InventarioDiario.bloqueadas + alta.excluded.bloqueadas
+            }
+        ),
+        filas
+    )
+
+def reconstruir_inventario(db: Session) -> dict:
+    """
+    Recalcula el inventario diario completo desde las reservas y reemplaza el guardado.
+    
+    Returns:
+        Diccionario con las filas escritas y cuántas (fecha, tipo) no coincidían
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for fila in db.execute(
+        select(Habitacion.tipo, Reserva.fecha_entrada, Reserva.fecha_salida, Reserva.estado)
+        .join(Habitacion, Habitacion.id == Reserva.habitacion_id)
+        .where(Reserva.estado != EstadoReserva.CANCELADA)
+    ):
+        _sumar_noches(deltas, fila.tipo, fila.fecha_entrada, fila.fecha_salida, fila.estado, 1)
+    calculado = {clave: tuple(valores) for clave, valores in deltas.items() if any(valores)}
+    
+    guardado = {
+        (fila.fecha, fila.tipo): (fila.vendidas, fila.bloqueadas)
+        for fila in db.execute(select(InventarioDiario)).scalars()
+        if fila.vendidas or fila.bloqueadas
+    }
+    diferencias = sum(
+        1 for clave in calculado.keys() | guardado.keys()
+        if calculado.get(clave) != guardado.get(clave)
+    )
+    
+    db.execute(delete(InventarioDiario))
+    if calculado:
+        db.execute(insert(InventarioDiario), [
+            {"fecha": fecha, "tipo": tipo, "vendidas": vendidas, "bloqueadas": bloqueadas}
+            for (fecha, tipo), (vendidas, bloqueadas) in calculado.items()
+        ])
+    if diferencias:
+        logger.warning("Inventario reconstruido: %d (fecha, tipo) no coincidían", diferencias)
+    db.commit()
+    return {"filas": len(calculado), "diferencias": diferencias}
+
+def get_inventario(db: Session, desde: date, hasta: date) -> dict:
+    """
+    Noches vendidas, bloqueadas y libres por tipo de habitación para cada fecha
+    del rango (ambos inclusive). Lee el inventario diario con un solo recorrido
+    por rango de su clave primaria, más un conteo de habitaciones por tipo:
+    el costo depende de los días pedidos, no de la cantidad de reservas.
+    """
+    habitaciones_por_tipo = dict(db.execute(
+        select(Habitacion.tipo, func.count()).group_by(Habitacion.tipo)
+    ).all())
+    noches = {
+        (fila.fecha, fila.tipo): fila
+        for fila in db.execute(
+            select(InventarioDiario).where(InventarioDiario.fecha.between(desde, hasta))
+        ).scalars()
+    }
+    tipos_con_noches = {tipo for _, tipo in noches}
+    tipos = [tipo for tipo in TipoHabitacion if tipo in habitaciones_por_tipo or tipo in tipos_con_noches]
+    
+    dias = []
+    for i in range((hasta - desde).days + 1):
+        fecha = desde + timedelta(days=i)
+        fila_dia = []
+        for tipo in tipos:
+            fila = noches.get((fecha, tipo))
+            vendidas = fila.vendidas if fila else 0
+            bloqueadas = fila.bloqueadas if fila else 0
+            total = habitaciones_por_tipo.get(tipo, 0)
+            fila_dia.append({
+                "tipo": tipo.value,
+                "habitaciones": total,
+                "vendidas": vendidas,
+                "bloqueadas": bloqueadas,
+                "libres": total - vendidas - bloqueadas
+            })
+        dias.append({"fecha": fecha, "tipos": fila_dia})
+    
+    return {"desde": desde, "hasta": hasta, "dias": dias}
+
+# ============================================================================
+# FUNCIONES: INDICADORES DEL TABLERO (KPIs)
+# ============================================================================
+
+def _kpis_periodo(db: Session, desde: date, hasta: date, habitaciones: int) -> dict:
+    """
+    Ocupación, ADR y RevPAR de las noches [desde, hasta] (ambos inclusive).
+    
+    Se leen solo las reservas no canceladas que se solapan con el rango (fechas,
+    precio y estado) y las noches se cuentan con aritmética de fechas en Python,
+    así no depende de funciones de fecha de un motor en particular.
+    
+    Las noches se separan igual que en el inventario diario: vendidas
+    (CHECKIN/CHECKOUT/FINALIZADA) y bloqueadas (PENDIENTE). Ocupación, ADR y
+    RevPAR usan solo las vendidas, cada una con la parte proporcional del precio
+    de su reserva (precio_total / noches × noches en el rango); las bloqueadas
+    se informan aparte.
+    """
+    fin = hasta + timedelta(days=1)
+    filas = db.execute(
+        select(Reserva.fecha_entrada, Reserva.fecha_salida, Reserva.precio_total, Reserva.estado).where(
+            Reserva.estado != EstadoReserva.CANCELADA,
+            Reserva.fecha_entrada < fin,
+            Reserva.fecha_salida > desde
+        )
+    ).all()
+    
+    noches_vendidas = 0
+    noches_bloqueadas = 0
+    ingresos = 0.0
+    for entrada, salida, precio_total, estado in filas:
+        noches_en_rango = (min(salida, fin) - max(entrada, desde)).days
+        if noches_en_rango <= 0:
+            continue  # Checkout el mismo día de la entrada: no ocupa ninguna noche
+        if estado == EstadoReserva.PENDIENTE:
+            noches_bloqueadas += noches_en_rango
+            continue
+        noches_vendidas += noches_en_rango
+        ingresos += (precio_total or 0) * noches_en_rango / (salida - entrada).days
+    
+    habitaciones_noche = habitaciones * ((hasta - desde).days + 1)
+    
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "habitaciones_noche": habitaciones_noche,
+        "noches_vendidas": noches_vendidas,
+        "noches_bloqueadas": noches_bloqueadas,
+        "ingresos_alojamiento": round(ingresos, 2),
+        # Ocupación (%) = noches vendidas / noches disponibles
+        "ocupacion": round(100 * noches_vendidas / habitaciones_noche, 1) if habitaciones_noche else 0.0,
+        # ADR = ingreso por noche vendida; RevPAR = ingreso por noche disponible
+        "adr": round(ingresos / noches_vendidas, 2) if noches_vendidas else 0.0,
+        "revpar": round(ingresos / habitaciones_noche, 2) if habitaciones_noche else 0.0
+    }
+
+def get_kpis(db: Session, desde: date = None, hasta: date = None, hoy: date = None) -> dict:
+    """
+    Indicadores del tablero calculados con consultas agregadas (sin recorrer
+    habitaciones en Python; de cada rango solo se leen las reservas que se solapan):
+    1. Habitaciones por estado, con las mismas reglas que el tablero (get_habitaciones):
+       MANTENIMIENTO/LIMPIEZA manuales; si no, OCUPADA con una reserva en CHECKIN
+       que cubre hoy, RESERVADA con una PENDIENTE, y DISPONIBLE en el resto
+    2. Llegadas, salidas y huéspedes en casa de hoy (sumas condicionales en una consulta)
+    3. Ocupación, ADR y RevPAR de la noche de hoy y, si se pide, de un rango
+    
+    Args:
+        db: Sesión de base de datos
+        desde: (Opcional) Primera noche del rango
+        hasta: (Opcional) Última noche del rango (por defecto, igual a desde)
+        hoy: Fecha de negocio de referencia (por defecto, hoy)
+    
+    Returns:
+        Diccionario con habitaciones, movimientos, hoy y rango (None si no se pidió)
+    """
+    hoy = hoy or date.today()
+    
+    # Una fila por habitación con reserva que cubre hoy (entrada <= hoy < salida):
+    # en_casa = 1 si alguna está en CHECKIN, 0 si solo hay PENDIENTE
+    reserva_hoy = select(
+        Reserva.habitacion_id,
+        func.max(case((Reserva.estado == EstadoReserva.CHECKIN, 1), else_=0)).label("en_casa")
+    ).where(
+        Reserva.estado.in_([EstadoReserva.PENDIENTE, EstadoReserva.CHECKIN]),
+        Reserva.fecha_entrada <= hoy,
+        Reserva.fecha_salida > hoy
+    ).group_by(Reserva.habitacion_id).subquery()
+    estado_tablero = case(
+        (Habitacion.estado == EstadoHabitacion.MANTENIMIENTO, EstadoHabitacion.MANTENIMIENTO.value),
+        (Habitacion.estado == EstadoHabitacion.LIMPIEZA, EstadoHabitacion.LIMPIEZA.value),
+        (reserva_hoy.c.en_casa == 1, EstadoHabitacion.OCUPADA.value),
+        (reserva_hoy.c.en_casa == 0, EstadoHabitacion.RESERVADA.value),
+        else_=EstadoHabitacion.DISPONIBLE.value
+    )
+    por_estado = dict(db.execute(
+        select(estado_tablero, func.count())
+        .select_from(Habitacion)
+        .outerjoin(reserva_hoy, reserva_hoy.c.habitacion_id == Habitacion.id)
+        .group_by(estado_tablero)
+    ).all())
+    total_habitaciones = sum(por_estado.values())
+    
+    def contar(*condiciones):
+        return func.coalesce(func.sum(case((and_(*condiciones), 1), else_=0)), 0)
+    
+    movimientos = db.execute(
+        select(
+            contar(Reserva.fecha_entrada == hoy,
+                   Reserva.estado.in_([EstadoReserva.PENDIENTE, EstadoReserva.CHECKIN])),
+            contar(Reserva.fecha_entrada == hoy, Reserva.estado == EstadoReserva.PENDIENTE),
+            contar(Reserva.fecha_salida == hoy, Reserva.estado != EstadoReserva.CANCELADA,
+                   Reserva.estado != EstadoReserva.PENDIENTE),
+            contar(Reserva.fecha_salida == hoy, Reserva.estado == EstadoReserva.CHECKIN),
+            contar(Reserva.estado == EstadoReserva.CHECKIN)
+        ).where(or_(
+            Reserva.fecha_entrada == hoy,
+            Reserva.fecha_salida == hoy,
+            Reserva.estado == EstadoReserva.CHECKIN
+        ))
+    ).one()
+    
+    rango = None
+    if desde is not None:
+        rango = _kpis_periodo(db, desde, hasta or desde, total_habitaciones)
+    
+    return {
+        "fecha": hoy,
+        "habitaciones": {
+            "total": total_habitaciones,
+            "por_estado": {estado.value: por_estado.get(estado.value, 0) for estado in EstadoHabitacion}
+        },
+        "movimientos": {
+            "llegadas": movimientos[0],
+            "llegadas_pendientes": movimientos[1],
+            "salidas": movimientos[2],
+            "salidas_pendientes": movimientos[3],
+            "en_casa": movimientos[4]
+        },
+        "hoy": _kpis_periodo(db, hoy, hoy, total_habitaciones),
+        "rango": rango
+    }
+
+# ============================================================================
+# FUNCIONES: SINCRONIZACIÓN INCREMENTAL (OUTBOX)
+# ============================================================================
+
+# Acciones del outbox que significan que la fila ya no existe
+ACCIONES_BAJA = {"eliminada", "eliminado"}
+
+def get_cambios(db: Session, desde: int = None, limite: int = 500) -> dict:
+    """
+    Devuelve lo que cambió después del seq `desde`, con el estado ACTUAL de cada fila.
+    El costo depende de la cantidad de cambios, no del tamaño del historial:
+    una consulta al outbox y una consulta IN por tipo de entidad.
+    
+    Args:
+        db: Sesión de base de datos
+        desde: Último seq que el cliente ya aplicó (None = solo informar la posición actual)
+        limite: Máximo de entradas del outbox a procesar; si hay más, hay_mas = True
+                y el cliente repite la llamada con desde = hasta
+    
+    Returns:
+        Diccionario con desde, hasta, hay_mas, las filas cambiadas por entidad y los eliminados
+    
+    Raises:
+        ValueError: Si los cambios posteriores a `desde` ya se purgaron (hay que recargar todo)
+    """
+    primero, ultimo = db.query(func.min(Cambio.seq), func.max(Cambio.seq)).one()
+    resultado = {
+        "desde": desde,
+        "hasta": ultimo or 0,
+        "hay_mas": False,
+        "habitaciones": [],
+        "clientes": [],
+        "reservas": [],
+        "consumos": [],
+        "productos": [],
+        "eliminados": []
+    }
+    if desde is None:
+        return resultado
+    
+    if primero is not None and desde < primero - 1:
+        raise ValueError(f"Los cambios posteriores a {desde} ya no están disponibles; recargar todo")
+    
+    entradas = db.query(Cambio).filter(Cambio.seq > desde).order_by(Cambio.seq).limit(limite + 1).all()
+    resultado["hay_mas"] = len(entradas) > limite
+    entradas = entradas[:limite]
+    resultado["hasta"] = entradas[-1].seq if entradas else desde
+    
+    # Solo importa la última acción sobre cada fila
+    ultima_accion = {}
+    for entrada in entradas:
+        ultima_accion[(entrada.entidad, entrada.entidad_id)] = entrada.accion
+    
+    ids_por_entidad = defaultdict(set)
+    for (entidad, entidad_id), accion in ultima_accion.items():
+        if accion in ACCIONES_BAJA:
+            resultado["eliminados"].append({"entidad": entidad, "id": entidad_id})
+        else:
+            ids_por_entidad[entidad].add(entidad_id)
+    
+    consultas = {
+        "habitacion": ("habitaciones", db.query(Habitacion)),
+        "cliente": ("clientes", db.query(Cliente)),
+        "reserva": ("reservas", db.query(Reserva).options(
+            joinedload(Reserva.cliente),
+            joinedload(Reserva.habitacion),
+            selectinload(Reserva.consumos).joinedload(Consumo.producto)
+        )),
+        "consumo": ("consumos", db.query(Consumo)),
+        "producto": ("productos", db.query(Producto)),
+    }
+    for entidad, ids in ids_por_entidad.items():
+        clave, query = consultas[entidad]
+        modelo = query.column_descriptions[0]["entity"]
+        filas = query.filter(modelo.id.in_(ids)).order_by(modelo.id).all()
+        resultado[clave] = filas
+        # Borrada por un cambio que todavía no llegó en esta página
+        for faltante in sorted(ids - {fila.id for fila in filas}):
+            resultado["eliminados"].append({"entidad": entidad, "id": faltante})
+    
+    return resultado
+
+def purgar_cambios(db: Session, antes_de: datetime) -> int:
+    """
+    Borra del outbox las entradas registradas antes de `antes_de`.
+    Siempre conserva la última, para que GET /cambios siga informando la posición actual.
+    No hace commit (lo hace quien llama).
+    """
+    ultimo = db.query(func.max(Cambio.seq)).scalar()
+    if ultimo is None:
+        return 0
+    return db.execute(
+        delete(Cambio).where(Cambio.registrado_en < antes_de, Cambio.seq < ultimo)
+    ).rowcount
+
 # ===================== PRODUCTOS =====================
 
 def create_producto(db: Session, producto: ProductoCreate):
@@ -872,18 +1833,17 @@ def create_producto(db: Session, producto: ProductoCreate):
         activo=producto.activo if producto.activo is not None else True
     )
     db.add(db_producto)
+    _registrar_cambio(db, "producto", "creado", db_producto)
     db.commit()
     db.refresh(db_producto)
     return db_producto
 
 def get_productos(db: Session, solo_activos: bool = False):
-    query = db.query(Producto)
-    if solo_activos:
-        query = query.filter(Producto.activo == True)
-    return query.order_by(Producto.nombre).all()
+    """Productos ordenados por nombre, desde el catálogo en memoria (ver catalogo.py)"""
+    return catalogo_productos.obtener(db).listar(solo_activos)
 
 def get_producto(db: Session, producto_id: int):
-    return db.query(Producto).filter(Producto.id == producto_id).first()
+    return catalogo_productos.obtener(db).por_id.get(producto_id)
 
 def update_producto(db: Session, producto_id: int, producto: ProductoCreate):
     db_producto = db.query(Producto).filter(Producto.id == producto_id).first()
@@ -891,26 +1851,111 @@ def update_producto(db: Session, producto_id: int, producto: ProductoCreate):
         db_producto.nombre = producto.nombre
         db_producto.precio = producto.precio
         db_producto.activo = producto.activo if producto.activo is not None else db_producto.activo
+        _registrar_cambio(db, "producto", "actualizado", db_producto)
         db.commit()
         db.refresh(db_producto)
     return db_producto
 
 def delete_producto(db: Session, producto_id: int):
+    """
+    Elimina un producto. Si ya tiene consumos cargados (la clave foránea los
+    protege) solo se desactiva: deja de ofrecerse en el POS y los folios lo conservan.
+    
+    Returns:
+        "eliminado", "desactivado" o None si no existe
+    """
     db_producto = db.query(Producto).filter(Producto.id == producto_id).first()
-    if db_producto:
-        db.delete(db_producto)
+    if not db_producto:
+        return None
+    
+    tiene_consumos = db.query(exists().where(Consumo.producto_id == producto_id)).scalar()
+    if tiene_consumos:
+        db_producto.activo = 0
+        _registrar_cambio(db, "producto", "actualizado", db_producto)
         db.commit()
-        return True
-    return False
+        return "desactivado"
+    
+    db.delete(db_producto)
+    _registrar_cambio(db, "producto", "eliminado", db_producto)
+    db.commit()
+    return "eliminado"
 
 # ===================== CONSUMOS =====================
 
+# Diferencia tolerada entre un total guardado y el recalculado (redondeo de Float)
+TOLERANCIA_FOLIO = 0.005
+
+def _importes_folio(cantidad: int, precio_unitario: float) -> tuple[float, float]:
+    """(cargo, pago) que aporta un consumo: con precio negativo es un pago (seña, pago a cuenta)"""
+    subtotal = cantidad * precio_unitario
+    if precio_unitario < 0:
+        return 0.0, -subtotal
+    return subtotal, 0.0
+
+def _ajustar_folio(db: Session, reserva_id: int, cargos: float, pagos: float) -> None:
+    """
+    Suma (o resta, con valores negativos) importes a los totales del folio de una reserva.
+    Es un UPDATE relativo (total = total + x), así dos cajas que cargan a la vez
+    sobre la misma reserva no se pisan. Va en la misma transacción que el consumo.
+    """
+    if not cargos and not pagos:
+        return
+    db.execute(
+        update(Reserva)
+        .where(Reserva.id == reserva_id)
+        .values(
+            total_consumos=Reserva.total_consumos + cargos,
+            total_pagos=Reserva.total_pagos + pagos,
+            saldo=Reserva.saldo + cargos - pagos
+        )
+    )
+    _anotar_cambios(db, "reserva", "folio_actualizado", [reserva_id], grupos=("tablero",))
+
+def _recalcular_saldo(reserva: Reserva) -> None:
+    """Actualiza el saldo cuando cambia el precio del alojamiento"""
+    reserva.saldo = reserva.precio_total + (reserva.total_consumos or 0) - (reserva.total_pagos or 0)
+
+def reconciliar_folios(db: Session) -> list[int]:
+    """
+    Recalcula total_consumos, total_pagos y saldo de todas las reservas desde
+    la tabla consumos y corrige las que no coinciden (un solo UPDATE).
+    
+    Returns:
+        IDs de las reservas corregidas
+    """
+    def suma(condicion):
+        return select(
+            func.coalesce(func.sum(Consumo.cantidad * Consumo.precio_unitario), 0.0)
+        ).where(Consumo.reserva_id == Reserva.id, condicion).scalar_subquery()
+    
+    cargos = suma(Consumo.precio_unitario > 0)
+    pagos = -suma(Consumo.precio_unitario < 0)
+    saldo = Reserva.precio_total + cargos - pagos
+    
+    corregidas = db.execute(
+        update(Reserva)
+        .where(or_(
+            func.abs(Reserva.total_consumos - cargos) > TOLERANCIA_FOLIO,
+            func.abs(Reserva.total_pagos - pagos) > TOLERANCIA_FOLIO,
+            func.abs(Reserva.saldo - saldo) > TOLERANCIA_FOLIO
+        ))
+        .values(total_consumos=cargos, total_pagos=pagos, saldo=saldo)
+        .returning(Reserva.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    
+    if corregidas:
+        _anotar_cambios(db, "reserva", "folio_reconciliado", corregidas, grupos=("tablero",))
+        logger.warning("Folios reconciliados: %d reservas tenían totales desactualizados", len(corregidas))
+    db.commit()
+    return corregidas
+
 def registrar_consumo(db: Session, reserva_id: int, producto_id: int, cantidad: int = 1):
     reserva = db.query(Reserva).filter(Reserva.id == reserva_id).first()
     if not reserva:
         return None
     
-    producto = db.query(Producto).filter(Producto.id == producto_id).first()
+    producto = catalogo_productos.obtener(db).por_id.get(producto_id)
     if not producto or not producto.activo:
         return None
     
@@ -922,6 +1967,8 @@ def registrar_consumo(db: Session, reserva_id: int, producto_id: int, cantidad:
         fecha_consumo=date.today()
     )
     db.add(db_consumo)
+    _ajustar_folio(db, reserva_id, *_importes_folio(cantidad, producto.precio))
+    _registrar_cambio(db, "consumo", "creado", db_consumo)
     db.commit()
     db.refresh(db_consumo)
     return db_consumo
@@ -936,8 +1983,8 @@ def registrar_consumo_manual(db: Session, reserva_id: int, concepto: str, cantid
         return None
     
     # Crear producto temporal/genérico para este concepto
-    # Buscar si ya existe un producto con ese nombre exacto
-    producto = db.query(Producto).filter(Producto.nombre == concepto).first()
+    # Buscar si ya existe un producto con ese nombre (sin distinguir mayúsculas ni espacios)
+    producto = catalogo_productos.obtener(db).por_nombre.get(normalizar_nombre(concepto))
     
     if not producto:
         # Crear nuevo producto
@@ -947,6 +1994,7 @@ def registrar_consumo_manual(db: Session, reserva_id: int, concepto: str, cantid
             activo=True
         )
         db.add(producto)
+        _registrar_cambio(db, "producto", "creado", producto)
         db.commit()
         db.refresh(producto)
     
@@ -959,17 +2007,113 @@ def registrar_consumo_manual(db: Session, reserva_id: int, concepto: str, cantid
         fecha_consumo=date.today()
     )
     db.add(db_consumo)
+    _ajustar_folio(db, reserva_id, *_importes_folio(cantidad, precio))
+    _registrar_cambio(db, "consumo", "creado", db_consumo)
     db.commit()
     db.refresh(db_consumo)
     return db_consumo
 
+def registrar_consumos_lote(db: Session, reserva_id: int, items: list) -> dict:
+    """
+    Registra un carrito completo (ticket del restaurante, importación del bar)
+    en UNA transacción: todas las líneas o ninguna.
+    
+    - Los productos se resuelven contra el catálogo en memoria (ver catalogo.py),
+      sin una consulta por línea.
+    - Las líneas manuales (concepto + precio) reutilizan el producto con ese nombre
+      o lo crean, como registrar_consumo_manual.
+    - Los totales del folio se ajustan una sola vez con la suma del carrito.
+    
+    Args:
+        db: Sesión de base de datos
+        reserva_id: ID de la reserva
+        items: Líneas con producto_id (precio de lista) o concepto + precio
+    
+    Returns:
+        Diccionario con los consumos creados y los totales del folio actualizados,
+        o None si la reserva no existe
+    
+    Raises:
+        ValueError: Si alguna línea es inválida (se indica el número de línea)
+    """
+    if not db.query(exists().where(Reserva.id == reserva_id)).scalar():
+        return None
+    
+    catalogo = catalogo_productos.obtener(db)
+    lineas = []  # (producto o nombre normalizado, concepto, cantidad, precio)
+    for numero, item in enumerate(items, start=1):
+        if item.producto_id is not None:
+            producto = catalogo.por_id.get(item.producto_id)
+            if not producto or not producto.activo:
+                raise ValueError(f"Línea {numero}: el producto {item.producto_id} no existe o está inactivo")
+            if item.cantidad < 1:
+                raise ValueError(f"Línea {numero}: la cantidad debe ser mayor a 0")
+            lineas.append((producto, None, item.cantidad, producto.precio))
+        elif item.concepto and item.concepto.strip():
+            if item.precio is None:
+                raise ValueError(f"Línea {numero}: falta el precio del ítem '{item.concepto}'")
+            clave = normalizar_nombre(item.concepto)
+            lineas.append((catalogo.por_nombre.get(clave) or clave, item.concepto.strip(), item.cantidad, item.precio))
+        else:
+            raise ValueError(f"Línea {numero}: indicar producto_id o concepto")
+    
+    # Productos nuevos de las líneas manuales (uno por nombre, aunque se repita)
+    nuevos = {}
+    for producto, concepto, _, precio in lineas:
+        if isinstance(producto, str) and producto not in nuevos:
+            nuevos[producto] = Producto(nombre=concepto, precio=precio, activo=True)
+    if nuevos:
+        db.add_all(nuevos.values())
+        # _registrar_cambios hace el flush que les asigna ID
+        _registrar_cambios(db, "producto", "creado", list(nuevos.values()))
+    
+    hoy = date.today()
+    filas = []
+    cargos = pagos = 0.0
+    for producto, _, cantidad, precio in lineas:
+        filas.append({
+            "reserva_id": reserva_id,
+            "producto_id": nuevos[producto].id if isinstance(producto, str) else producto.id,
+            "cantidad": cantidad,
+            "precio_unitario": precio,
+            "fecha_consumo": hoy
+        })
+        cargo, pago = _importes_folio(cantidad, precio)
+        cargos += cargo
+        pagos += pago
+    
+    # Un solo INSERT para todo el carrito; RETURNING trae las filas completas
+    # (no hace falta emparejar IDs con el orden de entrada)
+    creados = [
+        dict(fila) for fila in
+        db.execute(insert(Consumo).returning(*Consumo.__table__.c), filas).mappings()
+    ]
+    
+    _ajustar_folio(db, reserva_id, cargos, pagos)
+    _registrar_cambios(db, "consumo", "creado", creados)
+    db.commit()
+    
+    totales = db.execute(
+        select(Reserva.total_consumos, Reserva.total_pagos, Reserva.saldo).where(Reserva.id == reserva_id)
+    ).one()
+    return {
+        "reserva_id": reserva_id,
+        "consumos": creados,
+        "total_consumos": totales.total_consumos,
+        "total_pagos": totales.total_pagos,
+        "saldo": totales.saldo
+    }
+
 def get_consumos_reserva(db: Session, reserva_id: int):
     return db.query(Consumo).filter(Consumo.reserva_id == reserva_id).order_by(Consumo.fecha_consumo).all()
 
 def delete_consumo(db: Session, consumo_id: int):
     db_consumo = db.query(Consumo).filter(Consumo.id == consumo_id).first()
     if db_consumo:
+        cargo, pago = _importes_folio(db_consumo.cantidad, db_consumo.precio_unitario)
         db.delete(db_consumo)
+        _ajustar_folio(db, db_consumo.reserva_id, -cargo, -pago)
+        _registrar_cambio(db, "consumo", "eliminado", db_consumo)
         db.commit()
         return True
     return False
@@ -982,20 +2126,21 @@ def update_consumo(db: Session, consumo_id: int, cantidad: int = None, precio_un
     if not db_consumo:
         return None
     
+    cargo_anterior, pago_anterior = _importes_folio(db_consumo.cantidad, db_consumo.precio_unitario)
     if cantidad is not None:
         db_consumo.cantidad = cantidad
     if precio_unitario is not None:
         db_consumo.precio_unitario = precio_unitario
     
+    cargo, pago = _importes_folio(db_consumo.cantidad, db_consumo.precio_unitario)
+    _ajustar_folio(db, db_consumo.reserva_id, cargo - cargo_anterior, pago - pago_anterior)
+    _registrar_cambio(db, "consumo", "actualizado", db_consumo)
     db.commit()
     db.refresh(db_consumo)
     return db_consumo
 
-def get_cuenta_reserva(db: Session, reserva_id: int):
-    reserva = db.query(Reserva).filter(Reserva.id == reserva_id).first()
-    if not reserva:
-        return None
-    
+def _armar_cuenta(reserva: Reserva, lineas: list) -> dict:
+    """Cuenta de una reserva (estructura de CuentaResponse) a partir de sus líneas de consumo"""
     noches = (reserva.fecha_salida - reserva.fecha_entrada).days
     if noches < 1:
         noches = 1
@@ -1006,25 +2151,23 @@ def get_cuenta_reserva(db: Session, reserva_id: int):
     total_alojamiento = reserva.precio_total
     precio_noche = total_alojamiento / noches if noches > 0 else total_alojamiento
     
-    consumos = db.query(Consumo).filter(Consumo.reserva_id == reserva_id).all()
-    
-    consumos_detalle = []
-    total_consumos = 0
-    
-    for consumo in consumos:
-        subtotal = consumo.cantidad * consumo.precio_unitario
-        total_consumos += subtotal
-        consumos_detalle.append({
-            "id": consumo.id,
-            "producto_nombre": consumo.producto.nombre if consumo.producto else "Producto eliminado",
-            "cantidad": consumo.cantidad,
-            "precio_unitario": consumo.precio_unitario,
-            "subtotal": subtotal,
-            "fecha": consumo.fecha_consumo
-        })
+    consumos_detalle = [
+        {
+            "id": linea.id,
+            "producto_nombre": linea.nombre or "Producto eliminado",
+            "cantidad": linea.cantidad,
+            "precio_unitario": linea.precio_unitario,
+            "subtotal": linea.cantidad * linea.precio_unitario,
+            "fecha": linea.fecha_consumo
+        }
+        for linea in lineas
+    ]
+    
+    # Neto de consumos (los pagos restan), como siempre mostró la cuenta
+    total_consumos = reserva.total_consumos - reserva.total_pagos
     
     return {
-        "reserva_id": reserva_id,
+        "reserva_id": reserva.id,
         "habitacion_numero": habitacion.numero if habitacion else "N/A",
         "cliente_nombre": reserva.cliente.nombre_completo if reserva.cliente else "Cliente desconocido",
         "fecha_entrada": reserva.fecha_entrada,
@@ -1034,9 +2177,63 @@ def get_cuenta_reserva(db: Session, reserva_id: int):
         "total_alojamiento": total_alojamiento,
         "consumos": consumos_detalle,
         "total_consumos": total_consumos,
-        "total_general": total_alojamiento + total_consumos
+        "total_pagos": reserva.total_pagos,
+        "total_general": reserva.saldo
     }
 
+def get_cuentas_reservas(db: Session, reserva_ids: list[int]) -> list[dict]:
+    """
+    Cuentas de varias reservas con DOS consultas en total, sin importar cuántas sean:
+    las reservas (con cliente y habitación por JOIN) y todas sus líneas de consumo
+    (una consulta IN con el nombre del producto), agrupadas en memoria.
+    Los totales salen de las columnas del folio que mantiene crud en cada consumo.
+    
+    Args:
+        db: Sesión de base de datos
+        reserva_ids: IDs de las reservas (los repetidos se ignoran)
+    
+    Returns:
+        Lista de cuentas (estructura de CuentaResponse) en el orden pedido;
+        los IDs que no existen se omiten
+    """
+    ids = list(dict.fromkeys(reserva_ids))
+    if not ids:
+        return []
+    
+    reservas = db.query(Reserva).options(
+        joinedload(Reserva.cliente),
+        joinedload(Reserva.habitacion)
+    ).filter(Reserva.id.in_(ids)).all()
+    if not reservas:
+        return []
+    
+    lineas_por_reserva = defaultdict(list)
+    lineas = db.query(
+        Consumo.id,
+        Consumo.reserva_id,
+        Consumo.cantidad,
+        Consumo.precio_unitario,
+        Consumo.fecha_consumo,
+        Producto.nombre
+    ).outerjoin(
+        Producto, Consumo.producto_id == Producto.id
+    ).filter(
+        Consumo.reserva_id.in_([reserva.id for reserva in reservas])
+    ).order_by(Consumo.reserva_id, Consumo.id)
+    for linea in lineas:
+        lineas_por_reserva[linea.reserva_id].append(linea)
+    
+    por_id = {reserva.id: reserva for reserva in reservas}
+    return [
+        _armar_cuenta(por_id[reserva_id], lineas_por_reserva[reserva_id])
+        for reserva_id in ids if reserva_id in por_id
+    ]
+
+def get_cuenta_reserva(db: Session, reserva_id: int):
+    """Cuenta/factura de una reserva (None si no existe). Ver get_cuentas_reservas"""
+    cuentas = get_cuentas_reservas(db, [reserva_id])
+    return cuentas[0] if cuentas else None
+
 # ============================================================================
 # FUNCIONES: CHECK-IN
 # ============================================================================
@@ -1046,51 +2243,87 @@ def get_llegadas_hoy(db: Session) -> list:
     Obtiene todas las reservas con llegada programada para HOY que están en estado PENDIENTE.
     Incluye datos del cliente y habitación para mostrar en la lista.
     """
-    from datetime import date as date_class
-    hoy = date_class.today()
+    hoy = date.today()
     
-    reservas = db.query(Reserva).filter(
+    reservas = _query_reservas_checkin(db).filter(
         Reserva.fecha_entrada == hoy,
         Reserva.estado == EstadoReserva.PENDIENTE
     ).all()
     
     # Usar el helper que verifica disponibilidad real
-    return [_reserva_a_dict_checkin(r, db) for r in reservas]
+    return _reservas_a_dict_checkin(db, reservas)
 
 def buscar_reservas_checkin(db: Session, query: str) -> list:
     """
     Busca reservas PENDIENTES por:
     - Apellido/Nombre del cliente
-    - DNI del cliente
+    - DNI, email o teléfono del cliente
     - ID de reserva
     """
-    from datetime import date as date_class
-    
     # Intentar buscar por ID de reserva si es número
     try:
         reserva_id = int(query)
-        reserva = db.query(Reserva).filter(
+        reserva = _query_reservas_checkin(db).filter(
             Reserva.id == reserva_id,
             Reserva.estado == EstadoReserva.PENDIENTE
         ).first()
         if reserva:
-            return [_reserva_a_dict_checkin(reserva, db)]
+            return _reservas_a_dict_checkin(db, [reserva])
     except ValueError:
         pass
     
-    # Buscar por nombre o DNI
-    reservas = db.query(Reserva).join(Cliente).filter(
+    # Buscar por nombre, DNI, email o teléfono (índice trigram de clientes)
+    reservas = _query_reservas_checkin(db).filter(
         Reserva.estado == EstadoReserva.PENDIENTE,
-        (Cliente.nombre_completo.ilike(f"%{query}%")) | 
-        (Cliente.dni.ilike(f"%{query}%"))
+        Reserva.cliente_id.in_(select(Cliente.id).where(_filtro_clientes(db, query)))
     ).all()
     
-    return [_reserva_a_dict_checkin(r, db) for r in reservas]
+    return _reservas_a_dict_checkin(db, reservas)
+
+def _query_reservas_checkin(db: Session):
+    """Reservas con cliente y habitación en el mismo SELECT (JOIN), sin cargas perezosas"""
+    return db.query(Reserva).options(
+        joinedload(Reserva.cliente),
+        joinedload(Reserva.habitacion)
+    )
 
-def _reserva_a_dict_checkin(reserva: Reserva, db: Session = None) -> dict:
+def _ocupantes_actuales(db: Session, habitacion_ids: set) -> dict:
+    """
+    Reservas en CHECKIN que todavía no terminaron, para varias habitaciones a la vez
+    (una consulta). Devuelve {habitacion_id: [(reserva_id, nombre del cliente), ...]}
+    """
+    ocupantes = defaultdict(list)
+    if not habitacion_ids:
+        return ocupantes
+    filas = db.query(
+        Reserva.habitacion_id,
+        Reserva.id,
+        Cliente.nombre_completo
+    ).outerjoin(
+        Cliente, Reserva.cliente_id == Cliente.id
+    ).filter(
+        Reserva.habitacion_id.in_(habitacion_ids),
+        Reserva.estado == EstadoReserva.CHECKIN,
+        Reserva.fecha_salida > date.today()  # Que aún no haya terminado
+    ).order_by(Reserva.id)
+    for fila in filas:
+        ocupantes[fila.habitacion_id].append((fila.id, fila.nombre_completo))
+    return ocupantes
+
+def _reservas_a_dict_checkin(db: Session, reservas: list) -> list[dict]:
+    """
+    Convierte reservas (con cliente y habitación ya cargados) a diccionarios para check-in.
+    Los ocupantes de las habitaciones OCUPADA se buscan todos juntos en una consulta.
+    """
+    ocupadas = {
+        reserva.habitacion_id for reserva in reservas
+        if reserva.habitacion and reserva.habitacion.estado == EstadoHabitacion.OCUPADA
+    }
+    ocupantes = _ocupantes_actuales(db, ocupadas)
+    return [_reserva_a_dict_checkin(reserva, ocupantes) for reserva in reservas]
+
+def _reserva_a_dict_checkin(reserva: Reserva, ocupantes: dict) -> dict:
     """Helper para convertir reserva a diccionario para check-in"""
-    from datetime import date as date_class
-    
     habitacion = reserva.habitacion
     cliente = reserva.cliente
     
@@ -1107,19 +2340,16 @@ def _reserva_a_dict_checkin(reserva: Reserva, db: Session = None) -> dict:
             puede_checkin = False
             motivo_bloqueo = habitacion.estado.value
         # Si está OCUPADA, verificar si hay OTRA reserva activa (en CHECKIN) para HOY
-        elif habitacion.estado == EstadoHabitacion.OCUPADA and db:
-            hoy = date_class.today()
-            # Buscar si hay otra reserva en CHECKIN para esta habitación
-            otra_reserva_activa = db.query(Reserva).filter(
-                Reserva.habitacion_id == habitacion.id,
-                Reserva.id != reserva.id,  # Excluir la reserva actual
-                Reserva.estado == EstadoReserva.CHECKIN,
-                Reserva.fecha_salida > hoy  # Que aún no haya terminado
-            ).first()
+        elif habitacion.estado == EstadoHabitacion.OCUPADA:
+            # Otra reserva en CHECKIN para esta habitación (excluyendo la actual)
+            otra_reserva_activa = next(
+                (ocupante for ocupante in ocupantes.get(habitacion.id, []) if ocupante[0] != reserva.id),
+                None
+            )
             
             if otra_reserva_activa:
                 puede_checkin = False
-                motivo_bloqueo = f"OCUPADA por {otra_reserva_activa.cliente.nombre_completo if otra_reserva_activa.cliente else 'otro huésped'}"
+                motivo_bloqueo = f"OCUPADA por {otra_reserva_activa[1] or 'otro huésped'}"
                 estado_habitacion = "OCUPADA_OTRA"
             else:
                 # La habitación está "ocupada" pero no hay otra reserva activa real
@@ -1167,17 +2397,22 @@ def realizar_checkin(db: Session, reserva_id: int, datos_cliente = None) -> dict
         return {"error": f"La habitación está en {habitacion.estado.value}"}
     
     # Actualizar datos del cliente si se proporcionan
+    cliente_actualizado = None
     if datos_cliente:
         cliente = reserva.cliente
         if cliente:
             if datos_cliente.email:
                 cliente.email = datos_cliente.email
+                cliente_actualizado = cliente
             if datos_cliente.telefono:
                 cliente.telefono = datos_cliente.telefono
+                cliente_actualizado = cliente
             if datos_cliente.nombre_completo:
                 cliente.nombre_completo = datos_cliente.nombre_completo
+                cliente_actualizado = cliente
     
-    # Cambiar estado de la reserva a CHECKIN
+    # Cambiar estado de la reserva a CHECKIN (sus noches pasan de bloqueadas a vendidas)
+    huella_anterior = _huella_inventario(reserva)
     reserva.estado = EstadoReserva.CHECKIN
     reserva.checkin_timestamp = datetime.now()
     
@@ -1186,6 +2421,12 @@ def realizar_checkin(db: Session, reserva_id: int, datos_cliente = None) -> dict
     if habitacion:
         habitacion.estado = EstadoHabitacion.OCUPADA
     
+    _registrar_cambio(db, "reserva", "checkin", reserva)
+    if cliente_actualizado:
+        _registrar_cambio(db, "cliente", "actualizado", cliente_actualizado)
+    _ajustar_inventario(db, [huella_anterior], [_huella_inventario(reserva)])
+    if habitacion:
+        _registrar_cambio(db, "habitacion", "estado_cambiado", habitacion)
     db.commit()
     db.refresh(reserva)
     
@@ -1237,9 +2478,13 @@ def cambiar_habitacion_reserva(db: Session, reserva_id: int, nueva_habitacion_id
     nuevo_precio = nueva_habitacion.precio_base * noches
     
     # Actualizar reserva
+    huella_anterior = _huella_inventario(reserva)
     reserva.habitacion_id = nueva_habitacion_id
     reserva.precio_total = nuevo_precio
+    _recalcular_saldo(reserva)
     
+    _registrar_cambio(db, "reserva", "habitacion_cambiada", reserva)
+    _ajustar_inventario(db, [huella_anterior], [_huella_inventario(reserva)])
     db.commit()
     db.refresh(reserva)
     
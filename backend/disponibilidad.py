@@ -0,0 +1,242 @@
+"""
+Puente Hotel - Índice de Disponibilidad en Memoria
+Copia en memoria de las habitaciones y de las reservas no canceladas, con una
+línea de tiempo ordenada por habitación. Responde sin consultar SQLite:
+- ¿Esta habitación está libre entre tal y tal fecha? (check_availability)
+- ¿Qué habitaciones están libres en un rango? (POST /disponibilidad)
+- La matriz habitación × día del calendario (GET /disponibilidad/rango)
+
+Validez entre workers: cada escritura de reservas o habitaciones incrementa la
+versión "disponibilidad" en versiones_datos (ver crud.GRUPOS_POR_ENTIDAD) y deja
+su fila en el outbox `cambios`, en la misma transacción. Cada consulta compara
+esa versión (una lectura por clave primaria) con la del índice; si cambió, se
+releen SOLO las reservas y habitaciones que figuran en el outbox desde la última
+actualización. Si el outbox ya se purgó o hay demasiados cambios, se reconstruye todo.
+
+El índice se lee y se actualiza con su propia sesión, nunca con la de quien
+consulta: esa sesión puede tener escrituras sin confirmar (por ejemplo, dentro
+de crud.create_reserva) que no deben quedar en la foto compartida del proceso.
+
+La escritura (crud.create_reserva) sigue verificando el solapamiento en SQL dentro
+de su transacción: el índice responde preguntas, la base decide.
+"""
+
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Habitacion, Reserva, Cambio, VersionDatos, EstadoReserva
+
+# Más cambios que esto desde la última actualización: se reconstruye el índice completo
+MAX_CAMBIOS_INCREMENTALES = 500
+
+# Acciones del outbox sobre reservas que no cambian fechas, habitación ni estado
+# (los totales del folio, ver crud._ajustar_folio): no se releen ni cuentan para el límite
+ACCIONES_SIN_DISPONIBILIDAD = ("folio_actualizado", "folio_reconciliado")
+
+@dataclass(frozen=True)
+class HabitacionIndice:
+    """Habitación tal como estaba en la base al actualizar el índice"""
+    id: int
+    numero: str
+    tipo: object  # TipoHabitacion
+    precio_base: float
+    estado: object  # EstadoHabitacion
+
+@dataclass(frozen=True)
+class ReservaIndice:
+    """Lo que el índice necesita de una reserva no cancelada"""
+    id: int
+    habitacion_id: int
+    fecha_entrada: date
+    fecha_salida: date
+    estado: EstadoReserva
+
+class LineaHabitacion:
+    """
+    Reservas de una habitación ordenadas por fecha de entrada, con el máximo
+    acumulado de las fechas de salida. Con eso una consulta de solapamiento es
+    una búsqueda binaria más un recorrido hacia atrás que corta apenas ninguna
+    reserva anterior puede llegar al rango (aunque haya reservas superpuestas).
+    """
+    __slots__ = ("reservas", "_entradas", "_max_salidas")
+
+    def __init__(self, reservas):
+        self.reservas = tuple(sorted(reservas, key=lambda r: (r.fecha_entrada, r.id)))
+        self._entradas = [r.fecha_entrada for r in self.reservas]
+        self._max_salidas = []
+        maximo = date.min
+        for reserva in self.reservas:
+            maximo = max(maximo, reserva.fecha_salida)
+            self._max_salidas.append(maximo)
+
+    def solapadas(self, fecha_entrada: date, fecha_salida: date) -> list[ReservaIndice]:
+        """Reservas con entrada < fecha_salida y salida > fecha_entrada, ordenadas por entrada"""
+        resultado = []
+        # Las reservas [0, i) empiezan antes de fecha_salida
+        i = bisect_left(self._entradas, fecha_salida)
+        for j in range(i - 1, -1, -1):
+            if self._max_salidas[j] <= fecha_entrada:
+                break  # Ninguna reserva anterior termina después de fecha_entrada
+            if self.reservas[j].fecha_salida > fecha_entrada:
+                resultado.append(self.reservas[j])
+        resultado.reverse()
+        return resultado
+
+_LINEA_VACIA = LineaHabitacion(())
+
+@dataclass(frozen=True)
+class FotoDisponibilidad:
+    """Estado del índice para una versión de datos (inmutable: se comparte entre hilos)"""
+    version: int
+    seq: int  # Último seq del outbox incorporado
+    habitaciones: dict  # {id: HabitacionIndice}
+    reservas: dict  # {id: ReservaIndice}
+    lineas: dict  # {habitacion_id: LineaHabitacion}
+
+    def linea(self, habitacion_id: int) -> LineaHabitacion:
+        return self.lineas.get(habitacion_id, _LINEA_VACIA)
+
+    def habitaciones_ordenadas(self) -> list[HabitacionIndice]:
+        return [self.habitaciones[habitacion_id] for habitacion_id in sorted(self.habitaciones)]
+
+def _habitacion(fila) -> HabitacionIndice:
+    return HabitacionIndice(fila.id, fila.numero, fila.tipo, fila.precio_base, fila.estado)
+
+def _reserva(fila) -> ReservaIndice:
+    return ReservaIndice(fila.id, fila.habitacion_id, fila.fecha_entrada, fila.fecha_salida, fila.estado)
+
+def _version(db: Session) -> int:
+    return db.execute(
+        select(VersionDatos.version).where(VersionDatos.clave == "disponibilidad")
+    ).scalar() or 0
+
+_COLUMNAS_HABITACION = (Habitacion.id, Habitacion.numero, Habitacion.tipo, Habitacion.precio_base, Habitacion.estado)
+_COLUMNAS_RESERVA = (Reserva.id, Reserva.habitacion_id, Reserva.fecha_entrada, Reserva.fecha_salida, Reserva.estado)
+
+class IndiceDisponibilidad:
+    """Índice de disponibilidad del proceso, al día con la versión "disponibilidad" de la base"""
+
+    def __init__(self):
+        self._foto: FotoDisponibilidad = None
+        self._lock = threading.Lock()
+
+    def obtener(self, db: Session) -> FotoDisponibilidad:
+        """
+        Foto vigente del índice (la pone al día si la versión de la base cambió).
+        De `db` solo se toma el engine: la versión y las filas se leen en una
+        sesión propia, que solo ve lo confirmado.
+        """
+        with Session(db.get_bind()) as lectura:
+            version = _version(lectura)
+            foto = self._foto
+            # Una lectura más vieja (otro worker) puede ver una versión menor: la foto ya es más nueva
+            if foto is not None and foto.version >= version:
+                return foto
+
+            with self._lock:
+                foto = self._foto
+                if foto is not None and foto.version >= version:
+                    return foto
+                nueva = None
+                if foto is not None:
+                    nueva = self._actualizar(lectura, foto, version)
+                self._foto = nueva or self._construir(lectura, version)
+                return self._foto
+
+    def construir(self, db: Session) -> FotoDisponibilidad:
+        """Reconstruye el índice completo (al arrancar el servidor), con una sesión propia"""
+        with Session(db.get_bind()) as lectura:
+            version = _version(lectura)
+            with self._lock:
+                self._foto = self._construir(lectura, version)
+                return self._foto
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._foto = None
+
+    def _construir(self, db: Session, version: int) -> FotoDisponibilidad:
+        # El seq se lee ANTES que las filas: lo que se confirme en el medio ya
+        # aparece en las filas y volver a aplicarlo después no cambia nada
+        seq = db.execute(select(func.max(Cambio.seq))).scalar() or 0
+        habitaciones = {fila.id: _habitacion(fila) for fila in db.execute(select(*_COLUMNAS_HABITACION))}
+        reservas = {
+            fila.id: _reserva(fila)
+            for fila in db.execute(select(*_COLUMNAS_RESERVA).where(Reserva.estado != EstadoReserva.CANCELADA))
+        }
+        por_habitacion = {}
+        for reserva in reservas.values():
+            por_habitacion.setdefault(reserva.habitacion_id, []).append(reserva)
+        lineas = {habitacion_id: LineaHabitacion(lista) for habitacion_id, lista in por_habitacion.items()}
+        return FotoDisponibilidad(version, seq, habitaciones, reservas, lineas)
+
+    def _actualizar(self, db: Session, foto: FotoDisponibilidad, version: int):
+        """
+        Aplica a la foto los cambios del outbox posteriores a foto.seq.
+        Devuelve None si no se puede (outbox purgado o demasiados cambios).
+        """
+        primero = db.execute(select(func.min(Cambio.seq))).scalar()
+        if primero is not None and primero > foto.seq + 1:
+            return None  # Se purgaron cambios que el índice no vio
+        cambios = db.execute(
+            select(Cambio.seq, Cambio.entidad, Cambio.entidad_id)
+            .where(
+                Cambio.seq > foto.seq,
+                Cambio.entidad.in_(("reserva", "habitacion")),
+                Cambio.accion.not_in(ACCIONES_SIN_DISPONIBILIDAD)
+            )
+            .order_by(Cambio.seq)
+            .limit(MAX_CAMBIOS_INCREMENTALES + 1)
+        ).all()
+        if len(cambios) > MAX_CAMBIOS_INCREMENTALES:
+            return None
+        # Hasta el último cambio LEÍDO (no el máximo actual): lo que se confirme
+        # después de esta lectura tiene un seq mayor y entra en la próxima actualización
+        seq = cambios[-1].seq if cambios else foto.seq
+
+        ids_reservas = {c.entidad_id for c in cambios if c.entidad == "reserva"}
+        ids_habitaciones = {c.entidad_id for c in cambios if c.entidad == "habitacion"}
+
+        habitaciones = dict(foto.habitaciones)
+        if ids_habitaciones:
+            for habitacion_id in ids_habitaciones:
+                habitaciones.pop(habitacion_id, None)
+            for fila in db.execute(select(*_COLUMNAS_HABITACION).where(Habitacion.id.in_(ids_habitaciones))):
+                habitaciones[fila.id] = _habitacion(fila)
+
+        reservas = foto.reservas
+        lineas = foto.lineas
+        if ids_reservas:
+            reservas = dict(foto.reservas)
+            afectadas = set()
+            for reserva_id in ids_reservas:
+                anterior = reservas.pop(reserva_id, None)
+                if anterior is not None:
+                    afectadas.add(anterior.habitacion_id)
+            for fila in db.execute(
+                select(*_COLUMNAS_RESERVA).where(
+                    Reserva.id.in_(ids_reservas),
+                    Reserva.estado != EstadoReserva.CANCELADA
+                )
+            ):
+                reservas[fila.id] = _reserva(fila)
+                afectadas.add(fila.habitacion_id)
+
+            # Solo se rearman las líneas de las habitaciones tocadas
+            lineas = dict(foto.lineas)
+            for habitacion_id in afectadas:
+                lista = [r for r in foto.linea(habitacion_id).reservas if r.id not in ids_reservas]
+                lista.extend(r for r in (reservas.get(i) for i in ids_reservas) if r and r.habitacion_id == habitacion_id)
+                if lista:
+                    lineas[habitacion_id] = LineaHabitacion(lista)
+                else:
+                    lineas.pop(habitacion_id, None)
+
+        return FotoDisponibilidad(version, seq, habitaciones, reservas, lineas)
+
+indice_disponibilidad = IndiceDisponibilidad()
@@ -0,0 +1,162 @@
+"""
+Puente Hotel - Eventos en Tiempo Real (Server-Sent Events)
+Difunde a los clientes conectados a GET /eventos los cambios que hace crud:
+reserva creada, check-in, checkout, cancelación, consumo agregado, cambio de
+estado de habitación, etc. Así las vistas pueden actualizar su estado local en
+lugar de recargar listas completas.
+
+Flujo:
+1. crud._registrar_cambio encola el evento en la sesión (db.info), dentro de la transacción.
+2. Al confirmarse la transacción (after_commit) los eventos se publican en el difusor;
+   si hay rollback se descartan. Nunca se anuncia un cambio que no quedó guardado.
+3. El difusor guarda los últimos eventos y los reparte a la cola asyncio de cada
+   suscriptor con call_soon_threadsafe: los endpoints síncronos (threadpool) nunca
+   esperan a un cliente lento.
+
+Reconexión: cada evento lleva un id "<época>-<número>". El navegador lo reenvía
+en Last-Event-ID y se reenvían los eventos posteriores que sigan en memoria; si ya
+no están (o el servidor se reinició) se manda un evento "resync" para que el cliente
+recargue todo una vez.
+
+Nota: el difusor vive en memoria del proceso; con varios workers cada uno tiene el suyo.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Eventos recientes que se conservan para reenviar a quien se reconecta
+EVENTOS_EN_MEMORIA = 1000
+
+# Eventos pendientes por suscriptor antes de considerarlo desbordado
+MAX_PENDIENTES_SUSCRIPTOR = 500
+
+# Cada cuánto se manda un comentario para mantener viva la conexión (segundos)
+INTERVALO_LATIDO = 15
+
+class _Suscriptor:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=MAX_PENDIENTES_SUSCRIPTOR)
+        self.desbordado = False
+
+    def entregar(self, evento: tuple) -> None:
+        # Corre en el event loop del suscriptor
+        if self.desbordado:
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.desbordado = True
+
+class Difusor:
+    """Reparte eventos (id, tipo, datos) a todos los suscriptores"""
+
+    def __init__(self, capacidad: int = EVENTOS_EN_MEMORIA):
+        self.epoca = str(int(time.time()))
+        self._contador = 0
+        self._recientes = deque(maxlen=capacidad)
+        self._suscriptores = set()
+        self._lock = threading.Lock()
+
+    def publicar(self, tipo: str, datos: dict) -> str:
+        """Publica un evento (seguro desde cualquier hilo). Devuelve su id"""
+        with self._lock:
+            self._contador += 1
+            evento = (self._contador, tipo, datos)
+            self._recientes.append(evento)
+            suscriptores = list(self._suscriptores)
+        for suscriptor in suscriptores:
+            try:
+                suscriptor.loop.call_soon_threadsafe(suscriptor.entregar, evento)
+            except RuntimeError:
+                # El event loop del suscriptor ya se cerró
+                self._desuscribir(suscriptor)
+        return f"{self.epoca}-{evento[0]}"
+
+    def _desuscribir(self, suscriptor: _Suscriptor) -> None:
+        with self._lock:
+            self._suscriptores.discard(suscriptor)
+
+    def _pendientes_desde(self, ultimo_id: str):
+        """
+        Eventos posteriores a `ultimo_id` que siguen en memoria.
+        Devuelve None si no se pueden reconstruir (época distinta o ya descartados).
+        """
+        try:
+            epoca, numero = ultimo_id.rsplit("-", 1)
+            numero = int(numero)
+        except (AttributeError, ValueError):
+            return None
+        if epoca != self.epoca or numero > self._contador:
+            return None
+        pendientes = [evento for evento in self._recientes if evento[0] > numero]
+        if numero < self._contador and (not pendientes or pendientes[0][0] != numero + 1):
+            return None
+        return pendientes
+
+    def _formatear(self, evento: tuple) -> str:
+        numero, tipo, datos = evento
+        return f"id: {self.epoca}-{numero}\nevent: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+    async def flujo(self, request, ultimo_id: str = None):
+        """
+        Generador del stream SSE de un cliente.
+
+        Args:
+            request: Request de Starlette (para detectar la desconexión)
+            ultimo_id: Valor de Last-Event-ID enviado por el cliente (si se reconecta)
+        """
+        suscriptor = _Suscriptor(asyncio.get_running_loop())
+        with self._lock:
+            self._suscriptores.add(suscriptor)
+            actual = f"{self.epoca}-{self._contador}"
+            pendientes = self._pendientes_desde(ultimo_id) if ultimo_id else []
+
+        try:
+            # Cada reconexión reintenta a los 3 s
+            yield "retry: 3000\n\n"
+            if pendientes is None:
+                yield f"id: {actual}\nevent: resync\ndata: {{}}\n\n"
+            else:
+                for evento in pendientes:
+                    yield self._formatear(evento)
+
+            while not suscriptor.desbordado:
+                try:
+                    evento = await asyncio.wait_for(suscriptor.cola.get(), INTERVALO_LATIDO)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": latido\n\n"
+                    continue
+                yield self._formatear(evento)
+
+            # Cliente demasiado lento: se cierra el stream y el navegador se
+            # reconecta solo, retomando desde su Last-Event-ID
+        finally:
+            self._desuscribir(suscriptor)
+
+difusor = Difusor()
+
+# ============================================================================
+# INTEGRACIÓN CON LA SESIÓN: PUBLICAR SOLO LO CONFIRMADO
+# ============================================================================
+
+def encolar(db: Session, tipo: str, datos: dict) -> None:
+    """Deja un evento pendiente en la sesión; se publica cuando la transacción se confirma"""
+    db.info.setdefault("eventos_pendientes", []).append((tipo, datos))
+
+@event.listens_for(Session, "after_commit")
+def _publicar_confirmados(session: Session) -> None:
+    for tipo, datos in session.info.pop("eventos_pendientes", []):
+        difusor.publicar(tipo, datos)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_pendientes(session: Session, transaccion) -> None:
+    session.info.pop("eventos_pendientes", None)
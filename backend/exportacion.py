@@ -0,0 +1,147 @@
+"""
+Puente Hotel - Exportación de Reservas y Folios
+Genera la exportación completa para contabilidad como un flujo (streaming):
+NDJSON (una reserva por línea, con sus consumos) o CSV (una fila por línea del folio).
+
+Las reservas se leen por lotes con yield_per, así que la memoria usada
+no depende del tamaño del historial.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from models import Reserva, Consumo
+
+# Reservas leídas (y enviadas al cliente) por cada lote
+TAMANO_LOTE = 500
+
+COLUMNAS_CSV = [
+    "reserva_id", "estado", "habitacion_numero", "cliente_dni", "cliente_nombre",
+    "fecha_entrada", "fecha_salida", "noches", "total_alojamiento",
+    "total_consumos", "total_pagos", "saldo",
+    "consumo_id", "consumo_fecha", "producto_nombre", "cantidad", "precio_unitario", "subtotal"
+]
+
+# ============================================================================
+# LECTURA POR LOTES
+# ============================================================================
+
+def iterar_reservas(db: Session, desde: date = None, hasta: date = None, estado: str = None):
+    """
+    Recorre las reservas (con cliente, habitación y consumos) lote a lote.
+    
+    Args:
+        db: Sesión de base de datos
+        desde: Filtrar por fecha de entrada >= desde
+        hasta: Filtrar por fecha de salida <= hasta
+        estado: Filtrar por estado de la reserva
+    
+    Yields:
+        Listas de hasta TAMANO_LOTE reservas
+    """
+    query = db.query(Reserva).options(
+        joinedload(Reserva.cliente),
+        joinedload(Reserva.habitacion),
+        selectinload(Reserva.consumos).joinedload(Consumo.producto)
+    )
+    
+    if desde:
+        query = query.filter(Reserva.fecha_entrada >= desde)
+    
+    if hasta:
+        query = query.filter(Reserva.fecha_salida <= hasta)
+    
+    if estado:
+        query = query.filter(Reserva.estado == estado.upper())
+    
+    lote = []
+    for reserva in query.order_by(Reserva.id).yield_per(TAMANO_LOTE):
+        lote.append(reserva)
+        if len(lote) == TAMANO_LOTE:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _reserva_a_dict(reserva: Reserva) -> dict:
+    """Convierte una reserva con su folio a un diccionario serializable"""
+    noches = max((reserva.fecha_salida - reserva.fecha_entrada).days, 1)
+    consumos = [
+        {
+            "id": c.id,
+            "fecha": c.fecha_consumo.isoformat(),
+            "producto_nombre": c.producto.nombre if c.producto else "Producto eliminado",
+            "cantidad": c.cantidad,
+            "precio_unitario": c.precio_unitario,
+            "subtotal": c.cantidad * c.precio_unitario
+        }
+        for c in reserva.consumos
+    ]
+    
+    # Totales guardados del folio (los mismos que devuelve GET /reservas/{id}/cuenta)
+    return {
+        "reserva_id": reserva.id,
+        "estado": reserva.estado.value if hasattr(reserva.estado, 'value') else str(reserva.estado),
+        "habitacion_numero": reserva.habitacion.numero if reserva.habitacion else "N/A",
+        "cliente_dni": reserva.cliente.dni if reserva.cliente else "",
+        "cliente_nombre": reserva.cliente.nombre_completo if reserva.cliente else "Desconocido",
+        "fecha_entrada": reserva.fecha_entrada.isoformat(),
+        "fecha_salida": reserva.fecha_salida.isoformat(),
+        "noches": noches,
+        "total_alojamiento": reserva.precio_total,
+        "consumos": consumos,
+        "total_consumos": reserva.total_consumos,
+        "total_pagos": reserva.total_pagos,
+        "saldo": reserva.saldo,
+        "total_general": reserva.saldo
+    }
+
+# ============================================================================
+# FORMATOS DE SALIDA
+# ============================================================================
+
+def generar_ndjson(session_factory, desde: date = None, hasta: date = None, estado: str = None):
+    """
+    Genera la exportación en NDJSON: una reserva (con sus consumos) por línea.
+    Abre su propia sesión porque se consume después de que termina el endpoint.
+    """
+    db = session_factory()
+    try:
+        for lote in iterar_reservas(db, desde, hasta, estado):
+            yield "".join(
+                json.dumps(_reserva_a_dict(r), ensure_ascii=False) + "\n" for r in lote
+            )
+    finally:
+        db.close()
+
+def generar_csv(session_factory, desde: date = None, hasta: date = None, estado: str = None):
+    """
+    Genera la exportación en CSV: una fila por línea del folio.
+    Las reservas sin consumos salen en una sola fila con las columnas de consumo vacías.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_CSV)
+    yield buffer.getvalue()
+    
+    db = session_factory()
+    try:
+        for lote in iterar_reservas(db, desde, hasta, estado):
+            buffer.seek(0)
+            buffer.truncate()
+            for reserva in lote:
+                datos = _reserva_a_dict(reserva)
+                base = [datos[col] for col in COLUMNAS_CSV[:COLUMNAS_CSV.index("consumo_id")]]
+                if not datos["consumos"]:
+                    writer.writerow(base + [""] * 6)
+                for c in datos["consumos"]:
+                    writer.writerow(base + [
+                        c["id"], c["fecha"], c["producto_nombre"],
+                        c["cantidad"], c["precio_unitario"], c["subtotal"]
+                    ])
+            yield buffer.getvalue()
+    finally:
+        db.close()
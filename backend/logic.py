@@ -15,8 +15,10 @@ Si esta condición es VERDADERA, la habitación está OCUPADA.
 
 from datetime import date
 from sqlalchemy.orm import Session
-from models import Habitacion, Reserva, EstadoReserva
+from models import Habitacion
+from schemas import ReservaCreate
 from typing import List
+import crud
 
 # ============================================================================
 # FUNCIÓN CRÍTICA: Verificar Disponibilidad
@@ -26,7 +28,9 @@ def check_availability(
     db: Session,
     fecha_entrada: date,
     fecha_salida: date,
-    habitacion_id: int = None
+    habitacion_id: int = None,
+    tipo: str = None,
+    precio_max: float = None
 ) -> List[Habitacion]:
     """
     Verifica qué habitaciones están disponibles en un rango de fechas.
@@ -36,6 +40,8 @@ def check_availability(
         fecha_entrada: Fecha de check-in
         fecha_salida: Fecha de check-out
         habitacion_id: (Opcional) Para verificar una habitación específica
+        tipo: (Opcional) Filtrar por tipo de habitación
+        precio_max: (Opcional) Precio base máximo por noche
     
     Returns:
         Lista de habitaciones disponibles en ese rango
@@ -43,31 +49,17 @@ def check_availability(
     ⚠️ LÓGICA:
     Encontrar habitaciones que NO tengan reservas confirmadas 
     cuyas fechas se solapen con el rango solicitado.
+    Se delega en crud.get_habitaciones_disponibles, que lo resuelve
+    en una sola consulta (NOT EXISTS) en lugar de una por habitación.
     """
-    
-    # Obtener todas las habitaciones (o una específica)
-    if habitacion_id:
-        habitaciones = db.query(Habitacion).filter(Habitacion.id == habitacion_id).all()
-    else:
-        habitaciones = db.query(Habitacion).all()
-    
-    habitaciones_disponibles = []
-    
-    for hab in habitaciones:
-        # Buscar si hay alguna reserva que se solape
-        reserva_solapada = db.query(Reserva).filter(
-            Reserva.habitacion_id == hab.id,
-            Reserva.estado != EstadoReserva.CANCELADA,  # Ignorar canceladas
-            # FÓRMULA CRÍTICA DE SOLAPAMIENTO:
-            Reserva.fecha_entrada < fecha_salida,
-            Reserva.fecha_salida > fecha_entrada
-        ).first()
-        
-        # Si NO hay solapamiento, la habitación está disponible
-        if not reserva_solapada:
-            habitaciones_disponibles.append(hab)
-    
-    return habitaciones_disponibles
+    return crud.get_habitaciones_disponibles(
+        db,
+        fecha_entrada,
+        fecha_salida,
+        tipo=tipo,
+        precio_max=precio_max,
+        habitacion_id=habitacion_id
+    )
 
 # ============================================================================
 # FUNCIÓN: Calcular Precio Total de la Reserva
@@ -106,7 +98,8 @@ def crear_reserva(
     cliente_id: int,
     habitacion_id: int,
     fecha_entrada: date,
-    fecha_salida: date
+    fecha_salida: date,
+    precio_noche: float = None
 ) -> dict:
     """
     Crea una nueva reserva después de validar disponibilidad.
@@ -117,68 +110,53 @@ def crear_reserva(
         habitacion_id: ID de la habitación
         fecha_entrada: Fecha de entrada
         fecha_salida: Fecha de salida
+        precio_noche: (Opcional) Precio por noche; por defecto el precio_base de la habitación
     
     Returns:
         dict con status, mensaje y datos de la reserva
     
     Flujo:
-    1. Verificar que la habitación está disponible en esas fechas
-    2. Si NO está disponible, retornar error HTTP 409
-    3. Si está disponible, calcular precio total
-    4. Crear y guardar la reserva
+    1. Validar las fechas (HTTP 400 si son inválidas)
+    2. Verificar disponibilidad y crear la reserva en UNA transacción
+       (crud.create_reserva: INSERT condicional, sin carrera entre ambos pasos)
+    3. Si no se creó, informar el motivo (HTTP 404 o 409)
     """
     
-    # Step 1: Verificar disponibilidad
-    habitaciones_disponibles = check_availability(db, fecha_entrada, fecha_salida, habitacion_id)
-    
-    if not habitaciones_disponibles:
-        return {
-            "success": False,
-            "error": "HABITACION_NO_DISPONIBLE",
-            "message": "La habitación no está disponible en esas fechas",
-            "http_code": 409  # Conflict
-        }
-    
-    # Step 2: Obtener la habitación
-    habitacion = db.query(Habitacion).filter(Habitacion.id == habitacion_id).first()
-    if not habitacion:
-        return {
-            "success": False,
-            "error": "HABITACION_NO_ENCONTRADA",
-            "message": "La habitación solicitada no existe",
-            "http_code": 404
-        }
-    
-    # Step 3: Calcular precio total
-    try:
-        precio_total = calcular_precio_total(habitacion.precio_base, fecha_entrada, fecha_salida)
-    except ValueError as e:
+    # Step 1: Validar fechas
+    if (fecha_salida - fecha_entrada).days <= 0:
         return {
             "success": False,
             "error": "FECHAS_INVALIDAS",
-            "message": str(e),
+            "message": "La fecha de salida debe ser posterior a la de entrada",
             "http_code": 400
         }
     
-    # Step 4: Crear la reserva
-    nueva_reserva = Reserva(
+    # Step 2: Verificar disponibilidad y crear la reserva atómicamente
+    solicitud = ReservaCreate(
         habitacion_id=habitacion_id,
         cliente_id=cliente_id,
         fecha_entrada=fecha_entrada,
         fecha_salida=fecha_salida,
-        precio_total=precio_total
+        precio_noche=precio_noche
     )
+    nueva_reserva = crud.create_reserva(db, solicitud)
     
-    db.add(nueva_reserva)
-    db.commit()
-    db.refresh(nueva_reserva)
+    # Step 3: Informar el motivo del rechazo
+    if not nueva_reserva:
+        http_code, error, mensaje = crud.diagnosticar_reserva_rechazada(db, solicitud)
+        return {
+            "success": False,
+            "error": error,
+            "message": mensaje,
+            "http_code": http_code
+        }
     
     return {
         "success": True,
         "message": "Reserva creada correctamente",
         "reserva": {
             "id": nueva_reserva.id,
-            "habitacion_numero": habitacion.numero,
+            "habitacion_numero": nueva_reserva.habitacion.numero,
             "fecha_entrada": str(nueva_reserva.fecha_entrada),
             "fecha_salida": str(nueva_reserva.fecha_salida),
             "precio_total": nueva_reserva.precio_total,
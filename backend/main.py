@@ -3,31 +3,74 @@ Puente Hotel - API REST con FastAPI
 Endpoints para gestionar habitaciones, clientes y reservas
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Body
+from fastapi import FastAPI, HTTPException, Depends, Body, Query, Request, Header
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse, JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import date
 from typing import List
+import asyncio
 import os
+import time
 
-from models import engine, init_db
+from models import engine, init_db, EstadoReserva
 from sqlalchemy.orm import sessionmaker
 import schemas
 import crud
+import auditoria
+import exportacion
+import metricas
+import cache
+import catalogo
+import disponibilidad
+import eventos
+from registro import configurar_logging
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 from logic import check_availability, crear_reserva
 
+# Máximo de días que puede abarcar GET /disponibilidad/rango (y GET /inventario)
+MAX_DIAS_CALENDARIO = 366
+
+# Máximo de reservas por página en GET /reservas
+MAX_LIMITE_RESERVAS = 500
+
+# Máximo de entradas del outbox procesadas por llamada a GET /cambios
+MAX_LIMITE_CAMBIOS = 1000
+
+# Tableros ya calculados: GET /habitaciones (por fecha de negocio) y GET /disponibilidad?fecha=
+cache_tablero = cache.CacheVersionado("habitaciones", max_entradas=4)
+cache_disponibilidad = cache.CacheVersionado("disponibilidad", max_entradas=64)
+cache_productos = cache.CacheVersionado("productos", max_entradas=2)
+cache_kpis = cache.CacheVersionado("kpis", max_entradas=16)
+
 # ============================================================================
 # INICIALIZAR FASTAPI
 # ============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Construye el índice de disponibilidad en memoria y arranca la auditoría
+    nocturna en segundo plano mientras el servidor está activo
+    """
+    db = SessionLocal()
+    try:
+        disponibilidad.indice_disponibilidad.construir(db)
+    finally:
+        db.close()
+    tarea_auditoria = asyncio.create_task(auditoria.programar_auditoria_nocturna(SessionLocal))
+    yield
+    tarea_auditoria.cancel()
+
 app = FastAPI(
     title="Puente Hotel API",
     description="API para gestión de reservas hoteleras",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ============================================================================
@@ -43,9 +86,58 @@ app.add_middleware(
 )
 
 # ============================================================================
-# INICIALIZAR BASE DE DATOS
+# MÉTRICAS POR REQUEST (sentencias SQL, tiempo de BD y tiempo total)
 # ============================================================================
 
+metricas.instrumentar_engine(engine)
+
+@app.middleware("http")
+async def medir_request(request: Request, call_next):
+    """Mide cada request y agrega el header X-SQL-Statements con las sentencias ejecutadas"""
+    medicion, token = metricas.iniciar_medicion()
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metricas.finalizar_medicion(token)
+    
+    # Se agrupa por la plantilla de la ruta (/reservas/{reserva_id}), no por la URL concreta
+    ruta = request.scope.get("route")
+    metricas.registrar_request(
+        request.method,
+        ruta.path if ruta is not None else "sin_ruta",
+        response.status_code,
+        time.perf_counter() - inicio,
+        medicion
+    )
+    response.headers["X-SQL-Statements"] = str(medicion.sentencias)
+    return response
+
+@app.exception_handler(IntegrityError)
+async def integridad_violada(request: Request, exc: IntegrityError):
+    """
+    Una escritura que viola una restricción (clave foránea, UNIQUE, NOT NULL)
+    responde 409 en lugar de un 500. La sesión se cierra sin confirmar en get_db.
+    """
+    return JSONResponse(
+        status_code=409,
+        content={"detail": "La operación entra en conflicto con datos relacionados"}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def exportar_metricas():
+    """
+    GET /metrics
+    Histogramas de latencia, tiempo de BD y sentencias SQL por ruta (formato Prometheus)
+    """
+    return PlainTextResponse(metricas.exportar_prometheus(), media_type="text/plain; version=0.0.4")
+
+# ============================================================================
+# INICIALIZAR LOGGING Y BASE DE DATOS
+# ============================================================================
+
+# Niveles por módulo con LOG_LEVEL / LOG_LEVELS (ver registro.py), ej: LOG_LEVELS="crud=DEBUG"
+configurar_logging()
 init_db()
 
 # ============================================================================
@@ -73,16 +165,26 @@ def crear_habitacion(habitacion: schemas.HabitacionCreate, db: Session = Depends
     return crud.create_habitacion(db, habitacion)
 
 @app.get("/habitaciones", response_model=List[schemas.HabitacionDetalle])
-def listar_habitaciones(db: Session = Depends(get_db)):
+def listar_habitaciones(request: Request, db: Session = Depends(get_db)):
     """
     GET /habitaciones
     Retorna lista de todas las habitaciones con información de reservas activas.
-    Antes de listar, actualiza automáticamente las reservas vencidas.
+    Las reservas vencidas se cierran en la auditoría nocturna (ver auditoria.py).
+    
+    Cacheado por (fecha de negocio, versión del tablero): responde con ETag y
+    devuelve 304 si el cliente manda If-None-Match con la versión vigente.
     """
-    # Actualizar reservas vencidas automáticamente
-    crud.actualizar_reservas_vencidas(db)
+    # Asegurar que la auditoría nocturna de hoy ya corrió (solo consulta la marca)
+    auditoria.asegurar_auditoria(db)
     
-    return crud.get_habitaciones(db)
+    return cache.respuesta_cacheada(
+        request,
+        cache_tablero,
+        date.today(),
+        crud.get_version_datos(db, "tablero"),
+        lambda: crud.get_habitaciones(db),
+        modelo=List[schemas.HabitacionDetalle]
+    )
 
 @app.get("/habitaciones/{habitacion_id}", response_model=schemas.HabitacionResponse)
 def obtener_habitacion(habitacion_id: int, db: Session = Depends(get_db)):
@@ -149,6 +251,19 @@ def listar_clientes(db: Session = Depends(get_db)):
     """
     return crud.get_clientes(db)
 
+@app.get("/clientes/buscar", response_model=List[schemas.ClienteResponse])
+def buscar_clientes(
+    q: str = Query(..., min_length=1),
+    limite: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    GET /clientes/buscar?q=
+    Autocompletado de clientes por nombre, DNI, email o teléfono,
+    ordenado por relevancia (índice FTS5 trigram; fragmentos de 3+ caracteres)
+    """
+    return crud.buscar_clientes(db, q, limite)
+
 @app.get("/clientes/{cliente_id}", response_model=schemas.ClienteResponse)
 def obtener_cliente(cliente_id: int, db: Session = Depends(get_db)):
     """
@@ -201,41 +316,41 @@ def verificar_disponibilidad(
     """
     POST /disponibilidad
     Verifica qué habitaciones están disponibles en un rango de fechas
+    
+    Body: { fecha_entrada, fecha_salida, habitacion_id?, tipo?, precio_max? }
     """
-    if request.habitacion_id:
-        # Verificar disponibilidad de una habitación específica
-        disponible = crud.check_availability(
+    try:
+        # El índice de disponibilidad en memoria resuelve todas las habitaciones libres
+        disponibles = crud.get_habitaciones_disponibles(
             db,
-            request.habitacion_id,
             request.fecha_entrada,
-            request.fecha_salida
+            request.fecha_salida,
+            tipo=request.tipo,
+            precio_max=request.precio_max,
+            habitacion_id=request.habitacion_id
         )
-        
-        if disponible:
-            hab = crud.get_habitacion(db, request.habitacion_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if request.habitacion_id:
+        # Verificar disponibilidad de una habitación específica
+        if disponibles:
             return schemas.DisponibilidadResponse(
                 disponible=True,
                 mensaje="Habitación disponible",
-                habitaciones_libres=[hab] if hab else []
+                habitaciones_libres=disponibles
             )
         else:
             return schemas.DisponibilidadResponse(
                 disponible=False,
                 mensaje="Habitación no disponible en esas fechas"
             )
-    else:
-        # Obtener todas las habitaciones disponibles
-        disponibles = crud.get_habitaciones_disponibles(
-            db,
-            request.fecha_entrada,
-            request.fecha_salida
-        )
-        
-        return schemas.DisponibilidadResponse(
-            disponible=len(disponibles) > 0,
-            mensaje=f"{len(disponibles)} habitaciones disponibles",
-            habitaciones_libres=disponibles
-        )
+    
+    return schemas.DisponibilidadResponse(
+        disponible=len(disponibles) > 0,
+        mensaje=f"{len(disponibles)} habitaciones disponibles",
+        habitaciones_libres=disponibles
+    )
 
 # ============================================================================
 # ENDPOINTS: RESERVAS
@@ -250,19 +365,10 @@ def crear_reserva(
     POST /reservas
     Crea una nueva reserva (con validaciones de disponibilidad)
     
-    IMPORTANTE: Antes de guardar, ejecuta check_availability.
+    IMPORTANTE: La verificación de disponibilidad y el alta se hacen en una
+    única transacción (ver crud.create_reserva), sin carrera entre ambas.
     Si la habitación está ocupada, retorna HTTP 409 (Conflict)
     """
-    # Verificar que el cliente existe
-    cliente = crud.get_cliente(db, reserva.cliente_id)
-    if not cliente:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado")
-    
-    # Verificar que la habitación existe
-    habitacion = crud.get_habitacion(db, reserva.habitacion_id)
-    if not habitacion:
-        raise HTTPException(status_code=404, detail="Habitación no encontrada")
-    
     # Validar que fecha_salida > fecha_entrada
     if reserva.fecha_salida <= reserva.fecha_entrada:
         raise HTTPException(
@@ -270,28 +376,13 @@ def crear_reserva(
             detail="La fecha de salida debe ser posterior a la de entrada"
         )
     
-    # FUNCIÓN CRÍTICA: Verificar disponibilidad
-    disponible = crud.check_availability(
-        db,
-        reserva.habitacion_id,
-        reserva.fecha_entrada,
-        reserva.fecha_salida
-    )
-    
-    if not disponible:
-        raise HTTPException(
-            status_code=409,
-            detail="La habitación no está disponible en esas fechas"
-        )
+    # FUNCIÓN CRÍTICA: Verificar disponibilidad y crear en una sola transacción.
+    # Precio: precio_noche personalizado si se envió, sino precio_base de la habitación
+    nueva_reserva = crud.create_reserva(db, reserva)
     
-    # Calcular precio total
-    # Si se envió precio_noche personalizado, usarlo; sino usar precio_base de habitación
-    precio_por_noche = reserva.precio_noche if reserva.precio_noche else habitacion.precio_base
-    noches = (reserva.fecha_salida - reserva.fecha_entrada).days
-    precio_total = precio_por_noche * noches
-    
-    # Crear la reserva
-    nueva_reserva = crud.create_reserva(db, reserva, precio_total)
+    if not nueva_reserva:
+        status_code, _, detalle = crud.diagnosticar_reserva_rechazada(db, reserva)
+        raise HTTPException(status_code=status_code, detail=detalle)
     
     return nueva_reserva
 
@@ -301,24 +392,40 @@ def listar_reservas(
     fecha_fin: date = None,
     cliente_id: int = None,
     habitacion_id: int = None,
+    after_id: int = None,
+    limit: int = Query(100, ge=1, le=MAX_LIMITE_RESERVAS),
+    orden: str = "id",
     db: Session = Depends(get_db)
 ):
     """
     GET /reservas
     Lista todas las reservas, opcionalmente filtrando por rango de fechas o cliente.
-    Antes de listar, actualiza automáticamente las reservas vencidas.
+    Las reservas vencidas se cierran en la auditoría nocturna (ver auditoria.py).
     Incluye consumos con nombre del producto para determinar estado de pago.
+    
+    Paginación por cursor: ?limit=100 devuelve la primera página; para la siguiente
+    enviar ?after_id=<id de la última reserva recibida>&limit=100 (con el mismo orden).
+    Por defecto se devuelven 100 reservas por página (máximo MAX_LIMITE_RESERVAS).
+    
+    Orden: ?orden=id | fecha_entrada | fecha_salida | precio_total
+    (con "-" adelante para descendente, ej: ?orden=-fecha_entrada)
     """
-    # Actualizar reservas vencidas automáticamente
-    crud.actualizar_reservas_vencidas(db)
+    # Asegurar que la auditoría nocturna de hoy ya corrió (solo consulta la marca)
+    auditoria.asegurar_auditoria(db)
     
-    reservas = crud.get_reservas(
-        db,
-        fecha_inicio=fecha_inicio,
-        fecha_fin=fecha_fin,
-        cliente_id=cliente_id,
-        habitacion_id=habitacion_id
-    )
+    try:
+        reservas = crud.get_reservas(
+            db,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            cliente_id=cliente_id,
+            habitacion_id=habitacion_id,
+            after_id=after_id,
+            limit=limit,
+            orden=orden
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Enriquecer consumos con nombre del producto
     resultado = []
@@ -331,6 +438,9 @@ def listar_reservas(
             "fecha_salida": reserva.fecha_salida,
             "precio_total": reserva.precio_total,
             "estado": reserva.estado.value if hasattr(reserva.estado, 'value') else str(reserva.estado),
+            "total_consumos": reserva.total_consumos,
+            "total_pagos": reserva.total_pagos,
+            "saldo": reserva.saldo,
             "cliente": reserva.cliente,
             "habitacion": reserva.habitacion,
             "consumos": [
@@ -349,16 +459,37 @@ def listar_reservas(
     return resultado
 
 @app.get("/reservas/historial", response_model=List[schemas.ReservaHistorialResponse])
-def obtener_historial(db: Session = Depends(get_db)):
+def obtener_historial(
+    q: str = None,
+    desde: date = None,
+    hasta: date = None,
+    estado: str = None,
+    after_id: int = None,
+    limit: int = Query(100, ge=1, le=MAX_LIMITE_RESERVAS),
+    db: Session = Depends(get_db)
+):
     """
     GET /reservas/historial
-    Obtiene reservas finalizadas o canceladas.
-    Antes de listar, actualiza automáticamente las reservas vencidas.
-    """
-    # Actualizar reservas vencidas automáticamente
-    crud.actualizar_reservas_vencidas(db)
+    Obtiene reservas finalizadas o canceladas, las más recientes primero.
+    Las reservas vencidas se cierran en la auditoría nocturna (ver auditoria.py).
+    
+    Query Parameters:
+        q: Buscar por nombre del cliente, DNI o número de habitación
+        desde / hasta: Rango de fechas de la estadía (YYYY-MM-DD)
+        estado: FINALIZADA, CANCELADA o CHECKOUT
+        after_id: ID de la última reserva recibida (página siguiente)
+        limit: Reservas por página (por defecto 100)
+    """
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="La fecha 'desde' debe ser anterior o igual a 'hasta'")
+    
+    # Asegurar que la auditoría nocturna de hoy ya corrió (solo consulta la marca)
+    auditoria.asegurar_auditoria(db)
     
-    return crud.get_reservas_historial(db)
+    try:
+        return crud.get_reservas_historial(db, q, desde, hasta, estado, after_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/reservas/{reserva_id}", response_model=schemas.ReservaResponse)
 def obtener_reserva(reserva_id: int, db: Session = Depends(get_db)):
@@ -458,6 +589,125 @@ def checkout_reserva(reserva_id: int, db: Session = Depends(get_db)):
         "precio_total_final": reserva.precio_total
     }
 
+# ============================================================================
+# ENDPOINTS: EXPORTACIÓN (CONTABILIDAD)
+# ============================================================================
+
+@app.get("/exportar/reservas")
+def exportar_reservas(
+    formato: str = "ndjson",
+    desde: date = None,
+    hasta: date = None,
+    estado: str = None
+):
+    """
+    GET /exportar/reservas?formato=ndjson|csv&desde=YYYY-MM-DD&hasta=YYYY-MM-DD&estado=
+    Exporta el historial completo de reservas con sus consumos como un flujo,
+    leyendo la base por lotes (la memoria no crece con el tamaño del historial).
+    
+    - ndjson: una reserva por línea, con sus consumos anidados
+    - csv: una fila por línea del folio
+    
+    Filtros: fecha de entrada >= desde, fecha de salida <= hasta, estado
+    """
+    if estado and estado.upper() not in EstadoReserva.__members__:
+        raise HTTPException(status_code=400, detail=f"Estado inválido: {estado}")
+    
+    if formato == "ndjson":
+        contenido = exportacion.generar_ndjson(SessionLocal, desde, hasta, estado)
+        media_type = "application/x-ndjson"
+    elif formato == "csv":
+        contenido = exportacion.generar_csv(SessionLocal, desde, hasta, estado)
+        media_type = "text/csv"
+    else:
+        raise HTTPException(status_code=400, detail="Formato inválido. Usa ndjson o csv")
+    
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="reservas.{formato}"'}
+    )
+
+# ============================================================================
+# ENDPOINTS: EVENTOS EN TIEMPO REAL (SSE)
+# ============================================================================
+
+@app.get("/eventos")
+async def stream_eventos(request: Request, last_event_id: str = Header(None)):
+    """
+    GET /eventos
+    Stream Server-Sent Events con los cambios confirmados en crud
+    (reserva.creada, reserva.checkin, reserva.checkout, reserva.cancelada,
+    consumo.creado, habitacion.estado_cambiado, ...).
+    
+    Cada evento lleva id; al reconectarse, el navegador envía Last-Event-ID y
+    recibe lo que se perdió. Si no se puede reconstruir llega un evento "resync"
+    y el cliente debe recargar sus listas una vez.
+    """
+    return StreamingResponse(
+        eventos.difusor.flujo(request, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============================================================================
+# ENDPOINTS: SINCRONIZACIÓN INCREMENTAL
+# ============================================================================
+
+@app.get("/cambios", response_model=schemas.CambiosResponse)
+def obtener_cambios(
+    desde: int = Query(None, ge=0),
+    limite: int = Query(500, ge=1, le=MAX_LIMITE_CAMBIOS),
+    db: Session = Depends(get_db)
+):
+    """
+    GET /cambios?desde=<seq>
+    Devuelve las reservas, habitaciones, clientes, consumos y productos que cambiaron
+    después de `desde` (su estado actual) y los IDs eliminados.
+    
+    Uso desde un cliente que se reconecta:
+    1. Primera vez: cargar las listas completas y guardar `hasta` de GET /cambios (sin desde)
+    2. Al reconectarse: GET /cambios?desde=<hasta guardado>, aplicar y guardar el nuevo `hasta`;
+       si hay_mas es true, repetir
+    3. Si responde 410, los cambios ya se purgaron: recargar todo y volver al paso 1
+    """
+    try:
+        return crud.get_cambios(db, desde, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+# ============================================================================
+# ENDPOINTS: ADMINISTRACIÓN
+# ============================================================================
+
+@app.post("/admin/auditoria-nocturna", response_model=schemas.AuditoriaResponse)
+def ejecutar_auditoria_nocturna(db: Session = Depends(get_db)):
+    """
+    POST /admin/auditoria-nocturna
+    Ejecuta a demanda el cierre del día: pasa a FINALIZADA las reservas en CHECKIN
+    cuya fecha de salida ya pasó y registra la marca de auditoría de hoy
+    """
+    return auditoria.ejecutar_auditoria_nocturna(db)
+
+@app.post("/admin/reconciliar-folios")
+def reconciliar_folios(db: Session = Depends(get_db)):
+    """
+    POST /admin/reconciliar-folios
+    Recalcula desde los consumos los totales guardados en cada reserva
+    (total_consumos, total_pagos, saldo) y corrige los que no coinciden
+    """
+    corregidas = crud.reconciliar_folios(db)
+    return {"reservas_corregidas": len(corregidas), "ids": corregidas}
+
+@app.post("/admin/reconstruir-inventario")
+def reconstruir_inventario(db: Session = Depends(get_db)):
+    """
+    POST /admin/reconstruir-inventario
+    Recalcula desde las reservas el inventario diario (noches vendidas y
+    bloqueadas por fecha y tipo) y reemplaza el guardado
+    """
+    return crud.reconstruir_inventario(db)
+
 # ============================================================================
 # HEALTH CHECK - COMENTADO PARA QUE EL FRONTEND SEA LA RAÍZ
 # ============================================================================
@@ -480,9 +730,99 @@ def checkout_reserva(reserva_id: int, db: Session = Depends(get_db)):
 # ENDPOINT: DISPONIBILIDAD POR FECHA
 # ============================================================================
 
+@app.get("/disponibilidad/rango", response_model=schemas.CalendarioRangoResponse)
+def get_disponibilidad_rango(
+    desde: date,
+    hasta: date,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /disponibilidad/rango?desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+    Devuelve la matriz habitación × día (ambos extremos inclusive) con el estado
+    y el ID de reserva de cada noche, calculada en una sola pasada.
+    Reemplaza las llamadas día por día a GET /disponibilidad?fecha=
+    """
+    if hasta < desde:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'hasta' debe ser igual o posterior a 'desde'"
+        )
+    if (hasta - desde).days >= MAX_DIAS_CALENDARIO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {MAX_DIAS_CALENDARIO} días"
+        )
+    
+    # Asegurar que la auditoría nocturna de hoy ya corrió (solo consulta la marca)
+    auditoria.asegurar_auditoria(db)
+    
+    return crud.get_calendario_rango(db, desde, hasta)
+
+@app.get("/inventario", response_model=schemas.InventarioResponse)
+def get_inventario(
+    desde: date,
+    hasta: date,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /inventario?desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+    Disponibilidad por tipo de habitación para cada noche del rango (ambos
+    extremos inclusive): habitaciones, vendidas, bloqueadas y libres.
+    Se lee del inventario diario, sin recorrer reservas ni habitaciones por noche.
+    """
+    if hasta < desde:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'hasta' debe ser igual o posterior a 'desde'"
+        )
+    if (hasta - desde).days >= MAX_DIAS_CALENDARIO:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {MAX_DIAS_CALENDARIO} días"
+        )
+    
+    return crud.get_inventario(db, desde, hasta)
+
+@app.get("/kpis", response_model=schemas.KpisResponse)
+def get_kpis(
+    request: Request,
+    desde: date = None,
+    hasta: date = None,
+    db: Session = Depends(get_db)
+):
+    """
+    GET /kpis?desde=YYYY-MM-DD&hasta=YYYY-MM-DD
+    Indicadores del tablero: habitaciones por estado, llegadas y salidas de hoy,
+    huéspedes en casa, y ocupación, ADR y RevPAR de hoy y del rango pedido
+    (opcional; ambos extremos inclusive).
+    
+    Cacheado por (fecha de negocio, rango, versión del tablero), con ETag/304.
+    """
+    if hasta is not None and desde is None:
+        raise HTTPException(status_code=400, detail="Falta la fecha 'desde'")
+    if desde is not None and hasta is not None and hasta < desde:
+        raise HTTPException(
+            status_code=400,
+            detail="La fecha 'hasta' debe ser igual o posterior a 'desde'"
+        )
+    
+    # Asegurar que la auditoría nocturna de hoy ya corrió (solo consulta la marca)
+    auditoria.asegurar_auditoria(db)
+    
+    hoy = date.today()
+    return cache.respuesta_cacheada(
+        request,
+        cache_kpis,
+        f"{hoy}_{desde or ''}_{hasta or ''}",
+        crud.get_version_datos(db, "tablero"),
+        lambda: crud.get_kpis(db, desde, hasta, hoy),
+        modelo=schemas.KpisResponse
+    )
+
 @app.get("/disponibilidad")
 def get_disponibilidad_por_fecha(
     fecha: str,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
@@ -496,22 +836,26 @@ def get_disponibilidad_por_fecha(
         Lista de habitaciones con estado_en_fecha ('DISPONIBLE' u 'OCUPADA')
     """
     try:
-        # Actualizar reservas vencidas automáticamente (sincronizar con otras vistas)
-        crud.actualizar_reservas_vencidas(db)
+        # Asegurar que la auditoría nocturna de hoy ya corrió (solo consulta la marca)
+        auditoria.asegurar_auditoria(db)
         
         # Convertir string a date
         from datetime import datetime
         fecha_obj = datetime.strptime(fecha, "%Y-%m-%d").date()
-        
-        # Obtener habitaciones con estado en esa fecha
-        habitaciones = crud.get_habitaciones_por_fecha(db, fecha_obj)
-        
-        return habitaciones
     except ValueError as e:
         raise HTTPException(
             status_code=400,
             detail=f"Formato de fecha inválido. Usa YYYY-MM-DD: {str(e)}"
         )
+    
+    # Obtener habitaciones con estado en esa fecha (cacheado por fecha y versión del tablero)
+    return cache.respuesta_cacheada(
+        request,
+        cache_disponibilidad,
+        fecha_obj,
+        crud.get_version_datos(db, "tablero"),
+        lambda: crud.get_habitaciones_por_fecha(db, fecha_obj)
+    )
 
 # ============================================================================
 # SERVIR FRONTEND ESTÁTICO (PRODUCCIÓN) - DESACTIVADO EN DESARROLLO
@@ -560,12 +904,23 @@ def get_disponibilidad_por_fecha(
 # ============================================================================
 
 @app.get("/productos", response_model=List[schemas.ProductoResponse])
-def listar_productos(solo_activos: bool = False, db: Session = Depends(get_db)):
+def listar_productos(request: Request, solo_activos: bool = False, db: Session = Depends(get_db)):
     """
     GET /productos
     Lista todos los productos del minibar/kiosko
-    """
-    return crud.get_productos(db, solo_activos)
+    
+    Sale del catálogo en memoria y lleva ETag por versión de productos:
+    al reabrir el POS el navegador recibe 304 si nada cambió.
+    """
+    vigente = catalogo.catalogo_productos.obtener(db)
+    return cache.respuesta_cacheada(
+        request,
+        cache_productos,
+        "activos" if solo_activos else "todos",
+        vigente.version,
+        lambda: vigente.listar(solo_activos),
+        modelo=List[schemas.ProductoResponse]
+    )
 
 @app.post("/productos", response_model=schemas.ProductoResponse)
 def crear_producto(producto: schemas.ProductoCreate, db: Session = Depends(get_db)):
@@ -601,9 +956,12 @@ def actualizar_producto(producto_id: int, producto: schemas.ProductoCreate, db:
 def eliminar_producto(producto_id: int, db: Session = Depends(get_db)):
     """
     DELETE /productos/{id}
-    Elimina un producto
+    Elimina un producto (si ya tiene consumos, solo lo desactiva)
     """
-    if crud.delete_producto(db, producto_id):
+    resultado = crud.delete_producto(db, producto_id)
+    if resultado == "desactivado":
+        return {"mensaje": "El producto tiene consumos registrados: se desactivó en lugar de eliminarse"}
+    if resultado:
         return {"mensaje": "Producto eliminado correctamente"}
     raise HTTPException(status_code=404, detail="Producto no encontrado")
 
@@ -639,6 +997,22 @@ def agregar_consumo_manual(reserva_id: int, consumo: schemas.ConsumoManualCreate
         raise HTTPException(status_code=400, detail="No se pudo registrar el consumo. Verifique que la reserva exista.")
     return db_consumo
 
+@app.post("/reservas/{reserva_id}/consumos/lote", response_model=schemas.ConsumoLoteResponse)
+def agregar_consumos_lote(reserva_id: int, lote: schemas.ConsumoLoteCreate, db: Session = Depends(get_db)):
+    """
+    POST /reservas/{id}/consumos/lote
+    Registra un carrito completo en una sola transacción (todas las líneas o ninguna).
+    Cada ítem lleva producto_id (precio de lista) o concepto + precio (ítem manual, pagos).
+    Devuelve los consumos creados y los totales del folio actualizados.
+    """
+    try:
+        resultado = crud.registrar_consumos_lote(db, reserva_id, lote.items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Reserva no encontrada")
+    return resultado
+
 @app.get("/reservas/{reserva_id}/consumos", response_model=List[schemas.ConsumoResponse])
 def listar_consumos(reserva_id: int, db: Session = Depends(get_db)):
     """
@@ -679,6 +1053,16 @@ def obtener_cuenta(reserva_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Reserva no encontrada")
     return cuenta
 
+@app.post("/cuentas/batch", response_model=List[schemas.CuentaResponse])
+def obtener_cuentas_batch(pedido: schemas.CuentasBatchRequest, db: Session = Depends(get_db)):
+    """
+    POST /cuentas/batch
+    Cuentas de varias reservas en una sola llamada (ej: todas las salidas del día).
+    Body: {"reserva_ids": [1, 2, 3]} (hasta 200). Devuelve las cuentas en el orden
+    pedido con el mismo formato que GET /reservas/{id}/cuenta; los IDs inexistentes se omiten.
+    """
+    return crud.get_cuentas_reservas(db, pedido.reserva_ids)
+
 # ============================================================================
 # ENDPOINTS: CHECK-IN
 # ============================================================================
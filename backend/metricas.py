@@ -0,0 +1,135 @@
+"""
+Puente Hotel - Métricas por Request
+Cuenta las sentencias SQL, el tiempo de base de datos y el tiempo total de cada
+request, agregados por ruta en histogramas expuestos en formato Prometheus (GET /metrics).
+
+- Los eventos de SQLAlchemy (before/after_cursor_execute) suman en el contador
+  del request actual, que viaja en una ContextVar (también llega a los endpoints
+  síncronos que FastAPI ejecuta en el threadpool).
+- El middleware de main.py abre el contador, mide el request y agrega el header
+  X-SQL-Statements a la respuesta.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+# Límites de los buckets (segundos para tiempos, cantidad para sentencias)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SENTENCIAS = (1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+
+@dataclass
+class MedicionRequest:
+    """Acumulado de SQL del request en curso"""
+    sentencias: int = 0
+    segundos_db: float = 0.0
+
+_medicion_actual: ContextVar = ContextVar("medicion_request", default=None)
+
+# ============================================================================
+# HOOKS DE SQLALCHEMY
+# ============================================================================
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    conn.info["inicio_sql"] = time.perf_counter()
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.sentencias += 1
+        medicion.segundos_db += time.perf_counter() - conn.info.pop("inicio_sql", time.perf_counter())
+
+def instrumentar_engine(engine) -> None:
+    """Registra los hooks de conteo en el engine (una sola vez)"""
+    if not event.contains(engine, "before_cursor_execute", _antes_de_ejecutar):
+        event.listen(engine, "before_cursor_execute", _antes_de_ejecutar)
+        event.listen(engine, "after_cursor_execute", _despues_de_ejecutar)
+
+def iniciar_medicion() -> tuple:
+    """Abre el contador del request actual. Devuelve (medición, token para cerrarla)"""
+    medicion = MedicionRequest()
+    return medicion, _medicion_actual.set(medicion)
+
+def finalizar_medicion(token) -> None:
+    _medicion_actual.reset(token)
+
+# ============================================================================
+# HISTOGRAMAS
+# ============================================================================
+
+class Histograma:
+    """Histograma acumulativo al estilo Prometheus, con una serie por juego de etiquetas"""
+
+    def __init__(self, nombre: str, ayuda: str, buckets: tuple, etiquetas: tuple):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self.etiquetas = etiquetas
+        self._series = {}
+
+    def observar(self, valores_etiquetas: tuple, valor: float) -> None:
+        serie = self._series.get(valores_etiquetas)
+        if serie is None:
+            # [conteos por bucket..., +Inf, suma]
+            serie = self._series[valores_etiquetas] = [0] * (len(self.buckets) + 1) + [0.0]
+        serie[bisect_left(self.buckets, valor)] += 1
+        serie[-1] += valor
+
+    def exportar(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for valores_etiquetas, serie in sorted(self._series.items()):
+            base = _formatear_etiquetas(self.etiquetas, valores_etiquetas)
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + ("+Inf",), serie[:-1]):
+                acumulado += conteo
+                lineas.append(f'{self.nombre}_bucket{{{base},le="{limite}"}} {acumulado}')
+            lineas.append(f"{self.nombre}_sum{{{base}}} {serie[-1]:.6f}")
+            lineas.append(f"{self.nombre}_count{{{base}}} {acumulado}")
+        return lineas
+
+def _formatear_etiquetas(nombres: tuple, valores: tuple) -> str:
+    # Los valores son métodos, plantillas de ruta y status: no llevan comillas que escapar
+    return ",".join(f'{nombre}="{valor}"' for nombre, valor in zip(nombres, valores))
+
+_lock = threading.Lock()
+_requests_totales = {}
+
+_duracion_request = Histograma(
+    "puente_http_request_duration_seconds", "Tiempo total del request (handler incluido)",
+    BUCKETS_SEGUNDOS, ("method", "route")
+)
+_tiempo_db = Histograma(
+    "puente_db_time_seconds", "Tiempo de base de datos por request",
+    BUCKETS_SEGUNDOS, ("method", "route")
+)
+_sentencias_por_request = Histograma(
+    "puente_db_statements_per_request", "Sentencias SQL ejecutadas por request",
+    BUCKETS_SENTENCIAS, ("method", "route")
+)
+
+def registrar_request(metodo: str, ruta: str, status: int, segundos: float, medicion: MedicionRequest) -> None:
+    """Agrega un request terminado a los histogramas"""
+    etiquetas = (metodo, ruta)
+    with _lock:
+        clave = (metodo, ruta, status)
+        _requests_totales[clave] = _requests_totales.get(clave, 0) + 1
+        _duracion_request.observar(etiquetas, segundos)
+        _tiempo_db.observar(etiquetas, medicion.segundos_db)
+        _sentencias_por_request.observar(etiquetas, medicion.sentencias)
+
+def exportar_prometheus() -> str:
+    """Texto de exposición de Prometheus (versión 0.0.4)"""
+    with _lock:
+        lineas = ["# HELP puente_http_requests_total Requests atendidos",
+                  "# TYPE puente_http_requests_total counter"]
+        for valores, total in sorted(_requests_totales.items()):
+            lineas.append(
+                f"puente_http_requests_total{{{_formatear_etiquetas(('method', 'route', 'status'), valores)}}} {total}"
+            )
+        for histograma in (_duracion_request, _tiempo_db, _sentencias_por_request):
+            lineas.extend(histograma.exportar())
+    return "\n".join(lineas) + "\n"
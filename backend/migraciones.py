@@ -0,0 +1,297 @@
+"""
+Puente Hotel - Migraciones de Base de Datos
+Migraciones versionadas para bases existentes (reemplaza migrate_pos.py y add_telefono.py).
+
+La versión aplicada se guarda en PRAGMA user_version de SQLite.
+init_db() aplica las migraciones pendientes al arrancar; también se pueden
+aplicar o verificar desde la terminal:
+
+    python migraciones.py              # Aplica las migraciones pendientes
+    python migraciones.py --verificar  # Verifica que las consultas críticas usen índices
+
+Cada migración es idempotente: en una base nueva (creada por create_all)
+las tablas, columnas e índices ya existen y solo se registra la versión.
+"""
+
+import logging
+import sys
+from datetime import date
+
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# MIGRACIONES
+# ============================================================================
+
+def _crear_tablas_pos(conn):
+    """Tablas del POS: productos y consumos (antes migrate_pos.py)"""
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre VARCHAR(100) NOT NULL UNIQUE,
+            precio REAL NOT NULL,
+            activo INTEGER DEFAULT 1
+        )
+    ''')
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS consumos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reserva_id INTEGER NOT NULL,
+            producto_id INTEGER NOT NULL,
+            cantidad INTEGER DEFAULT 1,
+            precio_unitario REAL NOT NULL,
+            fecha_consumo DATE DEFAULT CURRENT_DATE,
+            FOREIGN KEY (reserva_id) REFERENCES reservas(id),
+            FOREIGN KEY (producto_id) REFERENCES productos(id)
+        )
+    ''')
+
+def _agregar_telefono_clientes(conn):
+    """Columna telefono en clientes (antes add_telefono.py)"""
+    columnas = [fila[1] for fila in conn.exec_driver_sql("PRAGMA table_info(clientes)")]
+    if "telefono" not in columnas:
+        conn.exec_driver_sql("ALTER TABLE clientes ADD COLUMN telefono TEXT")
+
+def _crear_indices_reservas_consumos(conn):
+    """Índices compuestos para disponibilidad, tablero, llegadas y folios"""
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservas_habitacion_estado_fechas "
+        "ON reservas (habitacion_id, estado, fecha_entrada, fecha_salida)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservas_estado_salida ON reservas (estado, fecha_salida)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_reservas_entrada_estado ON reservas (fecha_entrada, estado)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_consumos_reserva_id ON consumos (reserva_id)"
+    )
+    conn.exec_driver_sql("ANALYZE")
+
+def _crear_indice_busqueda_clientes(conn):
+    """
+    Índice FTS5 con tokenizador trigram sobre nombre, DNI, email y teléfono.
+    Es una tabla "external content": no duplica los datos de clientes, solo el
+    índice, y los triggers la mantienen sincronizada con cada INSERT/UPDATE/DELETE.
+    El trigram permite buscar cualquier fragmento de 3+ caracteres ("sos" → "Sosa").
+    
+    Si el SQLite instalado no trae FTS5 o el tokenizador trigram (anterior a 3.34),
+    la migración se registra igual sin crear el índice y la búsqueda usa LIKE.
+    """
+    try:
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5("
+            "nombre_completo, dni, email, telefono, "
+            "content='clientes', content_rowid='id', tokenize='trigram')"
+        )
+    except OperationalError as e:
+        logger.warning("SQLite sin FTS5/trigram (%s): la búsqueda de clientes usará LIKE", e.orig)
+        return
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS clientes_fts_insert AFTER INSERT ON clientes BEGIN "
+        "INSERT INTO clientes_fts (rowid, nombre_completo, dni, email, telefono) "
+        "VALUES (new.id, new.nombre_completo, new.dni, new.email, new.telefono); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS clientes_fts_delete AFTER DELETE ON clientes BEGIN "
+        "INSERT INTO clientes_fts (clientes_fts, rowid, nombre_completo, dni, email, telefono) "
+        "VALUES ('delete', old.id, old.nombre_completo, old.dni, old.email, old.telefono); "
+        "END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS clientes_fts_update AFTER UPDATE ON clientes BEGIN "
+        "INSERT INTO clientes_fts (clientes_fts, rowid, nombre_completo, dni, email, telefono) "
+        "VALUES ('delete', old.id, old.nombre_completo, old.dni, old.email, old.telefono); "
+        "INSERT INTO clientes_fts (rowid, nombre_completo, dni, email, telefono) "
+        "VALUES (new.id, new.nombre_completo, new.dni, new.email, new.telefono); "
+        "END"
+    )
+    # Indexar los clientes que ya existían
+    conn.exec_driver_sql("INSERT INTO clientes_fts (clientes_fts) VALUES ('rebuild')")
+
+def _agregar_totales_folio(conn):
+    """
+    Columnas total_consumos, total_pagos y saldo en reservas, calculadas una vez
+    desde los consumos existentes. Desde acá las mantiene crud en cada consumo.
+    """
+    columnas = [fila[1] for fila in conn.exec_driver_sql("PRAGMA table_info(reservas)")]
+    for columna in ("total_consumos", "total_pagos", "saldo"):
+        if columna not in columnas:
+            conn.exec_driver_sql(f"ALTER TABLE reservas ADD COLUMN {columna} FLOAT NOT NULL DEFAULT 0")
+    conn.exec_driver_sql(
+        "UPDATE reservas SET "
+        "total_consumos = COALESCE((SELECT SUM(c.cantidad * c.precio_unitario) FROM consumos c "
+        "WHERE c.reserva_id = reservas.id AND c.precio_unitario > 0), 0), "
+        "total_pagos = COALESCE((SELECT -SUM(c.cantidad * c.precio_unitario) FROM consumos c "
+        "WHERE c.reserva_id = reservas.id AND c.precio_unitario < 0), 0)"
+    )
+    conn.exec_driver_sql("UPDATE reservas SET saldo = precio_total + total_consumos - total_pagos")
+
+def _crear_inventario_diario(conn):
+    """
+    Tabla inventario_diario (noches vendidas y bloqueadas por fecha y tipo),
+    cargada una vez desde las reservas existentes. Desde acá la mantiene crud.
+    Cada reserva no cancelada se expande en sus noches con un CTE recursivo.
+    """
+    conn.exec_driver_sql('''
+        CREATE TABLE IF NOT EXISTS inventario_diario (
+            fecha DATE NOT NULL,
+            tipo VARCHAR(6) NOT NULL,
+            vendidas INTEGER NOT NULL DEFAULT 0,
+            bloqueadas INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (fecha, tipo)
+        )
+    ''')
+    conn.exec_driver_sql("DELETE FROM inventario_diario")
+    conn.exec_driver_sql(
+        "WITH RECURSIVE noches (fecha, salida, tipo, estado) AS ("
+        " SELECT r.fecha_entrada, r.fecha_salida, h.tipo, r.estado"
+        " FROM reservas r JOIN habitaciones h ON h.id = r.habitacion_id"
+        " WHERE r.estado != 'CANCELADA' AND r.fecha_entrada < r.fecha_salida"
+        " UNION ALL"
+        " SELECT date(fecha, '+1 day'), salida, tipo, estado FROM noches"
+        " WHERE date(fecha, '+1 day') < salida"
+        ") "
+        "INSERT INTO inventario_diario (fecha, tipo, vendidas, bloqueadas) "
+        "SELECT fecha, tipo, SUM(estado != 'PENDIENTE'), SUM(estado = 'PENDIENTE') "
+        "FROM noches GROUP BY fecha, tipo"
+    )
+
+# (versión, descripción, función). Agregar nuevas migraciones SIEMPRE al final.
+MIGRACIONES = [
+    (1, "Tablas del POS (productos y consumos)", _crear_tablas_pos),
+    (2, "Columna telefono en clientes", _agregar_telefono_clientes),
+    (3, "Índices compuestos de reservas y consumos", _crear_indices_reservas_consumos),
+    (4, "Índice de búsqueda de clientes (FTS5 trigram)", _crear_indice_busqueda_clientes),
+    (5, "Totales del folio en reservas (consumos, pagos y saldo)", _agregar_totales_folio),
+    (6, "Inventario diario por fecha y tipo de habitación", _crear_inventario_diario),
+]
+
+def version_actual(engine) -> int:
+    """Devuelve la última versión de migración aplicada a la base"""
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def aplicar_migraciones(engine) -> list[int]:
+    """
+    Aplica en orden las migraciones con versión mayor a la registrada.
+    Cada migración corre en su propia transacción junto con el cambio de versión.
+    
+    Returns:
+        Lista de versiones aplicadas
+    """
+    aplicadas = []
+    if engine.dialect.name != "sqlite":
+        # Las migraciones usan PRAGMAs de SQLite; otros motores se gestionan aparte
+        return aplicadas
+    
+    version = version_actual(engine)
+    
+    for numero, descripcion, migracion in MIGRACIONES:
+        if numero <= version:
+            continue
+        with engine.begin() as conn:
+            migracion(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {numero}")
+        logger.info("Migración v%d aplicada: %s", numero, descripcion)
+        aplicadas.append(numero)
+    
+    return aplicadas
+
+# ============================================================================
+# VERIFICACIÓN: LAS CONSULTAS CRÍTICAS DEBEN USAR ÍNDICES
+# ============================================================================
+
+# (nombre, SQL equivalente a la consulta de crud.py, parámetros, tablas que SÍ pueden recorrerse)
+# En la disponibilidad se recorren todas las habitaciones (alias h) a propósito;
+# lo que no puede recorrerse completo son reservas ni consumos.
+_HOY = date.today().isoformat()
+CONSULTAS_CRITICAS = [
+    (
+        "disponibilidad (NOT EXISTS por habitación)",
+        "SELECT h.id FROM habitaciones h WHERE NOT EXISTS ("
+        " SELECT 1 FROM reservas r WHERE r.habitacion_id = h.id AND r.estado != 'CANCELADA'"
+        " AND r.fecha_entrada < ? AND r.fecha_salida > ?)",
+        (_HOY, _HOY),
+        {"h"},
+    ),
+    (
+        "solapamiento de una habitación",
+        "SELECT id FROM reservas WHERE habitacion_id = ? AND estado != 'CANCELADA'"
+        " AND fecha_entrada < ? AND fecha_salida > ? LIMIT 1",
+        (1, _HOY, _HOY),
+        set(),
+    ),
+    (
+        "tablero de habitaciones (reservas vigentes)",
+        "SELECT id FROM reservas WHERE estado IN ('PENDIENTE', 'CHECKIN') AND fecha_salida > ?",
+        (_HOY,),
+        set(),
+    ),
+    (
+        "auditoría nocturna (CHECKIN vencidas)",
+        "SELECT id FROM reservas WHERE estado = 'CHECKIN' AND fecha_salida < ?",
+        (_HOY,),
+        set(),
+    ),
+    (
+        "llegadas de hoy",
+        "SELECT id FROM reservas WHERE fecha_entrada = ? AND estado = 'PENDIENTE'",
+        (_HOY,),
+        set(),
+    ),
+    (
+        "folio de una reserva",
+        "SELECT id FROM consumos WHERE reserva_id = ?",
+        (1,),
+        set(),
+    ),
+    (
+        "inventario diario por rango de fechas",
+        "SELECT fecha, tipo, vendidas, bloqueadas FROM inventario_diario WHERE fecha BETWEEN ? AND ?",
+        (_HOY, _HOY),
+        set(),
+    ),
+]
+
+def verificar_planes(engine) -> list[str]:
+    """
+    Ejecuta EXPLAIN QUERY PLAN sobre cada consulta crítica y verifica que
+    cada tabla se lea con SEARCH sobre un índice, nunca con un SCAN completo
+    (salvo las tablas permitidas explícitamente).
+    
+    Returns:
+        Lista de problemas encontrados (vacía si todo usa índices)
+    """
+    problemas = []
+    with engine.connect() as conn:
+        for nombre, sql, params, scan_permitido in CONSULTAS_CRITICAS:
+            plan = [fila[3] for fila in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+            for paso in plan:
+                partes = paso.split()
+                if partes[0] == "SCAN" and partes[1] not in scan_permitido:
+                    problemas.append(f"{nombre}: {paso}")
+                elif partes[0] == "SEARCH" and "INDEX" not in paso and "PRIMARY KEY" not in paso:
+                    problemas.append(f"{nombre}: {paso}")
+    return problemas
+
+if __name__ == "__main__":
+    from models import engine, init_db
+    from registro import configurar_logging
+    
+    configurar_logging()
+    init_db()
+    print(f"✓ Base de datos en la versión {version_actual(engine)}")
+    
+    if "--verificar" in sys.argv:
+        problemas = verificar_planes(engine)
+        if problemas:
+            print("❌ Consultas que no usan índices:")
+            for problema in problemas:
+                print(f"   - {problema}")
+            sys.exit(1)
+        print(f"✓ Las {len(CONSULTAS_CRITICAS)} consultas críticas usan índices")
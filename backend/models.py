@@ -4,11 +4,13 @@ Arquitectura: SQLAlchemy + SQLite
 Regla crítica: El precio se guarda en la reserva, no solo en la habitación
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, Enum, ForeignKey
+from sqlalchemy import create_engine, event, make_url, Column, Integer, String, Float, Date, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.pool import QueuePool, StaticPool
 from enum import Enum as PyEnum
 from datetime import date, datetime
+import os
 
 Base = declarative_base()
 
@@ -81,6 +83,14 @@ class Cliente(Base):
 
 class Reserva(Base):
     __tablename__ = "reservas"
+    __table_args__ = (
+        # Disponibilidad y tablero: solapamiento por habitación
+        Index("ix_reservas_habitacion_estado_fechas", "habitacion_id", "estado", "fecha_entrada", "fecha_salida"),
+        # Tablero, calendario y auditoría nocturna: estado + fin de estadía
+        Index("ix_reservas_estado_salida", "estado", "fecha_salida"),
+        # Llegadas del día (check-in)
+        Index("ix_reservas_entrada_estado", "fecha_entrada", "estado"),
+    )
     
     id = Column(Integer, primary_key=True)
     habitacion_id = Column(Integer, ForeignKey("habitaciones.id"), nullable=False)
@@ -92,6 +102,12 @@ class Reserva(Base):
     checkin_timestamp = Column(DateTime, nullable=True)  # Hora exacta del check-in
     checkout_timestamp = Column(DateTime, nullable=True)  # Hora exacta del check-out
     
+    # Totales del folio, mantenidos por crud en cada alta/cambio/baja de consumo
+    # (se reconstruyen con: python auditoria.py --reconciliar-folios)
+    total_consumos = Column(Float, nullable=False, default=0, server_default="0")  # Cargos (precio > 0)
+    total_pagos = Column(Float, nullable=False, default=0, server_default="0")  # Pagos (precio < 0, en positivo)
+    saldo = Column(Float, nullable=False, default=0, server_default="0")  # precio_total + consumos - pagos
+    
     # Relaciones
     habitacion = relationship("Habitacion", back_populates="reservas")
     cliente = relationship("Cliente", back_populates="reservas")
@@ -126,7 +142,7 @@ class Consumo(Base):
     __tablename__ = "consumos"
     
     id = Column(Integer, primary_key=True)
-    reserva_id = Column(Integer, ForeignKey("reservas.id"), nullable=False)
+    reserva_id = Column(Integer, ForeignKey("reservas.id"), nullable=False, index=True)
     producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
     cantidad = Column(Integer, nullable=False, default=1)
     precio_unitario = Column(Float, nullable=False)  # Precio al momento del consumo
@@ -139,18 +155,158 @@ class Consumo(Base):
     def __repr__(self):
         return f"<Consumo {self.cantidad}x {self.producto.nombre} - Reserva {self.reserva_id}>"
 
+# ============================================================================
+# TABLE: Inventario Diario (noches ocupadas por fecha y tipo de habitación)
+# ============================================================================
+
+class InventarioDiario(Base):
+    __tablename__ = "inventario_diario"
+    
+    # Una fila por noche y tipo. La mantiene crud en cada alta/cambio/baja de reservas
+    # (se reconstruye con: python auditoria.py --reconstruir-inventario)
+    fecha = Column(Date, primary_key=True)  # Noche (fecha de entrada <= fecha < fecha de salida)
+    tipo = Column(Enum(TipoHabitacion), primary_key=True)
+    vendidas = Column(Integer, nullable=False, default=0, server_default="0")  # Reservas CHECKIN/CHECKOUT/FINALIZADA
+    bloqueadas = Column(Integer, nullable=False, default=0, server_default="0")  # Reservas PENDIENTE (sin check-in)
+    
+    def __repr__(self):
+        return f"<InventarioDiario {self.fecha} {self.tipo.value}: {self.vendidas} vendidas, {self.bloqueadas} bloqueadas>"
+
+# ============================================================================
+# TABLE: Auditoría Nocturna (marca de la última fecha de negocio cerrada)
+# ============================================================================
+
+class AuditoriaNocturna(Base):
+    __tablename__ = "auditoria_nocturna"
+    
+    fecha_negocio = Column(Date, primary_key=True)  # Día de negocio auditado
+    ejecutada_en = Column(DateTime, nullable=False)
+    reservas_finalizadas = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<AuditoriaNocturna {self.fecha_negocio} ({self.reservas_finalizadas} finalizadas)>"
+
+# ============================================================================
+# TABLE: Versiones de Datos (contador por grupo, se incrementa en cada escritura)
+# ============================================================================
+
+class VersionDatos(Base):
+    __tablename__ = "versiones_datos"
+    
+    clave = Column(String, primary_key=True)  # "tablero", "productos"
+    version = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<VersionDatos {self.clave} v{self.version}>"
+
+# ============================================================================
+# TABLE: Cambios (outbox: registro append-only de cada escritura, para sincronizar)
+# ============================================================================
+
+class Cambio(Base):
+    __tablename__ = "cambios"
+    # AUTOINCREMENT: un seq nunca se reutiliza, aunque se purguen los más viejos
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    seq = Column(Integer, primary_key=True)
+    entidad = Column(String, nullable=False)  # "reserva", "habitacion", "cliente", "consumo", "producto"
+    entidad_id = Column(Integer, nullable=False)
+    accion = Column(String, nullable=False)
+    registrado_en = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<Cambio #{self.seq} {self.entidad} {self.entidad_id} {self.accion}>"
+
 # ============================================================================
 # DATABASE ENGINE
 # ============================================================================
 
-# Crear la base de datos (SQLite local)
-DATABASE_URL = "sqlite:///./puente_hotel.db"
-engine = create_engine(DATABASE_URL, echo=False)
+# Configuración por variables de entorno (valores por defecto: SQLite local)
+#   DATABASE_URL            URL de SQLAlchemy (ej: sqlite:///./puente_hotel.db)
+#   DB_POOL_SIZE            Conexiones persistentes del pool
+#   DB_MAX_OVERFLOW         Conexiones extra permitidas en picos
+#   DB_ECHO                 1 para imprimir el SQL generado
+#   SQLITE_BUSY_TIMEOUT_MS  Espera ante "database is locked" antes de fallar
+#   SQLITE_CACHE_SIZE_KB    Caché de páginas por conexión
+#   SQLITE_MMAP_SIZE        Bytes del archivo mapeados en memoria
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./puente_hotel.db")
+
+def _configurar_sqlite(dbapi_connection, connection_record):
+    """
+    PRAGMAs aplicados a cada conexión SQLite nueva.
+    WAL permite que las lecturas (recepción, calendario) sigan mientras
+    un POS escribe, en lugar de bloquearse por el rollback journal.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}")
+    # Valor negativo = tamaño en KiB (no en páginas)
+    cursor.execute(f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))}")
+    cursor.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+def crear_engine(database_url: str = None):
+    """
+    Crea el engine de SQLAlchemy según la configuración del entorno.
+    
+    - SQLite en archivo: pool de conexiones compartido entre los hilos de FastAPI
+      (check_same_thread desactivado) y PRAGMAs de rendimiento en cada conexión.
+    - SQLite en memoria: una sola conexión (StaticPool) para que todos vean los mismos datos.
+    - Otros motores: pool estándar con verificación de conexión (pool_pre_ping).
+    
+    Args:
+        database_url: URL de la base (por defecto, DATABASE_URL del entorno)
+    
+    Returns:
+        Engine configurado
+    """
+    database_url = database_url or DATABASE_URL
+    echo = os.getenv("DB_ECHO", "0") == "1"
+    url = make_url(database_url)
+    
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            database_url,
+            echo=echo,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_pre_ping=True
+        )
+    
+    if url.database in (None, "", ":memory:"):
+        nuevo_engine = create_engine(
+            database_url,
+            echo=echo,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+    else:
+        nuevo_engine = create_engine(
+            database_url,
+            echo=echo,
+            connect_args={"check_same_thread": False},
+            poolclass=QueuePool,
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20"))
+        )
+    
+    event.listen(nuevo_engine, "connect", _configurar_sqlite)
+    return nuevo_engine
+
+engine = crear_engine()
 
 def init_db():
-    """Crear todas las tablas en la base de datos"""
+    """Crear todas las tablas en la base de datos y aplicar las migraciones pendientes"""
+    from migraciones import aplicar_migraciones
+    
     Base.metadata.create_all(bind=engine)
+    aplicar_migraciones(engine)
 
 if __name__ == "__main__":
+    from registro import configurar_logging
+    
+    configurar_logging()
     init_db()
     print("✓ Base de datos inicializada correctamente")
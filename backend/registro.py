@@ -0,0 +1,65 @@
+"""
+Puente Hotel - Registro (logging)
+Configuración central del logging del backend.
+
+- Cada módulo usa su propio logger: logger = logging.getLogger(__name__)
+- Los mensajes se formatean de forma diferida (logger.debug("... %s", valor)):
+  si el nivel está desactivado, el texto nunca se construye.
+- El handler de los loggers es un QueueHandler: el request solo encola el registro
+  y un hilo aparte (QueueListener) lo escribe en stderr, así un stdout/stderr lento
+  o redirigido a un pipe no bloquea a uvicorn.
+
+Variables de entorno:
+    LOG_LEVEL   Nivel general (por defecto INFO)
+    LOG_LEVELS  Niveles por módulo, ej: "crud=DEBUG,auditoria=WARNING"
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+FORMATO = "%(asctime)s %(levelname)-7s [%(name)s] %(message)s"
+
+_listener: logging.handlers.QueueListener = None
+
+def _niveles_por_modulo(texto: str) -> dict:
+    """Interpreta LOG_LEVELS ("crud=DEBUG,auditoria=WARNING")"""
+    niveles = {}
+    for parte in texto.split(","):
+        if "=" in parte:
+            modulo, nivel = parte.split("=", 1)
+            niveles[modulo.strip()] = nivel.strip().upper()
+    return niveles
+
+def configurar_logging(nivel: str = None, niveles_modulos: dict = None) -> None:
+    """
+    Configura el logging del proceso (idempotente: solo la primera llamada tiene efecto).
+
+    Args:
+        nivel: Nivel general (por defecto LOG_LEVEL o INFO)
+        niveles_modulos: Niveles por logger (por defecto los de LOG_LEVELS)
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    nivel = (nivel or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if niveles_modulos is None:
+        niveles_modulos = _niveles_por_modulo(os.getenv("LOG_LEVELS", ""))
+
+    salida = logging.StreamHandler()
+    salida.setFormatter(logging.Formatter(FORMATO))
+
+    cola = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    raiz = logging.getLogger()
+    raiz.addHandler(logging.handlers.QueueHandler(cola))
+    raiz.setLevel(nivel)
+
+    for modulo, nivel_modulo in niveles_modulos.items():
+        logging.getLogger(modulo).setLevel(nivel_modulo)
@@ -3,9 +3,9 @@ Puente Hotel - Schemas Pydantic
 Define la estructura de datos que se envía/recibe en las solicitudes HTTP
 """
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from datetime import date
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 # ============================================================================
 # HABITACIÓN SCHEMAS
@@ -129,6 +129,9 @@ class ReservaResponse(ReservaBase):
     id: int
     precio_total: float = Field(..., description="Precio total calculado")
     estado: str = Field(..., description="Estado de la reserva")
+    total_consumos: float = Field(0, description="Cargos del folio (consumos con precio positivo)")
+    total_pagos: float = Field(0, description="Pagos registrados en el folio")
+    saldo: float = Field(0, description="Alojamiento + consumos - pagos")
     cliente: Optional[ClienteEmbedded] = None
     habitacion: Optional[HabitacionEmbedded] = None
     consumos: Optional[List[ConsumoEmbedded]] = None
@@ -143,6 +146,9 @@ class ReservaHistorialResponse(BaseModel):
     fecha_salida: date
     precio_total: float
     estado: str
+    total_consumos: float = 0
+    total_pagos: float = 0
+    saldo: float = 0
     cliente_nombre: Optional[str] = None
     cliente_dni: Optional[str] = None
     habitacion_numero: Optional[str] = None
@@ -192,6 +198,30 @@ class ConsumoResponse(BaseModel):
     precio_unitario: float
     fecha_consumo: date
 
+# Línea de un carrito del POS: producto del catálogo o ítem manual
+class ConsumoLoteItem(BaseModel):
+    producto_id: Optional[int] = Field(None, gt=0, description="Producto del catálogo (se cobra su precio)")
+    concepto: Optional[str] = Field(None, max_length=100, description="Ítem manual, si no hay producto_id")
+    cantidad: int = Field(1, description="Cantidad (solo los ítems manuales admiten negativos)")
+    precio: Optional[float] = Field(None, description="Precio unitario del ítem manual (puede ser negativo)")
+    
+    @model_validator(mode="after")
+    def _cantidad_distinta_de_cero(self):
+        # Una línea con cantidad 0 no mueve el folio; los negativos (devoluciones) sí se admiten
+        if self.cantidad == 0:
+            raise ValueError("La cantidad no puede ser 0")
+        return self
+
+class ConsumoLoteCreate(BaseModel):
+    items: List[ConsumoLoteItem] = Field(..., min_length=1, max_length=1000)
+
+class ConsumoLoteResponse(BaseModel):
+    reserva_id: int
+    consumos: List[ConsumoResponse]
+    total_consumos: float
+    total_pagos: float
+    saldo: float
+
 # ============================================================================
 # CUENTA/FACTURA SCHEMAS
 # ============================================================================
@@ -215,18 +245,107 @@ class CuentaResponse(BaseModel):
     total_alojamiento: float
     consumos: List[CuentaConsumoDetalle]
     total_consumos: float
+    total_pagos: float = 0
     total_general: float
 
+class CuentasBatchRequest(BaseModel):
+    reserva_ids: List[int] = Field(..., min_length=1, max_length=200, description="IDs de las reservas")
+
 # ============================================================================
 # SCHEMAS AUXILIARES
 # ============================================================================
 
+class AuditoriaResponse(BaseModel):
+    fecha_negocio: date
+    reservas_finalizadas: int
+
 class DisponibilidadRequest(BaseModel):
     fecha_entrada: date
     fecha_salida: date
     habitacion_id: Optional[int] = None
+    tipo: Optional[str] = Field(None, description="Filtrar por tipo: SIMPLE, DOBLE, TRIPLE, SUITE")
+    precio_max: Optional[float] = Field(None, gt=0, description="Precio base máximo por noche")
 
 class DisponibilidadResponse(BaseModel):
     disponible: bool
     mensaje: str
-    habitaciones_libres: Optional[list] = None
+    habitaciones_libres: Optional[List[HabitacionResponse]] = None
+
+class HabitacionCalendario(BaseModel):
+    """Fila de la matriz de calendario: un estado y un ID de reserva por día"""
+    id: int
+    numero: str
+    tipo: str
+    estados: List[str]
+    reservas: List[Optional[int]]
+
+class CalendarioRangoResponse(BaseModel):
+    desde: date
+    hasta: date
+    fechas: List[date]
+    habitaciones: List[HabitacionCalendario]
+
+class InventarioTipo(BaseModel):
+    """Noches de un tipo de habitación en una fecha (libres negativo = sobreventa)"""
+    tipo: str
+    habitaciones: int
+    vendidas: int
+    bloqueadas: int
+    libres: int
+
+class InventarioDia(BaseModel):
+    fecha: date
+    tipos: List[InventarioTipo]
+
+class InventarioResponse(BaseModel):
+    desde: date
+    hasta: date
+    dias: List[InventarioDia]
+
+class KpisHabitaciones(BaseModel):
+    total: int
+    por_estado: Dict[str, int]  # DISPONIBLE, OCUPADA, LIMPIEZA, RESERVADA, MANTENIMIENTO
+
+class KpisMovimientos(BaseModel):
+    """Movimientos del día de negocio"""
+    llegadas: int  # Reservas que entran hoy (PENDIENTE o ya con check-in)
+    llegadas_pendientes: int  # De esas, las que todavía no hicieron check-in
+    salidas: int  # Reservas que salen hoy (en casa o ya finalizadas)
+    salidas_pendientes: int  # De esas, las que siguen en CHECKIN
+    en_casa: int  # Reservas en CHECKIN
+
+class KpisPeriodo(BaseModel):
+    """Indicadores de un rango de noches (ambos extremos inclusive)"""
+    desde: date
+    hasta: date
+    habitaciones_noche: int  # Noches disponibles (habitaciones × días)
+    noches_vendidas: int  # Reservas CHECKIN/CHECKOUT/FINALIZADA (igual que el inventario diario)
+    noches_bloqueadas: int  # Reservas PENDIENTE (sin check-in)
+    ingresos_alojamiento: float  # De las noches vendidas
+    ocupacion: float  # Porcentaje de noches vendidas
+    adr: float  # Ingreso promedio por noche vendida
+    revpar: float  # Ingreso por noche disponible
+
+class KpisResponse(BaseModel):
+    fecha: date
+    habitaciones: KpisHabitaciones
+    movimientos: KpisMovimientos
+    hoy: KpisPeriodo
+    rango: Optional[KpisPeriodo] = None
+
+class EntidadEliminada(BaseModel):
+    """Fila borrada desde la última sincronización"""
+    entidad: str
+    id: int
+
+class CambiosResponse(BaseModel):
+    """Cambios posteriores a un seq del outbox (GET /cambios)"""
+    desde: Optional[int] = None
+    hasta: int
+    hay_mas: bool
+    habitaciones: List[HabitacionResponse]
+    clientes: List[ClienteResponse]
+    reservas: List[ReservaResponse]
+    consumos: List[ConsumoResponse]
+    productos: List[ProductoResponse]
+    eliminados: List[EntidadEliminada]
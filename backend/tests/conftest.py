@@ -0,0 +1,101 @@
+"""
+Puente Hotel - Fixtures de los tests de la API
+Cada corrida usa una base SQLite temporal: DATABASE_URL se define antes de
+importar main (models crea el engine al importarse).
+
+Los tests comparten la base y crean sus propios datos con números de habitación
+y DNIs únicos, así no dependen del orden en que corren.
+
+    cd backend
+    python -m pytest
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+_DIRECTORIO_TEMPORAL = tempfile.TemporaryDirectory(prefix="puente_hotel_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO_TEMPORAL.name, 'tests.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+_secuencia = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient con el ciclo de vida de la app (índice de disponibilidad y auditoría)"""
+    with TestClient(main.app) as cliente_http:
+        yield cliente_http
+
+@pytest.fixture
+def db():
+    """Sesión directa a la base de los tests"""
+    sesion = main.SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+@pytest.fixture
+def crear_habitacion(client):
+    """Crea una habitación con número único; devuelve el JSON de la respuesta"""
+    def _crear(tipo: str = "DOBLE", precio_base: float = 100.0, **extra) -> dict:
+        datos = {"numero": f"T{next(_secuencia)}", "tipo": tipo, "precio_base": precio_base, **extra}
+        respuesta = client.post("/habitaciones", json=datos)
+        assert respuesta.status_code == 200, respuesta.text
+        return respuesta.json()
+    return _crear
+
+@pytest.fixture
+def crear_cliente(client):
+    """Crea un cliente con DNI único; devuelve el JSON de la respuesta"""
+    def _crear(nombre_completo: str = "Cliente de Prueba", **extra) -> dict:
+        numero = next(_secuencia)
+        datos = {
+            "dni": f"{30000000 + numero}",
+            "nombre_completo": nombre_completo,
+            "email": f"cliente{numero}@example.com",
+            "telefono": "1100000000",
+            **extra
+        }
+        respuesta = client.post("/clientes", json=datos)
+        assert respuesta.status_code == 200, respuesta.text
+        return respuesta.json()
+    return _crear
+
+@pytest.fixture
+def crear_reserva(client, crear_habitacion, crear_cliente):
+    """
+    Crea una reserva (por defecto en una habitación y un cliente nuevos);
+    devuelve el JSON de la respuesta
+    """
+    def _crear(entrada: date = None, noches: int = 2, habitacion_id: int = None,
+               cliente_id: int = None, **extra) -> dict:
+        entrada = entrada or date.today()
+        datos = {
+            "habitacion_id": habitacion_id or crear_habitacion()["id"],
+            "cliente_id": cliente_id or crear_cliente()["id"],
+            "fecha_entrada": entrada.isoformat(),
+            "fecha_salida": (entrada + timedelta(days=noches)).isoformat(),
+            **extra
+        }
+        respuesta = client.post("/reservas", json=datos)
+        assert respuesta.status_code == 200, respuesta.text
+        return respuesta.json()
+    return _crear
+
+@pytest.fixture
+def crear_producto(client):
+    """Crea un producto con nombre único; devuelve el JSON de la respuesta"""
+    def _crear(nombre: str = "Producto", precio: float = 50.0) -> dict:
+        respuesta = client.post("/productos", json={"nombre": f"{nombre} {next(_secuencia)}", "precio": precio})
+        assert respuesta.status_code == 200, respuesta.text
+        return respuesta.json()
+    return _crear
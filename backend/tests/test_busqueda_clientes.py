@@ -0,0 +1,57 @@
+"""
+Migraciones versionadas y búsqueda de clientes (índice FTS5 trigram con respaldo LIKE)
+"""
+
+from sqlalchemy import create_engine, event, text
+
+import crud
+import migraciones
+from models import engine
+
+def _buscar(client, texto: str) -> list:
+    respuesta = client.get("/clientes/buscar", params={"q": texto})
+    assert respuesta.status_code == 200
+    return [fila["id"] for fila in respuesta.json()]
+
+def test_migraciones_aplicadas(client):
+    assert migraciones.version_actual(engine) == migraciones.MIGRACIONES[-1][0]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'")).first()
+
+def test_busqueda_por_fragmento(client, crear_cliente):
+    cliente = crear_cliente("Eulalia Xilografa")
+
+    assert _buscar(client, "xilog") == [cliente["id"]]
+    assert cliente["id"] in _buscar(client, cliente["dni"][-4:])
+    assert _buscar(client, "eulalia xilo") == [cliente["id"]]
+
+def test_indice_sigue_a_las_modificaciones(client, crear_cliente):
+    cliente = crear_cliente("Bartolo Quimerino")
+
+    client.put(f"/clientes/{cliente['id']}", json={**cliente, "nombre_completo": "Bartolo Zanfoneta"})
+    assert _buscar(client, "quimer") == []
+    assert _buscar(client, "zanfon") == [cliente["id"]]
+
+    client.delete(f"/clientes/{cliente['id']}")
+    assert _buscar(client, "zanfon") == []
+
+def test_respaldo_like_sin_indice(client, crear_cliente, monkeypatch):
+    cliente = crear_cliente("Hermenegilda Trapisonda")
+    monkeypatch.setattr(crud, "_hay_indice_clientes", lambda db: False)
+
+    assert _buscar(client, "trapis") == [cliente["id"]]
+
+def test_migracion_sin_fts5_no_falla(tmp_path):
+    engine_sin_fts = create_engine(f"sqlite:///{tmp_path / 'sin_fts.db'}")
+
+    @event.listens_for(engine_sin_fts, "before_cursor_execute", retval=True)
+    def _sin_trigram(conn, cursor, sentencia, parametros, contexto, executemany):
+        # Simula un SQLite compilado sin el tokenizador trigram
+        return sentencia.replace("tokenize='trigram'", "tokenize='inexistente'"), parametros
+
+    with engine_sin_fts.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE clientes (id INTEGER PRIMARY KEY, nombre_completo TEXT, "
+                             "dni TEXT, email TEXT, telefono TEXT)")
+        migraciones._crear_indice_busqueda_clientes(conn)
+        assert conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'clientes_fts'")).first() is None
+    engine_sin_fts.dispose()
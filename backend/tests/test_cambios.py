@@ -0,0 +1,80 @@
+"""
+Outbox de cambios y GET /cambios (sincronización incremental)
+"""
+
+from datetime import datetime
+
+import crud
+
+def _posicion(client) -> int:
+    return client.get("/cambios").json()["hasta"]
+
+def _ids(cambios: dict, clave: str) -> set:
+    return {fila["id"] for fila in cambios[clave]}
+
+def test_alta_de_reserva(client, crear_reserva):
+    desde = _posicion(client)
+
+    reserva = crear_reserva()
+    cambios = client.get("/cambios", params={"desde": desde}).json()
+
+    assert cambios["hasta"] > desde
+    assert reserva["id"] in _ids(cambios, "reservas")
+    assert reserva["habitacion_id"] in _ids(cambios, "habitaciones")
+    assert reserva["cliente_id"] in _ids(cambios, "clientes")
+
+def test_sin_cambios_nuevos(client):
+    desde = _posicion(client)
+
+    cambios = client.get("/cambios", params={"desde": desde}).json()
+
+    assert cambios["hasta"] == desde
+    assert not cambios["hay_mas"]
+    assert cambios["reservas"] == [] and cambios["eliminados"] == []
+
+def test_eliminar_reserva_informa_sus_consumos(client, crear_reserva):
+    reserva = crear_reserva()
+    consumo = client.post(f"/reservas/{reserva['id']}/consumos/manual",
+                          json={"concepto": "Minibar", "cantidad": 1, "precio": 15}).json()
+    desde = _posicion(client)
+
+    client.delete(f"/reservas/{reserva['id']}")
+    eliminados = client.get("/cambios", params={"desde": desde}).json()["eliminados"]
+
+    assert {"entidad": "reserva", "id": reserva["id"]} in eliminados
+    assert {"entidad": "consumo", "id": consumo["id"]} in eliminados
+
+def test_checkin_con_datos_del_cliente(client, crear_reserva):
+    reserva = crear_reserva()
+    desde = _posicion(client)
+
+    client.post(f"/checkin/{reserva['id']}", json={"nombre_completo": "Nombre Corregido"})
+    cambios = client.get("/cambios", params={"desde": desde}).json()
+
+    clientes = {fila["id"]: fila for fila in cambios["clientes"]}
+    assert clientes[reserva["cliente_id"]]["nombre_completo"] == "Nombre Corregido"
+    assert [r["estado"] for r in cambios["reservas"] if r["id"] == reserva["id"]] == ["CHECKIN"]
+
+def test_paginas_con_hay_mas(client, crear_reserva):
+    desde = _posicion(client)
+    crear_reserva()
+
+    primera = client.get("/cambios", params={"desde": desde, "limite": 1}).json()
+    resto = client.get("/cambios", params={"desde": primera["hasta"]}).json()
+
+    assert primera["hay_mas"]
+    assert primera["hasta"] == desde + 1
+    assert not resto["hay_mas"]
+    assert resto["hasta"] == _posicion(client)
+
+def test_cambios_purgados_responden_410(client, db, crear_reserva):
+    desde = _posicion(client)
+    crear_reserva()
+    crear_reserva()
+
+    crud.purgar_cambios(db, datetime(2100, 1, 1))
+    db.commit()
+
+    assert client.get("/cambios", params={"desde": desde}).status_code == 410
+    # La última entrada se conserva: un cliente al día puede seguir sincronizando
+    assert client.get("/cambios", params={"desde": _posicion(client)}).status_code == 200
@@ -0,0 +1,74 @@
+"""
+Totales del folio guardados en cada reserva (total_consumos, total_pagos, saldo)
+"""
+
+import pytest
+
+def _folio(client, reserva_id: int) -> dict:
+    return client.get(f"/reservas/{reserva_id}").json()
+
+@pytest.fixture
+def producto(crear_producto):
+    return crear_producto("Cerveza", 50)
+
+def test_cargos_y_pagos(client, crear_habitacion, crear_reserva, producto):
+    habitacion = crear_habitacion(precio_base=100)
+    reserva = crear_reserva(noches=2, habitacion_id=habitacion["id"])
+
+    client.post(f"/reservas/{reserva['id']}/consumos", json={"producto_id": producto["id"], "cantidad": 2})
+    client.post(f"/reservas/{reserva['id']}/consumos/manual", json={"concepto": "Seña", "cantidad": 1, "precio": -80})
+
+    folio = _folio(client, reserva["id"])
+    assert folio["total_consumos"] == 100
+    assert folio["total_pagos"] == 80
+    assert folio["saldo"] == 200 + 100 - 80
+
+    cuenta = client.get(f"/reservas/{reserva['id']}/cuenta").json()
+    assert cuenta["total_pagos"] == 80
+    assert cuenta["total_general"] == folio["saldo"]
+
+def test_lote_del_pos(client, crear_reserva, producto):
+    reserva = crear_reserva(noches=1)
+
+    respuesta = client.post(f"/reservas/{reserva['id']}/consumos/lote", json={"items": [
+        {"producto_id": producto["id"], "cantidad": 3},
+        {"concepto": "Descuento", "cantidad": -1, "precio": 20},
+        {"concepto": "Pago efectivo", "cantidad": 1, "precio": -100}
+    ]})
+
+    assert respuesta.status_code == 200
+    lote = respuesta.json()
+    assert (lote["total_consumos"], lote["total_pagos"]) == (130, 100)
+    assert lote["saldo"] == _folio(client, reserva["id"])["saldo"] == reserva["precio_total"] + 130 - 100
+
+def test_lote_rechaza_cantidad_cero(client, crear_reserva):
+    reserva = crear_reserva(noches=1)
+
+    respuesta = client.post(f"/reservas/{reserva['id']}/consumos/lote", json={"items": [
+        {"concepto": "Nada", "cantidad": 0, "precio": 10}
+    ]})
+
+    assert respuesta.status_code == 422
+    assert _folio(client, reserva["id"])["total_consumos"] == 0
+
+def test_modificar_y_eliminar_consumos(client, crear_reserva, producto):
+    reserva = crear_reserva(noches=1)
+    consumo = client.post(f"/reservas/{reserva['id']}/consumos",
+                          json={"producto_id": producto["id"], "cantidad": 1}).json()
+
+    client.put(f"/consumos/{consumo['id']}", json={"cantidad": 4})
+    assert _folio(client, reserva["id"])["total_consumos"] == 200
+
+    client.delete(f"/consumos/{consumo['id']}")
+    folio = _folio(client, reserva["id"])
+    assert folio["total_consumos"] == 0
+    assert folio["saldo"] == reserva["precio_total"]
+
+def test_reconciliar_no_corrige_folios_al_dia(client, crear_reserva, producto):
+    reserva = crear_reserva(noches=1)
+    client.post(f"/reservas/{reserva['id']}/consumos", json={"producto_id": producto["id"], "cantidad": 2})
+
+    respuesta = client.post("/admin/reconciliar-folios")
+
+    assert respuesta.status_code == 200
+    assert reserva["id"] not in respuesta.json()["ids"]
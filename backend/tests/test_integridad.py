@@ -0,0 +1,63 @@
+"""
+Engine SQLite (WAL, claves foráneas) y bajas que respetan las claves foráneas
+"""
+
+from sqlalchemy import text
+
+from models import engine
+
+def test_pragmas_de_cada_conexion():
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+
+def test_eliminar_producto_sin_consumos(client):
+    producto = client.post("/productos", json={"nombre": "Agua sin uso", "precio": 20}).json()
+
+    respuesta = client.delete(f"/productos/{producto['id']}")
+
+    assert respuesta.status_code == 200
+    assert client.get(f"/productos/{producto['id']}").status_code == 404
+
+def test_eliminar_producto_con_consumos_lo_desactiva(client, crear_reserva):
+    reserva = crear_reserva()
+    producto = client.post("/productos", json={"nombre": "Gaseosa", "precio": 30}).json()
+    client.post(f"/reservas/{reserva['id']}/consumos", json={"producto_id": producto["id"], "cantidad": 2})
+
+    respuesta = client.delete(f"/productos/{producto['id']}")
+
+    assert respuesta.status_code == 200
+    assert "desactivó" in respuesta.json()["mensaje"]
+    assert client.get(f"/productos/{producto['id']}").json()["activo"] is False
+    cuenta = client.get(f"/reservas/{reserva['id']}/cuenta").json()
+    assert [c["producto_nombre"] for c in cuenta["consumos"]] == ["Gaseosa"]
+
+def test_eliminar_cliente_con_reservas_canceladas(client, crear_cliente, crear_reserva):
+    cliente = crear_cliente()
+    reserva = crear_reserva(cliente_id=cliente["id"])
+    assert client.put(f"/reservas/{reserva['id']}/cancelar").status_code == 200
+
+    respuesta = client.delete(f"/clientes/{cliente['id']}")
+
+    assert respuesta.status_code == 200
+    assert client.get(f"/clientes/{cliente['id']}").status_code == 404
+    assert client.get(f"/reservas/{reserva['id']}").status_code == 404
+
+def test_eliminar_cliente_con_reserva_activa(client, crear_cliente, crear_reserva):
+    cliente = crear_cliente()
+    crear_reserva(cliente_id=cliente["id"])
+
+    respuesta = client.delete(f"/clientes/{cliente['id']}")
+
+    assert respuesta.status_code == 400
+    assert client.get(f"/clientes/{cliente['id']}").status_code == 200
+
+def test_violacion_de_restriccion_responde_409(client, crear_habitacion):
+    habitacion = crear_habitacion()
+
+    respuesta = client.post("/habitaciones", json={
+        "numero": habitacion["numero"], "tipo": "SIMPLE", "precio_base": 50
+    })
+
+    assert respuesta.status_code == 409
@@ -0,0 +1,60 @@
+"""
+GET /kpis: habitaciones por estado, ocupación, ADR y RevPAR calculados en el servidor
+"""
+
+from collections import Counter
+from datetime import date, timedelta
+
+# Rango lejano: ningún otro test reserva en estas fechas
+DESDE = date.today() + timedelta(days=400)
+HASTA = DESDE + timedelta(days=9)
+
+def _kpis(client, **params) -> dict:
+    respuesta = client.get("/kpis", params={k: v.isoformat() for k, v in params.items()})
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+def test_estados_iguales_al_tablero(client, crear_reserva):
+    alojada = crear_reserva()
+    client.post(f"/checkin/{alojada['id']}")
+    crear_reserva()
+
+    tablero = Counter(h["estado"] for h in client.get("/habitaciones").json())
+    habitaciones = _kpis(client)["habitaciones"]
+
+    assert habitaciones["total"] == sum(tablero.values())
+    assert {estado: n for estado, n in habitaciones["por_estado"].items() if n} == dict(tablero)
+
+def test_ocupacion_adr_y_revpar_del_rango(client, crear_habitacion, crear_reserva):
+    habitacion = crear_habitacion(precio_base=100)
+    otra = crear_habitacion(precio_base=100)
+    # Vendidas: 4 noches dentro del rango y 2 de una estadía de 4 que termina después
+    for entrada, noches, habitacion_id in ((DESDE, 4, habitacion["id"]), (HASTA - timedelta(days=1), 4, otra["id"])):
+        reserva = crear_reserva(entrada=entrada, noches=noches, habitacion_id=habitacion_id)
+        assert client.post(f"/checkin/{reserva['id']}").status_code == 200
+    # Bloqueadas: una PENDIENTE de 3 noches; la cancelada no cuenta
+    crear_reserva(entrada=DESDE + timedelta(days=5), noches=3, habitacion_id=habitacion["id"])
+    cancelada = crear_reserva(entrada=DESDE + timedelta(days=1), noches=2, habitacion_id=otra["id"])
+    client.put(f"/reservas/{cancelada['id']}/cancelar")
+
+    kpis = _kpis(client, desde=DESDE, hasta=HASTA)
+    rango = kpis["rango"]
+    habitaciones_noche = kpis["habitaciones"]["total"] * 10
+
+    assert rango["habitaciones_noche"] == habitaciones_noche
+    assert (rango["noches_vendidas"], rango["noches_bloqueadas"]) == (6, 3)
+    assert rango["ingresos_alojamiento"] == 400 + 200
+    assert rango["adr"] == 100
+    assert rango["ocupacion"] == round(100 * 6 / habitaciones_noche, 1)
+    assert rango["revpar"] == round(600 / habitaciones_noche, 2)
+
+def test_rango_invalido(client):
+    assert client.get("/kpis", params={"hasta": HASTA.isoformat()}).status_code == 400
+    assert client.get("/kpis", params={"desde": HASTA.isoformat(), "hasta": DESDE.isoformat()}).status_code == 400
+
+def test_etag_responde_304(client):
+    primera = client.get("/kpis")
+
+    segunda = client.get("/kpis", headers={"If-None-Match": primera.headers["etag"]})
+
+    assert segunda.status_code == 304
@@ -0,0 +1,77 @@
+"""
+Alta de reservas atómica: disponibilidad y alta en una sola sentencia
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import crud
+import main
+import schemas
+
+ENTRADA = date.today() + timedelta(days=30)
+
+def _datos(habitacion_id: int, cliente_id: int, entrada: date, noches: int) -> dict:
+    return {
+        "habitacion_id": habitacion_id,
+        "cliente_id": cliente_id,
+        "fecha_entrada": entrada.isoformat(),
+        "fecha_salida": (entrada + timedelta(days=noches)).isoformat()
+    }
+
+def test_precio_total_desde_el_precio_base(crear_habitacion, crear_reserva):
+    habitacion = crear_habitacion(precio_base=80)
+
+    reserva = crear_reserva(entrada=ENTRADA, noches=3, habitacion_id=habitacion["id"])
+
+    assert reserva["precio_total"] == 240
+    assert reserva["estado"] == "PENDIENTE"
+
+def test_solapamiento_responde_409(client, crear_habitacion, crear_cliente, crear_reserva):
+    habitacion = crear_habitacion()
+    crear_reserva(entrada=ENTRADA, noches=3, habitacion_id=habitacion["id"])
+
+    respuesta = client.post("/reservas", json=_datos(habitacion["id"], crear_cliente()["id"], ENTRADA + timedelta(days=2), 2))
+
+    assert respuesta.status_code == 409
+
+def test_reservas_contiguas_no_se_solapan(client, crear_habitacion, crear_cliente, crear_reserva):
+    habitacion = crear_habitacion()
+    crear_reserva(entrada=ENTRADA, noches=3, habitacion_id=habitacion["id"])
+
+    respuesta = client.post("/reservas", json=_datos(habitacion["id"], crear_cliente()["id"], ENTRADA + timedelta(days=3), 2))
+
+    assert respuesta.status_code == 200
+
+def test_reserva_cancelada_libera_las_fechas(client, crear_habitacion, crear_cliente, crear_reserva):
+    habitacion = crear_habitacion()
+    reserva = crear_reserva(entrada=ENTRADA, noches=3, habitacion_id=habitacion["id"])
+    client.put(f"/reservas/{reserva['id']}/cancelar")
+
+    respuesta = client.post("/reservas", json=_datos(habitacion["id"], crear_cliente()["id"], ENTRADA, 3))
+
+    assert respuesta.status_code == 200
+
+def test_cliente_o_habitacion_inexistentes_responden_404(client, crear_habitacion, crear_cliente):
+    habitacion = crear_habitacion()
+    cliente = crear_cliente()
+
+    assert client.post("/reservas", json=_datos(habitacion["id"], 999999, ENTRADA, 1)).status_code == 404
+    assert client.post("/reservas", json=_datos(999999, cliente["id"], ENTRADA, 1)).status_code == 404
+
+def test_reservas_simultaneas_en_la_misma_habitacion(crear_habitacion, crear_cliente):
+    habitacion = crear_habitacion()
+    clientes = [crear_cliente()["id"] for _ in range(8)]
+
+    def reservar(cliente_id: int):
+        db = main.SessionLocal()
+        try:
+            reserva = crud.create_reserva(db, schemas.ReservaCreate(**_datos(habitacion["id"], cliente_id, ENTRADA, 2)))
+            return reserva is not None
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=len(clientes)) as pool:
+        creadas = list(pool.map(reservar, clientes))
+
+    assert creadas.count(True) == 1
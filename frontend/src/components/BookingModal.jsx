@@ -51,7 +51,10 @@ function BookingModal({ isOpen, onClose, room, onSuccess }) {
   const loadReservasHabitacion = async () => {
     if (!room?.id) return;
     try {
-      const response = await api.get(`/reservas?habitacion_id=${room.id}`);
+      // Las de entrada más reciente primero: alcanzan para marcar las fechas ocupadas desde hoy
+      const response = await api.get('/reservas', {
+        params: { habitacion_id: room.id, orden: '-fecha_entrada', limit: 500 }
+      });
       console.log('BookingModal - Reservas de habitación:', response.data);
       const reservas = Array.isArray(response.data) ? response.data : [];
       console.log('BookingModal - Reservas filtradas (estados):', reservas.map(r => ({ id: r.id, estado: r.estado, entrada: r.fecha_entrada, salida: r.fecha_salida })));
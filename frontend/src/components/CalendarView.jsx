@@ -199,37 +199,14 @@ function CalendarView() {
       return;
     }
 
-    // Buscar o crear producto de pago
+    // Concepto del pago (el backend busca o crea el producto)
     const concepto = pagoForm.tipo === 'seña' ? 'Seña/Adelanto' : 'Pago Completo';
     
     try {
-      // Primero verificamos si existe el producto de pago
-      let productoId = null;
-      const productosResponse = await api.get('/productos');
-      const productoExistente = productosResponse.data.find(p => p.nombre === concepto);
-      
-      if (productoExistente) {
-        productoId = productoExistente.id;
-        // Actualizar el precio del producto existente para que coincida con el monto negativo
-        await api.put(`/productos/${productoId}`, {
-          nombre: concepto,
-          precio: -monto,
-          activo: true
-        });
-      } else {
-        // Crear el producto de pago con precio negativo
-        const nuevoProducto = await api.post('/productos', {
-          nombre: concepto,
-          precio: -monto,
-          activo: true
-        });
-        productoId = nuevoProducto.data.id;
-      }
-
-      // Registrar el consumo (con el precio negativo del producto)
-      await api.post(`/reservas/${selectedRoomForPago.reserva_actual_id}/consumos`, {
-        producto_id: productoId,
-        cantidad: 1
+      // Registrar el pago como ítem con precio negativo, en una sola transacción
+      // (el backend reutiliza o crea el producto con ese nombre)
+      await api.post(`/reservas/${selectedRoomForPago.reserva_actual_id}/consumos/lote`, {
+        items: [{ concepto, cantidad: 1, precio: -monto }]
       });
 
       alert(`✅ ${concepto} de $${monto.toFixed(2)} registrado correctamente`);
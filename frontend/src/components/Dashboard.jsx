@@ -7,38 +7,39 @@ import api from '../api.js';
  * Tablero simplificado con resumen y métricas rápidas
  */
 function Dashboard({ setActiveSection }) {
-  const [habitaciones, setHabitaciones] = useState([]);
+  const [kpis, setKpis] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  // Cargar habitaciones al montar
+  // Cargar indicadores al montar
   useEffect(() => {
-    loadHabitaciones();
+    loadKpis();
   }, []);
 
-  const loadHabitaciones = async () => {
+  const loadKpis = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/habitaciones');
-      console.log('Dashboard - Respuesta de API:', response.data);
-      // Asegurarse de que response.data es un array
-      const data = Array.isArray(response.data) ? response.data : [];
-      setHabitaciones(data);
+      // El servidor calcula los conteos y la ocupación (sin descargar el tablero completo)
+      const response = await api.get('/kpis');
+      setKpis(response.data);
     } catch (err) {
-      setError('Error al cargar las habitaciones');
+      setError('Error al cargar los indicadores');
       console.error('Dashboard - Error:', err);
-      setHabitaciones([]); // Array vacío en caso de error
+      setKpis(null);
     } finally {
       setLoading(false);
     }
   };
 
-  // Calcular métricas
-  const disponibles = habitaciones.filter(h => h.estado === 'DISPONIBLE').length;
-  const ocupadas = habitaciones.filter(h => h.estado === 'OCUPADA').length;
-  const mantenimiento = habitaciones.filter(h => h.estado === 'MANTENIMIENTO' || h.estado === 'LIMPIEZA').length;
-  const ocupancyRate = habitaciones.length > 0 ? ((ocupadas / habitaciones.length) * 100).toFixed(1) : 0;
+  // Métricas (ya calculadas por GET /kpis)
+  const porEstado = kpis?.habitaciones.por_estado || {};
+  const totalHabitaciones = kpis?.habitaciones.total || 0;
+  const disponibles = porEstado.DISPONIBLE || 0;
+  const ocupadas = porEstado.OCUPADA || 0;
+  const ocupancyRate = kpis ? kpis.hoy.ocupacion.toFixed(1) : 0;
+  const movimientos = kpis?.movimientos || { llegadas: 0, llegadas_pendientes: 0, salidas: 0, salidas_pendientes: 0, en_casa: 0 };
+  const formatoMoneda = (valor) => `$${(valor || 0).toFixed(2)}`;
 
   return (
     <div className="max-w-7xl">
@@ -54,7 +55,7 @@ function Dashboard({ setActiveSection }) {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-gray-600 text-sm font-medium">Total Habitaciones</p>
-              <p className="text-3xl font-bold text-gray-900 mt-2">{habitaciones.length}</p>
+              <p className="text-3xl font-bold text-gray-900 mt-2">{totalHabitaciones}</p>
             </div>
             <div className="bg-blue-100 rounded-lg p-3">
               <TrendingUp className="text-blue-600" size={24} />
@@ -102,6 +103,28 @@ function Dashboard({ setActiveSection }) {
         </div>
       </div>
 
+      {/* Movimientos del día e ingresos */}
+      <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-4 mb-8">
+        <div className="bg-white rounded-lg shadow p-6 border-l-4 border-teal-500">
+          <p className="text-gray-600 text-sm font-medium">Llegadas hoy</p>
+          <p className="text-3xl font-bold text-teal-600 mt-2">{movimientos.llegadas}</p>
+          <p className="text-sm text-gray-500 mt-1">{movimientos.llegadas_pendientes} sin check-in</p>
+        </div>
+        <div className="bg-white rounded-lg shadow p-6 border-l-4 border-orange-500">
+          <p className="text-gray-600 text-sm font-medium">Salidas hoy</p>
+          <p className="text-3xl font-bold text-orange-600 mt-2">{movimientos.salidas}</p>
+          <p className="text-sm text-gray-500 mt-1">{movimientos.salidas_pendientes} sin checkout · {movimientos.en_casa} en casa</p>
+        </div>
+        <div className="bg-white rounded-lg shadow p-6 border-l-4 border-indigo-500">
+          <p className="text-gray-600 text-sm font-medium">ADR (tarifa promedio)</p>
+          <p className="text-3xl font-bold text-indigo-600 mt-2">{formatoMoneda(kpis?.hoy.adr)}</p>
+        </div>
+        <div className="bg-white rounded-lg shadow p-6 border-l-4 border-pink-500">
+          <p className="text-gray-600 text-sm font-medium">RevPAR</p>
+          <p className="text-3xl font-bold text-pink-600 mt-2">{formatoMoneda(kpis?.hoy.revpar)}</p>
+        </div>
+      </div>
+
       {/* Sección de Acciones Rápidas */}
       <div className="bg-white rounded-lg shadow p-6">
         <h2 className="text-xl font-bold text-gray-900 mb-4">Acciones Rápidas</h2>
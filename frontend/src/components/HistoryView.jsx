@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Search, FileText, X, Printer, Trash2, Plus, Package } from 'lucide-react';
 import api from '../api.js';
 
@@ -11,21 +11,47 @@ function HistoryView() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [estadoFiltro, setEstadoFiltro] = useState('');
+  const [fechaDesde, setFechaDesde] = useState('');
+  const [fechaHasta, setFechaHasta] = useState('');
+  const [hayMas, setHayMas] = useState(false);
+  const [loadingMas, setLoadingMas] = useState(false);
+  const primeraCarga = useRef(true);
   const [selectedReserva, setSelectedReserva] = useState(null);
   const [invoiceData, setInvoiceData] = useState(null);
   const [isInvoiceModalOpen, setIsInvoiceModalOpen] = useState(false);
   const [newItemForm, setNewItemForm] = useState({ concepto: '', cantidad: 1, precio: '' });
 
+  // Reservas por página (el servidor filtra, ordena y pagina)
+  const PAGE_SIZE = 100;
+
+  // Recargar al cambiar los filtros (la búsqueda espera a que se deje de tipear)
   useEffect(() => {
-    loadHistorial();
-  }, []);
+    const demora = primeraCarga.current ? 0 : 300;
+    primeraCarga.current = false;
+    const timer = setTimeout(() => loadHistorial(), demora);
+    return () => clearTimeout(timer);
+  }, [searchTerm, estadoFiltro, fechaDesde, fechaHasta]);
+
+  const buildParams = (afterId) => {
+    const params = { limit: PAGE_SIZE };
+    if (searchTerm.trim()) params.q = searchTerm.trim();
+    if (estadoFiltro) params.estado = estadoFiltro;
+    if (fechaDesde) params.desde = fechaDesde;
+    if (fechaHasta) params.hasta = fechaHasta;
+    if (afterId) params.after_id = afterId;
+    return params;
+  };
 
   const loadHistorial = async () => {
     try {
-      setLoading(true);
-      const response = await api.get('/reservas/historial');
-      console.log('Historial cargado:', response.data?.length, 'reservas');
-      setReservas(response.data || []);
+      // El spinner de pantalla completa es solo para la primera carga
+      // (así el buscador no pierde el foco al filtrar)
+      setError(null);
+      const response = await api.get('/reservas/historial', { params: buildParams() });
+      const pagina = response.data || [];
+      setReservas(pagina);
+      setHayMas(pagina.length === PAGE_SIZE);
     } catch (err) {
       console.error('Error al cargar historial:', err);
       setError('Error al cargar el historial');
@@ -34,6 +60,23 @@ function HistoryView() {
     }
   };
 
+  const loadMas = async () => {
+    if (reservas.length === 0) return;
+    try {
+      setLoadingMas(true);
+      const ultimoId = reservas[reservas.length - 1].id;
+      const response = await api.get('/reservas/historial', { params: buildParams(ultimoId) });
+      const pagina = response.data || [];
+      setReservas(prev => [...prev, ...pagina]);
+      setHayMas(pagina.length === PAGE_SIZE);
+    } catch (err) {
+      console.error('Error al cargar más historial:', err);
+      alert('Error al cargar más reservas');
+    } finally {
+      setLoadingMas(false);
+    }
+  };
+
   const handleViewInvoice = async (reserva) => {
     try {
       // Cargar cuenta completa
@@ -97,12 +140,6 @@ function HistoryView() {
     window.print();
   };
 
-  const filteredReservas = reservas.filter(r => 
-    r.cliente_nombre?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    r.cliente_dni?.includes(searchTerm) ||
-    r.habitacion_numero?.includes(searchTerm)
-  );
-
   const getEstadoBadge = (estado) => {
     switch(estado) {
       case 'FINALIZADA':
@@ -168,9 +205,9 @@ function HistoryView() {
         <p className="text-gray-500">Reservas finalizadas y canceladas</p>
       </div>
 
-      {/* Buscador */}
-      <div className="mb-6">
-        <div className="relative max-w-md">
+      {/* Buscador y filtros */}
+      <div className="mb-6 flex flex-wrap items-center gap-3">
+        <div className="relative flex-1 max-w-md">
           <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 text-gray-400" size={20} />
           <input
             type="text"
@@ -180,6 +217,29 @@ function HistoryView() {
             className="w-full pl-10 pr-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
           />
         </div>
+        <select
+          value={estadoFiltro}
+          onChange={(e) => setEstadoFiltro(e.target.value)}
+          className="px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
+        >
+          <option value="">Todos los estados</option>
+          <option value="FINALIZADA">Finalizadas</option>
+          <option value="CANCELADA">Canceladas</option>
+        </select>
+        <input
+          type="date"
+          value={fechaDesde}
+          onChange={(e) => setFechaDesde(e.target.value)}
+          title="Desde"
+          className="px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
+        />
+        <input
+          type="date"
+          value={fechaHasta}
+          onChange={(e) => setFechaHasta(e.target.value)}
+          title="Hasta"
+          className="px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
+        />
       </div>
 
       {/* Tabla */}
@@ -198,14 +258,14 @@ function HistoryView() {
             </tr>
           </thead>
           <tbody className="bg-white divide-y divide-gray-200">
-            {filteredReservas.length === 0 ? (
+            {reservas.length === 0 ? (
               <tr>
                 <td colSpan="8" className="px-6 py-12 text-center text-gray-500">
                   No hay reservas en el historial
                 </td>
               </tr>
             ) : (
-              filteredReservas.map((reserva) => (
+              reservas.map((reserva) => (
                 <tr key={reserva.id} className="hover:bg-gray-50">
                   <td className="px-6 py-4 text-sm text-gray-500">#{reserva.id}</td>
                   <td className="px-6 py-4">
@@ -240,6 +300,18 @@ function HistoryView() {
         </table>
       </div>
 
+      {hayMas && (
+        <div className="mt-4 text-center">
+          <button
+            onClick={loadMas}
+            disabled={loadingMas}
+            className="px-4 py-2 bg-gray-100 text-gray-700 rounded-lg hover:bg-gray-200 transition disabled:opacity-50"
+          >
+            {loadingMas ? 'Cargando...' : 'Cargar más'}
+          </button>
+        </div>
+      )}
+
       {/* Modal de Factura/Comprobante */}
       {isInvoiceModalOpen && invoiceData && (
         <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center z-50 p-4">
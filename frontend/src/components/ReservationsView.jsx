@@ -10,6 +10,10 @@ function ReservationsView() {
   const [reservations, setReservations] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [hayMas, setHayMas] = useState(false);
+  const [loadingMas, setLoadingMas] = useState(false);
+  // Última reserva recibida en el orden del servidor (la tabla se reordena por estado)
+  const [ultimoId, setUltimoId] = useState(null);
   
   // Estados para modal de consumos
   const [isConsumoModalOpen, setIsConsumoModalOpen] = useState(false);
@@ -35,19 +39,30 @@ function ReservationsView() {
   // });
   // const [editLoading, setEditLoading] = useState(false);
 
+  // Reservas por página: el servidor las pagina por cursor, las de entrada más reciente primero
+  const PAGE_SIZE = 100;
+
   // Cargar reservas al montar
   useEffect(() => {
     loadReservations();
   }, []);
 
+  const buildParams = (afterId) => {
+    const params = { limit: PAGE_SIZE, orden: '-fecha_entrada' };
+    if (afterId) params.after_id = afterId;
+    return params;
+  };
+
   const loadReservations = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/reservas');
+      const response = await api.get('/reservas', { params: buildParams() });
       console.log('ReservationsView - Respuesta de API:', response.data);
       const data = Array.isArray(response.data) ? response.data : [];
       setReservations(data);
+      setUltimoId(data.length ? data[data.length - 1].id : null);
+      setHayMas(data.length === PAGE_SIZE);
     } catch (err) {
       setError('Error al cargar reservas');
       console.error('ReservationsView - Error:', err);
@@ -57,6 +72,23 @@ function ReservationsView() {
     }
   };
 
+  const loadMas = async () => {
+    if (!ultimoId) return;
+    try {
+      setLoadingMas(true);
+      const response = await api.get('/reservas', { params: buildParams(ultimoId) });
+      const pagina = Array.isArray(response.data) ? response.data : [];
+      setReservations(prev => [...prev, ...pagina]);
+      if (pagina.length) setUltimoId(pagina[pagina.length - 1].id);
+      setHayMas(pagina.length === PAGE_SIZE);
+    } catch (err) {
+      console.error('Error al cargar más reservas:', err);
+      alert('Error al cargar más reservas');
+    } finally {
+      setLoadingMas(false);
+    }
+  };
+
   const handleCancel = async (reservation) => {
     // No permitir cancelar si ya está en CHECKIN, FINALIZADA o CANCELADA
     const estado = reservation.estado?.toUpperCase();
@@ -231,37 +263,14 @@ function ReservationsView() {
     }
 
     try {
-      // Crear producto temporal para el pago (precio negativo = abono)
+      // Concepto del pago (precio negativo = abono)
       const nombrePago = pagoForm.tipo === 'seña' ? 'Seña/Adelanto' : 'Pago Completo';
       const montoPago = parseFloat(pagoForm.monto);
       
-      // Buscar si existe un producto con ese nombre, si no crearlo
-      let productoId = null;
-      const productosResponse = await api.get('/productos');
-      const productoExistente = productosResponse.data.find(p => p.nombre === nombrePago);
-      
-      if (productoExistente) {
-        // Actualizar precio del producto existente
-        await api.put(`/productos/${productoExistente.id}`, {
-          nombre: nombrePago,
-          precio: -montoPago,
-          activo: true
-        });
-        productoId = productoExistente.id;
-      } else {
-        // Crear nuevo producto con precio negativo
-        const nuevoProducto = await api.post('/productos', {
-          nombre: nombrePago,
-          precio: -montoPago,
-          activo: true
-        });
-        productoId = nuevoProducto.data.id;
-      }
-      
-      // Agregar consumo (que será un descuento por ser negativo)
-      await api.post(`/reservas/${selectedReservaForPago.id}/consumos`, {
-        producto_id: productoId,
-        cantidad: 1
+      // Registrar el pago (que será un descuento por ser negativo) en una sola transacción;
+      // el backend reutiliza o crea el producto con ese nombre
+      await api.post(`/reservas/${selectedReservaForPago.id}/consumos/lote`, {
+        items: [{ concepto: nombrePago, cantidad: 1, precio: -montoPago }]
       });
       
       alert(`✅ ${nombrePago} de $${montoPago.toFixed(2)} registrado correctamente`);
@@ -328,26 +337,13 @@ function ReservationsView() {
     return textos[estadoVisual] || estadoVisual;
   };
 
-  // Determinar estado de pago basado en consumos
+  // Determinar estado de pago con los totales del folio que mantiene el backend
   const getEstadoPago = (reservation) => {
-    const precioReserva = reservation.precio_total || 0;
-    const consumos = reservation.consumos || [];
-    
-    // Calcular consumos positivos (productos, minibar, etc.)
-    const totalConsumosPositivos = consumos
-      .filter(c => c.precio_unitario > 0)
-      .reduce((sum, c) => sum + (c.precio_unitario * c.cantidad), 0);
-    
-    // Calcular pagos (consumos negativos)
-    const totalPagado = consumos
-      .filter(c => c.precio_unitario < 0)
-      .reduce((sum, c) => sum + Math.abs(c.precio_unitario * c.cantidad), 0);
+    // Pagos = consumos con precio negativo (señas, pagos a cuenta)
+    const totalPagado = reservation.total_pagos || 0;
     
-    // Total a pagar = precio reserva + consumos extras
-    const totalAPagar = precioReserva + totalConsumosPositivos;
-    
-    // Saldo pendiente
-    const saldo = totalAPagar - totalPagado;
+    // Saldo pendiente = precio reserva + consumos extras - pagos
+    const saldo = reservation.saldo ?? (reservation.precio_total || 0);
     
     // Si no hay ningún pago registrado
     if (totalPagado === 0) {
@@ -432,7 +428,7 @@ function ReservationsView() {
         <div>
           <h1 className="text-3xl font-bold text-gray-900">Gestión de Reservas</h1>
           <p className="text-gray-600 mt-1">
-            Total: <strong>{reservations.length}</strong> reservas registradas
+            Mostrando <strong>{reservations.length}</strong> reservas{hayMas ? ' (las de entrada más reciente)' : ' registradas'}
           </p>
         </div>
       </div>
@@ -586,6 +582,18 @@ function ReservationsView() {
         </div>
       )}
 
+      {hayMas && (
+        <div className="mt-4 text-center">
+          <button
+            onClick={loadMas}
+            disabled={loadingMas}
+            className="px-4 py-2 bg-gray-100 text-gray-700 rounded-lg hover:bg-gray-200 transition disabled:opacity-50"
+          >
+            {loadingMas ? 'Cargando...' : 'Cargar más'}
+          </button>
+        </div>
+      )}
+
       {/* --- MODAL DE CONSUMOS --- */}
       {isConsumoModalOpen && (
         <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center p-4 z-50">